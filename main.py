@@ -1,9 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from server.db.db_config import init_db
+from server.repositories.change_notifier import change_notifier
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Exchange change notifications with the other workers (cache invalidation, SSE, live decks)
+    change_notifier.start()
+    yield
+    # Write the deck quantity updates still buffered in write-behind mode
+    from server.api.routes.deck_routes import service as deck_service
+    deck_service.flush_pending_writes()
+    change_notifier.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS - Allows frontend to communicate with backend
 # Including file uploads (multipart/form-data)
@@ -32,6 +46,8 @@ from server.api.routes.effect_routes import router as effect_router
 from server.api.routes.effect_type_routes import router as effect_type_router
 from server.api.routes.bonus_routes import router as bonus_router
 from server.api.routes.illustration_routes import router as illustration_router
+from server.api.routes.collection_routes import router as collection_router
+from server.api.routes.event_routes import router as event_router
 
 app.include_router(card_router)
 app.include_router(deck_router)
@@ -42,6 +58,8 @@ app.include_router(effect_router)
 app.include_router(effect_type_router)
 app.include_router(bonus_router)
 app.include_router(illustration_router)
+app.include_router(collection_router)
+app.include_router(event_router)
 
 # Mount static files for uploads (illustrations and icons)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends
 from pydantic import BaseModel, Field
-from typing import Optional, List
-from server.repositories.card_repository import CardRepository
+from typing import Optional, List, Dict, Any, Literal
+from server.repositories.card_repository import CardRepository, CardFilter
 from server.services.card_service import CardService
 
 router = APIRouter(prefix="/api/v1", tags=["cards"])
@@ -76,6 +76,169 @@ class CardResponse(BaseModel):
         from_attributes = True
 
 
+class CardFilterBody(BaseModel):
+    archetype_id: Optional[int] = None
+    type_ids: List[int] = Field(default_factory=list)
+    faction_ids: List[int] = Field(default_factory=list)
+    cost_min: Optional[int] = None
+    cost_max: Optional[int] = None
+    combat_power_min: Optional[int] = None
+    combat_power_max: Optional[int] = None
+    resilience_min: Optional[int] = None
+    resilience_max: Optional[int] = None
+    has_effect: Optional[bool] = None
+    has_illustration: Optional[bool] = None
+
+    def to_filter(self) -> CardFilter:
+        return CardFilter(**self.model_dump())
+
+
+class CardBulkSet(BaseModel):
+    archetype_id: Optional[int] = Field(None, gt=0)
+    type_id: Optional[int] = Field(None, gt=0)
+    faction_id: Optional[int] = Field(None, gt=0)
+    cost: Optional[int] = Field(None, ge=0)
+    combat_power: Optional[int] = Field(None, ge=0)
+    resilience: Optional[int] = Field(None, ge=0)
+    max_occurrence: Optional[int] = Field(None, ge=1)
+    illustration_id: Optional[int] = Field(None, gt=0)
+    description: Optional[str] = None
+
+
+class CardBulkIncrement(BaseModel):
+    cost: int = 0
+    combat_power: int = 0
+    resilience: int = 0
+    max_occurrence: int = 0
+
+
+class CardBulkUpdate(BaseModel):
+    filter: CardFilterBody = Field(default_factory=CardFilterBody)
+    query: Optional[str] = Field(None, max_length=500, description="Card query expression, ANDed with filter")
+    set: CardBulkSet = Field(default_factory=CardBulkSet)
+    increment: CardBulkIncrement = Field(default_factory=CardBulkIncrement)
+    dry_run: bool = False
+
+
+class CardBulkDelete(BaseModel):
+    filter: CardFilterBody = Field(default_factory=CardFilterBody)
+    query: Optional[str] = Field(None, max_length=500, description="Card query expression, ANDed with filter")
+    dry_run: bool = False
+
+
+class CardBulkResult(BaseModel):
+    dry_run: bool
+    count: int
+    card_ids: List[int]
+
+
+class FacetCount(BaseModel):
+    id: int
+    count: int
+
+
+class CostFacetCount(BaseModel):
+    cost: int
+    count: int
+
+
+class CardFacets(BaseModel):
+    types: List[FacetCount]
+    factions: List[FacetCount]
+    costs: List[CostFacetCount]
+
+
+class CardSearchResponse(BaseModel):
+    items: List[CardResponse]
+    total: int
+    facets: CardFacets
+
+
+class CardQueryExplain(BaseModel):
+    sql: str
+    estimated_cost: float
+    estimated_rows: int
+    plan: Dict[str, Any]
+
+
+class CardQueryResponse(BaseModel):
+    items: List[CardResponse]
+    explain: Optional[CardQueryExplain] = None
+
+
+class CardMatchResponse(BaseModel):
+    items: List[CardResponse]
+    total: int
+
+
+class CardSuggestion(BaseModel):
+    id: int
+    name: str
+    archetype_id: int
+    type_id: int
+    cost: int
+    deck_count: int
+
+
+class CardDeckUsage(BaseModel):
+    deck_id: int
+    name: str
+    archetype_id: int
+    quantity: int
+
+
+class CardDecksResponse(BaseModel):
+    card_id: int
+    total: int
+    items: List[CardDeckUsage]
+
+
+class ArchetypeCardUsage(BaseModel):
+    archetype_id: int
+    decks: int
+    inclusion_rate: float
+    average_copies: float
+
+
+class CardMetaEntry(BaseModel):
+    card_id: int
+    name: str
+    archetype_id: int
+    decks: int
+    copies: int
+    inclusion_rate: float
+    average_copies: Optional[float] = None
+    archetypes: List[ArchetypeCardUsage]
+
+
+class ArchetypeDeckCount(BaseModel):
+    archetype_id: int
+    decks: int
+
+
+class CardMetaReport(BaseModel):
+    total_decks: int
+    archetypes: List[ArchetypeDeckCount]
+    total_cards: int
+    cards: List[CardMetaEntry]
+
+
+class CardUsageCheckResponse(BaseModel):
+    checked_cards: int
+    mismatched_card_ids: List[int]
+    mismatched_archetype_ids: List[int]
+    rebuilt: bool
+
+
+class CatalogSnapshotStats(BaseModel):
+    version: Optional[int]
+    cards: int
+    bytes: int
+    stale: bool
+    builds: int
+    maps: int
+
+
 class EffectAssociation(BaseModel):
     effect_id: int = Field(..., gt=0)
 
@@ -84,6 +247,35 @@ class BonusAssociation(BaseModel):
     bonus_id: int = Field(..., gt=0)
 
 
+def card_filters(
+    archetype_id: Optional[int] = Query(None, description="Filter cards by archetype ID"),
+    type_id: Optional[List[int]] = Query(None, description="Filter by type ID (repeatable)"),
+    faction_id: Optional[List[int]] = Query(None, description="Filter by faction ID (repeatable)"),
+    cost_min: Optional[int] = Query(None, ge=0),
+    cost_max: Optional[int] = Query(None, ge=0),
+    combat_power_min: Optional[int] = Query(None, ge=0),
+    combat_power_max: Optional[int] = Query(None, ge=0),
+    resilience_min: Optional[int] = Query(None, ge=0),
+    resilience_max: Optional[int] = Query(None, ge=0),
+    has_effect: Optional[bool] = Query(None, description="Only cards with (true) or without (false) effects"),
+    has_illustration: Optional[bool] = Query(None, description="Only cards with (true) or without (false) an illustration")
+) -> CardFilter:
+    """Collect the card filter query parameters shared by the listing endpoints."""
+    return CardFilter(
+        archetype_id=archetype_id,
+        type_ids=type_id or [],
+        faction_ids=faction_id or [],
+        cost_min=cost_min,
+        cost_max=cost_max,
+        combat_power_min=combat_power_min,
+        combat_power_max=combat_power_max,
+        resilience_min=resilience_min,
+        resilience_max=resilience_max,
+        has_effect=has_effect,
+        has_illustration=has_illustration
+    )
+
+
 # Card CRUD endpoints
 @router.post("/cards", response_model=CardResponse, status_code=201)
 def create_card(card: CardCreate):
@@ -107,6 +299,108 @@ def create_card(card: CardCreate):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/cards/search", response_model=CardSearchResponse)
+def search_cards(
+    filters: CardFilter = Depends(card_filters),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    load_relationships: bool = Query(False, description="Load effects and bonuses for all cards")
+):
+    """
+    Get one page of filtered cards with the total count and facet counts
+    (per type, per faction and per cost) for the same filter.
+    """
+    return service.search_cards(filters, limit=limit, offset=offset, load_relationships=load_relationships)
+
+
+@router.get("/cards/autocomplete", response_model=List[CardSuggestion])
+def autocomplete_cards(
+    q: str = Query(..., min_length=1, max_length=100, description="Partial card name"),
+    limit: int = Query(10, ge=1, le=50),
+    archetype_id: Optional[int] = Query(None, description="Only suggest cards of this archetype")
+):
+    """
+    Typeahead suggestions for card names (accent- and case-insensitive, typo tolerant),
+    ranked by prefix match, similarity and deck usage.
+    """
+    return service.autocomplete_cards(q, limit=limit, archetype_id=archetype_id)
+
+
+@router.get("/cards/query", response_model=CardQueryResponse)
+def query_cards(
+    q: str = Query("", max_length=500, description='Query expression, e.g. cost<=3 type:Combattant -bonus:*'),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    load_relationships: bool = Query(False, description="Load effects and bonuses for all cards"),
+    explain: bool = Query(False, description="Also return the generated SQL and its estimated cost")
+):
+    """
+    Search cards with the card query language.
+    
+    Terms are ANDed, OR combines alternatives, '-' negates and parentheses group.
+    Fields: name, description, cost, combat_power (power), resilience (res),
+    max_occurrence, type, faction, archetype, effect, bonus.
+    """
+    try:
+        return service.query_cards(
+            q,
+            limit=limit,
+            offset=offset,
+            load_relationships=load_relationships,
+            explain=explain
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/cards/match", response_model=CardMatchResponse)
+def match_cards(
+    all_effects: List[int] = Query([], description="Cards must have every one of these effects"),
+    any_effects: List[int] = Query([], description="Cards must have at least one of these effects or any_bonuses"),
+    no_effects: List[int] = Query([], description="Cards must have none of these effects"),
+    all_bonuses: List[int] = Query([], description="Cards must have every one of these bonuses"),
+    any_bonuses: List[int] = Query([], description="Cards must have at least one of these bonuses or any_effects"),
+    no_bonuses: List[int] = Query([], description="Cards must have none of these bonuses"),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    load_relationships: bool = Query(False, description="Load effects and bonuses for all cards")
+):
+    """Get cards matching an AND/OR/NOT combination of effects and bonuses."""
+    try:
+        return service.match_cards(
+            all_effects, any_effects, no_effects, all_bonuses, any_bonuses, no_bonuses,
+            limit=limit, offset=offset, load_relationships=load_relationships
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/cards/meta", response_model=CardMetaReport)
+def get_card_meta_report(
+    archetype_id: Optional[int] = Query(None, description="Only count decks of this archetype"),
+    sort_by: Literal["inclusion_rate", "average_copies", "decks", "name"] = Query("inclusion_rate"),
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Inclusion rate, average copies and per-archetype breakdown for every card,
+    served from the incrementally maintained usage counters.
+    """
+    return service.get_meta_report(archetype_id=archetype_id, sort_by=sort_by, limit=limit, offset=offset)
+
+
+@router.post("/cards/usage/check", response_model=CardUsageCheckResponse)
+def check_card_usage(rebuild: bool = Query(False, description="Rebuild the usage counters if they are wrong")):
+    """Compare the card usage counters with deck_cards and optionally rebuild them."""
+    return service.check_card_usage(rebuild=rebuild)
+
+
+@router.get("/cards/snapshot/stats", response_model=CatalogSnapshotStats)
+def get_catalog_snapshot_stats():
+    """Version and size of the shared catalog snapshot, with this worker's build and map counts."""
+    return service.get_snapshot_stats()
+
+
 @router.get("/cards/{card_id}", response_model=CardResponse)
 def get_card(
     card_id: int,
@@ -119,13 +413,61 @@ def get_card(
     return result
 
 
+@router.get("/cards/{card_id}/decks", response_model=CardDecksResponse)
+def get_card_decks(
+    card_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    """Get the decks playing a card, newest first, with how many copies each plays."""
+    result = service.get_card_decks(card_id, limit=limit, offset=offset)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return result
+
+
 @router.get("/cards", response_model=List[CardResponse])
 def list_cards(
-    archetype_id: Optional[int] = Query(None, description="Filter cards by archetype ID"),
+    filters: CardFilter = Depends(card_filters),
     load_relationships: bool = Query(False, description="Load effects and bonuses for all cards")
 ):
-    """Get cards, optionally filtered by archetype and with effects and bonuses."""
-    return service.list_cards(archetype_id=archetype_id, load_relationships=load_relationships)
+    """Get cards, optionally filtered and with effects and bonuses."""
+    return service.list_cards(load_relationships=load_relationships, filters=filters)
+
+
+@router.patch("/cards", response_model=CardBulkResult)
+def bulk_update_cards(patch: CardBulkUpdate):
+    """
+    Update every card matching a filter/query in one statement.
+    'set' assigns values, 'increment' adds deltas (e.g. {"cost": 1}).
+    With dry_run, only returns the cards that would be affected.
+    """
+    try:
+        return service.bulk_update_cards(
+            filters=patch.filter.to_filter(),
+            query=patch.query,
+            values=patch.set.model_dump(),
+            increments=patch.increment.model_dump(),
+            dry_run=patch.dry_run
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/cards", response_model=CardBulkResult)
+def bulk_delete_cards(request: CardBulkDelete):
+    """
+    Delete every card matching a filter/query in one statement.
+    With dry_run, only returns the cards that would be deleted.
+    """
+    try:
+        return service.bulk_delete_cards(
+            filters=request.filter.to_filter(),
+            query=request.query,
+            dry_run=request.dry_run
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.put("/cards/{card_id}", response_model=CardResponse)
@@ -210,4 +552,33 @@ def remove_bonus_from_card(card_id: int, bonus_id: int):
 def get_card_bonuses(card_id: int):
     """Get all bonuses for a card."""
     bonuses = service.get_card_bonuses(card_id)
-    return bonuses
\ No newline at end of file
+    return bonuses
+
+
+# Reverse lookups (served from the in-memory effect/bonus -> cards index)
+@router.get("/effects/{effect_id}/cards", response_model=List[CardResponse])
+def get_effect_cards(
+    effect_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    load_relationships: bool = Query(False, description="Load effects and bonuses for all cards")
+):
+    """Get all cards that have an effect."""
+    cards = service.get_effect_cards(effect_id, limit=limit, offset=offset, load_relationships=load_relationships)
+    if cards is None:
+        raise HTTPException(status_code=404, detail="Effect not found")
+    return cards
+
+
+@router.get("/bonuses/{bonus_id}/cards", response_model=List[CardResponse])
+def get_bonus_cards(
+    bonus_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    load_relationships: bool = Query(False, description="Load effects and bonuses for all cards")
+):
+    """Get all cards that have a bonus."""
+    cards = service.get_bonus_cards(bonus_id, limit=limit, offset=offset, load_relationships=load_relationships)
+    if cards is None:
+        raise HTTPException(status_code=404, detail="Bonus not found")
+    return cards
@@ -0,0 +1,200 @@
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+from server.repositories.collection_repository import CollectionRepository
+from server.services.collection_service import CollectionService
+from server.api.routes.deck_routes import service as deck_service
+
+router = APIRouter(prefix="/api/v1", tags=["collections"])
+
+repo = CollectionRepository()
+service = CollectionService(repo, deck_service=deck_service)
+
+
+# Pydantic models for request/response validation
+class CollectionCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    description: Optional[str] = None
+
+
+class CollectionUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    description: Optional[str] = None
+
+
+class CollectionResponse(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class CollectionCardResponse(BaseModel):
+    card_id: int
+    name: str
+    owned_qty: int
+
+
+class CollectionCardQuantity(BaseModel):
+    card_id: int = Field(..., gt=0)
+    owned_qty: int = Field(..., ge=0, description="Copies owned; 0 removes the card")
+
+
+class CollectionInventoryUpdate(BaseModel):
+    cards: List[CollectionCardQuantity] = Field(..., min_length=1, max_length=5000)
+
+
+class CollectionInventoryUpdateResponse(BaseModel):
+    collection_id: int
+    updated: int
+    distinct_cards: int
+
+
+class BuildableDeckResponse(BaseModel):
+    deck_id: int
+    name: str
+    archetype_id: int
+    total_cards: int
+
+
+class MissingCard(BaseModel):
+    card_id: int
+    name: str
+    needed: int
+    owned: int
+    missing: int
+
+
+class DeckMissingCardsResponse(BaseModel):
+    collection_id: int
+    deck_id: int
+    buildable: bool
+    missing_cards: int
+    cards: List[MissingCard]
+
+
+class ClosestDeckResponse(BaseModel):
+    deck_id: int
+    name: str
+    archetype_id: int
+    total_cards: int
+    owned_cards: int
+    missing_cards: int
+    completion: float
+
+
+# Collection CRUD endpoints
+@router.post("/collections", response_model=CollectionResponse, status_code=201)
+def create_collection(collection: CollectionCreate):
+    """Create a new, empty collection."""
+    return service.create_collection(collection.name, description=collection.description)
+
+
+@router.get("/collections", response_model=List[CollectionResponse])
+def list_collections():
+    """Get all collections."""
+    return service.list_collections()
+
+
+@router.get("/collections/{collection_id}", response_model=CollectionResponse)
+def get_collection(collection_id: int):
+    """Get a collection by ID."""
+    result = service.get_collection(collection_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return result
+
+
+@router.put("/collections/{collection_id}", response_model=CollectionResponse)
+def update_collection(collection_id: int, collection: CollectionUpdate):
+    """Update a collection's attributes."""
+    result = service.update_collection(collection_id, name=collection.name, description=collection.description)
+    if not result:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return result
+
+
+@router.delete("/collections/{collection_id}")
+def delete_collection(collection_id: int):
+    """Delete a collection and its inventory."""
+    success = service.delete_collection(collection_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return {"message": "Collection deleted successfully"}
+
+
+# Inventory endpoints
+@router.get("/collections/{collection_id}/cards", response_model=List[CollectionCardResponse])
+def get_collection_cards(collection_id: int):
+    """Get the cards owned by a collection."""
+    result = service.get_inventory(collection_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return result
+
+
+@router.patch("/collections/{collection_id}/cards", response_model=CollectionInventoryUpdateResponse)
+def update_collection_cards(collection_id: int, update: CollectionInventoryUpdate):
+    """Set the owned quantity of several cards in one transaction (0 removes a card)."""
+    quantities = {}
+    for item in update.cards:
+        if item.card_id in quantities:
+            raise HTTPException(status_code=400, detail=f"Card {item.card_id} is listed more than once")
+        quantities[item.card_id] = item.owned_qty
+    try:
+        result = service.set_inventory(collection_id, quantities)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return result
+
+
+# Deck queries against the inventory
+@router.get("/collections/{collection_id}/buildable-decks", response_model=List[BuildableDeckResponse])
+def get_buildable_decks(
+    collection_id: int,
+    archetype_id: Optional[int] = Query(None, description="Only decks of this archetype"),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    """Get the decks that can be built entirely from the collection."""
+    result = service.get_buildable_decks(collection_id, archetype_id=archetype_id, limit=limit, offset=offset)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return result
+
+
+@router.get("/collections/{collection_id}/closest-decks", response_model=List[ClosestDeckResponse])
+def get_closest_decks(
+    collection_id: int,
+    archetype_id: Optional[int] = Query(None, description="Only decks of this archetype"),
+    max_missing: Optional[int] = Query(None, ge=0, description="Only decks missing at most this many copies"),
+    include_complete: bool = Query(False, description="Also list the decks that are already buildable"),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """Get the decks the collection is closest to completing, fewest missing copies first."""
+    result = service.get_closest_decks(
+        collection_id,
+        archetype_id=archetype_id,
+        max_missing=max_missing,
+        include_complete=include_complete,
+        limit=limit
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return result
+
+
+@router.get("/collections/{collection_id}/missing/{deck_id}", response_model=DeckMissingCardsResponse)
+def get_missing_cards(collection_id: int, deck_id: int):
+    """Get the cards (and copies) the collection lacks to build a deck."""
+    result = service.get_missing_cards(collection_id, deck_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Collection or deck not found")
+    return result
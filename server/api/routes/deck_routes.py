@@ -1,13 +1,17 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, Field, computed_field
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, computed_field
+from typing import Optional, List, Literal, Dict
+from datetime import datetime
+from uuid import uuid4
 from server.repositories.deck_repository import DeckRepository
 from server.services.deck_service import DeckService
+from server.services.deck_collab import DeckCollabHub
 
 router = APIRouter(prefix="/api/v1", tags=["decks"])
 
 deck_repo = DeckRepository()
 service = DeckService(deck_repo)
+collab = DeckCollabHub(service)
 
 
 # Pydantic models for request/response validation
@@ -64,12 +68,26 @@ class DeckUpdate(BaseModel):
     archetype_id: Optional[int] = Field(None, gt=0)
 
 
+class DeckStatsResponse(BaseModel):
+    total_cards: int
+    distinct_cards: int
+    cost_sum: int
+    type_counts: Dict[int, int]
+    valid: bool
+    content_hash: str
+    last_modified: datetime
+    
+    class Config:
+        from_attributes = True
+
+
 class DeckResponse(BaseModel):
     id: int
     name: str
     description: Optional[str]
     archetype_id: int
     archetype: Optional[ArchetypeInCard] = None
+    stats: Optional[DeckStatsResponse] = None
 
     class Config:
         from_attributes = True
@@ -102,6 +120,36 @@ class DeckCardResponse(BaseModel):
     count: int  # Alias for quantity
 
 
+deck_cards_adapter = TypeAdapter(List[DeckCardResponse])
+
+
+def serialize_deck_cards(cards: List[Dict]) -> bytes:
+    """Validate repository rows as DeckCardResponse and dump them to JSON."""
+    return deck_cards_adapter.dump_json(deck_cards_adapter.validate_python(cards, from_attributes=True))
+
+
+class DeckPayloadCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+
+
+class DeckWriteBufferStats(BaseModel):
+    window: float
+    pending_decks: int
+    pending_updates: int
+    received: int
+    written: int
+    flushes: int
+    failures: int
+    rejected: int
+
+
 class AddCardToDeck(BaseModel):
     card_id: int = Field(..., gt=0)
     quantity: int = Field(..., ge=1)
@@ -112,10 +160,11 @@ class UpdateCardQuantity(BaseModel):
 
 
 class DeckValidationError(BaseModel):
-    card_id: int
-    card_name: str
-    quantity: int
-    max_occurrence: int
+    rule: str = "max_occurrence"
+    card_id: Optional[int] = None
+    card_name: Optional[str] = None
+    quantity: Optional[int] = None
+    max_occurrence: Optional[int] = None
     message: str
 
 
@@ -125,6 +174,322 @@ class DeckValidationResponse(BaseModel):
     errors: List[DeckValidationError]
 
 
+class CountByKey(BaseModel):
+    id: int
+    count: int
+
+
+class CostCount(BaseModel):
+    cost: int
+    count: int
+
+
+class DeckSummaryResponse(BaseModel):
+    deck_id: Optional[int] = None
+    total_cards: int
+    distinct_cards: int
+    cost_curve: List[CostCount]
+    average_combat_power: Optional[float] = None
+    average_resilience: Optional[float] = None
+    types: List[CountByKey]
+    factions: List[CountByKey]
+    valid: bool
+    errors: List[DeckValidationError]
+    unknown_card_ids: List[int]
+
+
+class DecklistEntry(BaseModel):
+    card_id: int = Field(..., gt=0)
+    quantity: int = Field(..., ge=1)
+
+
+class DecklistSummaryRequest(BaseModel):
+    cards: List[DecklistEntry] = Field(default_factory=list)
+
+
+class DeckCardOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    card_id: int = Field(..., gt=0)
+    quantity: Optional[int] = Field(None, ge=1, description="Copies to add, or the new quantity for 'set'")
+
+
+class DeckCardBatch(BaseModel):
+    operations: List[DeckCardOperation] = Field(..., min_length=1, max_length=500)
+
+
+class LiveCardChange(BaseModel):
+    card_id: int = Field(..., gt=0)
+    delta: Optional[int] = Field(None, description="Copies to add (negative to take out), merged with concurrent edits")
+    quantity: Optional[int] = Field(None, ge=0, description="New quantity (0 takes the card out)")
+    expected: Optional[int] = Field(None, ge=0, description="Only set quantity if the card still has this quantity")
+
+
+class LiveMessage(BaseModel):
+    type: Literal["changes", "sync", "ping"]
+    client_seq: Optional[int] = None
+    changes: List[LiveCardChange] = Field(default_factory=list, max_length=500)
+    since: Optional[int] = Field(None, ge=0, description="Last deck version seen, for sync")
+
+
+class DeckCardQuantity(BaseModel):
+    card_id: int
+    quantity: int
+
+
+class DeckCardBatchResponse(BaseModel):
+    cards: List[DeckCardQuantity]
+    summary: DeckSummaryResponse
+
+
+class DeckStatsCheckResponse(BaseModel):
+    checked: int
+    mismatched_deck_ids: List[int]
+    rebuilt: bool
+
+
+class DeckRuleResponse(BaseModel):
+    code: str
+    description: str
+
+
+class DeckRulesValidationRequest(BaseModel):
+    deck_ids: Optional[List[int]] = Field(None, description="Only validate these decks")
+    archetype_id: Optional[int] = Field(None, description="Only validate decks of this archetype")
+    rules: Optional[List[str]] = Field(None, description="Rule codes to run (all applicable rules if omitted)")
+    min_cards: Optional[int] = Field(None, ge=0)
+    max_cards: Optional[int] = Field(None, ge=0)
+    type_limits: Dict[int, int] = Field(default_factory=dict, description="Maximum number of cards per type_id")
+
+
+class DeckRuleViolation(BaseModel):
+    rule: str
+    card_id: Optional[int] = None
+    type_id: Optional[int] = None
+    actual: Optional[int] = None
+    allowed: Optional[int] = None
+    message: str
+
+
+class DeckRuleResult(BaseModel):
+    deck_id: int
+    violations: List[DeckRuleViolation]
+
+
+class DeckRulesValidationResponse(BaseModel):
+    checked_decks: int
+    invalid_decks: int
+    rules: List[str]
+    results: List[DeckRuleResult]
+
+
+class DeckInvalidationViolation(BaseModel):
+    rule: str
+    card_id: Optional[int] = None
+    message: str
+
+
+class DeckInvalidationResponse(BaseModel):
+    id: int
+    deck_id: int
+    violations: List[DeckInvalidationViolation]
+    invalidated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class DeckCodeResponse(BaseModel):
+    deck_id: int
+    code: str
+    content_hash: str
+    duplicate_deck_ids: List[int]
+
+
+class DeckCodeImport(BaseModel):
+    code: str = Field(..., min_length=1, max_length=2000)
+    name: str = Field(..., min_length=1, max_length=100)
+    description: Optional[str] = None
+    allow_duplicate: bool = Field(False, description="Create the deck even if a deck with the same contents exists")
+
+
+class DecklistTextImport(BaseModel):
+    text: str = Field(..., min_length=1, max_length=20000)
+    name: str = Field(..., min_length=1, max_length=100)
+    archetype_id: Optional[int] = Field(None, description="Inferred from the cards if omitted")
+    description: Optional[str] = None
+    create: bool = Field(True, description="Create the deck if every line resolves (false: only resolve)")
+
+
+class DecklistCandidate(BaseModel):
+    card_id: int
+    name: str
+    score: float
+
+
+class DecklistLineResult(BaseModel):
+    line: int
+    text: str
+    quantity: int
+    status: Literal["exact", "fuzzy", "ambiguous", "unresolved"]
+    card_id: Optional[int] = None
+    card_name: Optional[str] = None
+    candidates: List[DecklistCandidate]
+
+
+class DecklistTextImportResponse(BaseModel):
+    deck: Optional[DeckResponse] = None
+    archetype_id: Optional[int] = None
+    resolved: bool
+    cards: List[DeckCardQuantity]
+    lines: List[DecklistLineResult]
+
+
+class DeckClone(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100, description="Defaults to '<name> (copy)'")
+    archetype_id: Optional[int] = Field(None, description="Archetype of the copy (defaults to the source's)")
+    description: Optional[str] = None
+    substitutions: Dict[int, int] = Field(default_factory=dict, description="Map of card_id to the card_id replacing it")
+
+
+class DeckDiffCard(BaseModel):
+    card_id: int
+    name: str
+    quantity: int
+
+
+class DeckDiffChange(BaseModel):
+    card_id: int
+    name: str
+    quantity: int
+    other_quantity: int
+
+
+class DeckDiffResponse(BaseModel):
+    deck_id: int
+    other_deck_id: int
+    identical: bool
+    added: List[DeckDiffCard]
+    removed: List[DeckDiffCard]
+    changed: List[DeckDiffChange]
+
+
+class DrawCondition(BaseModel):
+    type_id: Optional[int] = None
+    min_cost: Optional[int] = Field(None, ge=0)
+    max_cost: Optional[int] = Field(None, ge=0)
+    card_ids: List[int] = Field(default_factory=list)
+    at_least: int = Field(1, ge=0, le=100)
+
+
+class DrawQuery(BaseModel):
+    conditions: List[DrawCondition] = Field(..., min_length=1, max_length=10, description="All must hold")
+
+
+class DeckProbabilityRequest(BaseModel):
+    hand_size: int = Field(5, ge=1, le=100, description="Cards in the opening hand")
+    turn: int = Field(1, ge=1, le=100, description="Turn by which the cards must be drawn (1 = opening hand)")
+    draws_per_turn: int = Field(1, ge=0, le=20)
+    queries: List[DrawQuery] = Field(default_factory=list, max_length=20)
+    simulations: int = Field(100_000, ge=1000, le=5_000_000, description="Shuffles for compound queries")
+    seed: Optional[int] = None
+
+    def params(self) -> dict:
+        return {
+            "hand_size": self.hand_size,
+            "turn": self.turn,
+            "draws_per_turn": self.draws_per_turn,
+            "queries": [[condition.model_dump() for condition in query.conditions] for query in self.queries],
+            "simulations": self.simulations,
+            "seed": self.seed
+        }
+
+
+class DecklistProbabilityRequest(DeckProbabilityRequest):
+    cards: List[DecklistEntry] = Field(..., min_length=1)
+
+
+class TypeDistribution(BaseModel):
+    type_id: int
+    distribution: List[float]
+
+
+class ExpectedCost(BaseModel):
+    cost: int
+    expected: float
+
+
+class DrawQueryResult(BaseModel):
+    probability: float
+    method: Literal["exact", "monte_carlo"]
+    simulations: Optional[int] = None
+    standard_error: Optional[float] = None
+
+
+class DeckProbabilityResponse(BaseModel):
+    deck_size: int
+    cards_seen: int
+    opening_hand: List[TypeDistribution]
+    expected_curve: List[ExpectedCost]
+    queries: List[DrawQueryResult]
+
+
+class DeckBuildRequest(BaseModel):
+    archetype_id: int
+    size: int = Field(..., ge=1, le=200, description="Number of cards in each deck")
+    curve_center: Optional[float] = Field(None, ge=0, description="Cost the curve should be centred on")
+    curve_weight: float = Field(0.1, ge=0, description="Penalty per copy for each squared cost step away from the centre")
+    type_min: Dict[int, int] = Field(default_factory=dict, description="Minimum number of cards per type_id")
+    type_max: Dict[int, int] = Field(default_factory=dict, description="Maximum number of cards per type_id")
+    include: Dict[int, int] = Field(default_factory=dict, description="Cards that must be included, with their quantity")
+    exclude: List[int] = Field(default_factory=list)
+    faction_ids: List[int] = Field(default_factory=list, description="Only use cards of these factions")
+    count: int = Field(3, ge=1, le=20, description="Number of decks to propose")
+    time_budget_ms: int = Field(1000, ge=50, le=10000, description="Search time for the alternative decks")
+    seed: Optional[int] = None
+
+
+class BuiltDeck(BaseModel):
+    score: float
+    total_cards: int
+    average_cost: Optional[float] = None
+    type_counts: Dict[int, int]
+    cards: List[DeckCardQuantity]
+
+
+class DeckBuildResponse(BaseModel):
+    candidates: int
+    optimal_score: float
+    decks: List[BuiltDeck]
+
+
+class CardSuggestionResponse(BaseModel):
+    card_id: int
+    name: str
+    score: float
+    support: int
+
+
+class SimilarDeckResponse(BaseModel):
+    deck_id: int
+    name: str
+    archetype_id: int
+    similarity: float
+
+
+class DeckCluster(BaseModel):
+    size: int
+    deck_ids: List[int]
+
+
+class DeckClusterReport(BaseModel):
+    decks: int
+    clusters: List[DeckCluster]
+
+
+class DeckSignatureRebuildResponse(BaseModel):
+    decks: int
+
+
 # Deck CRUD endpoints
 @router.post("/decks", response_model=DeckResponse, status_code=201)
 def create_deck(deck: DeckCreate):
@@ -132,6 +497,114 @@ def create_deck(deck: DeckCreate):
     return service.create_deck(name=deck.name, archetype_id=deck.archetype_id, description=deck.description)
 
 
+@router.post("/decks/summary", response_model=DeckSummaryResponse)
+def summarize_decklist(decklist: DecklistSummaryRequest):
+    """Summarize an unsaved decklist (what-if evaluation); nothing is stored."""
+    try:
+        return service.summarize_decklist([entry.model_dump() for entry in decklist.cards])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/decks/invalidations", response_model=List[DeckInvalidationResponse])
+def get_invalidation_feed(
+    after_id: int = Query(0, ge=0, description="Only entries after this id (the last id already seen)"),
+    limit: int = Query(100, ge=1, le=1000),
+    deck_id: Optional[int] = Query(None, description="Only entries of this deck")
+):
+    """Feed of decks that became invalid, e.g. after a card's max_occurrence or archetype changed."""
+    return service.get_invalidation_feed(after_id=after_id, limit=limit, deck_id=deck_id)
+
+
+@router.get("/decks/rules", response_model=List[DeckRuleResponse])
+def list_deck_rules():
+    """List the rules available to deck validation."""
+    return service.list_rules()
+
+
+@router.post("/decks/validate", response_model=DeckRulesValidationResponse)
+def validate_decks(request: DeckRulesValidationRequest):
+    """Validate every deck (or a filtered subset) in one run; violations are grouped by deck."""
+    try:
+        return service.validate_decks(**request.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/decks/import-code", response_model=DeckResponse, status_code=201)
+def import_deck_code(data: DeckCodeImport):
+    """Create a deck and all its cards from a deck code; 409 if an identical deck exists."""
+    try:
+        deck, duplicates = service.import_deck_code(
+            code=data.code, name=data.name, description=data.description, allow_duplicate=data.allow_duplicate
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if deck is None:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "A deck with the same contents already exists", "duplicate_deck_ids": duplicates}
+        )
+    return deck
+
+
+@router.post("/decks/import-text", response_model=DecklistTextImportResponse)
+def import_decklist_text(data: DecklistTextImport):
+    """
+    Import a pasted decklist ("3x Centurion de la Garde" per line). Names are resolved
+    in one batch, accent/case-insensitively with a typo-tolerant fallback; ambiguous
+    or unresolved lines are flagged and the deck is only created when all lines resolve.
+    """
+    try:
+        return service.import_decklist_text(
+            text=data.text,
+            name=data.name,
+            archetype_id=data.archetype_id,
+            description=data.description,
+            create=data.create
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/decks/probabilities", response_model=DeckProbabilityResponse)
+def get_decklist_probabilities(request: DecklistProbabilityRequest):
+    """Draw probabilities for an unsaved decklist."""
+    try:
+        return service.get_decklist_probabilities([entry.model_dump() for entry in request.cards], **request.params())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/decks/build", response_model=DeckBuildResponse)
+def build_decks(request: DeckBuildRequest):
+    """
+    Propose the best-scoring decks for an archetype under size, curve, type and
+    include/exclude constraints. Nothing is stored; create a deck from a proposal
+    with the deck code or batch card endpoints.
+    """
+    constraints = request.model_dump(exclude={"archetype_id", "time_budget_ms"})
+    try:
+        return service.build_decks(request.archetype_id, time_budget=request.time_budget_ms / 1000, **constraints)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/decks/clusters", response_model=DeckClusterReport)
+def get_deck_clusters(
+    min_similarity: float = Query(0.8, gt=0, le=1, description="Estimated Jaccard similarity linking two decks"),
+    min_size: int = Query(2, ge=1, description="Smallest cluster to report")
+):
+    """Group near-identical decks into clusters, largest first."""
+    return service.get_deck_clusters(min_similarity=min_similarity, min_size=min_size)
+
+
+@router.post("/decks/signatures/rebuild", response_model=DeckSignatureRebuildResponse)
+def rebuild_deck_signatures():
+    """Recompute the similarity signatures of every deck (after an import bypassing the API)."""
+    return service.rebuild_deck_signatures()
+
+
 @router.get("/decks/{deck_id}", response_model=DeckResponse)
 def get_deck(
     deck_id: int,
@@ -146,10 +619,33 @@ def get_deck(
 
 @router.get("/decks", response_model=List[DeckResponse])
 def list_decks(
-    load_cards: bool = Query(False, description="Load cards for all decks")
+    load_cards: bool = Query(False, description="Load cards for all decks"),
+    sort_by: Optional[Literal["name", "created_at", "total_cards", "distinct_cards", "valid", "last_modified"]] = Query(
+        None, description="Sort decks by a deck or deck stats column"
+    ),
+    descending: bool = Query(False, description="Sort in descending order"),
+    valid: Optional[bool] = Query(None, description="Only valid (true) or invalid (false) decks")
 ):
-    """Get all decks."""
-    return service.list_decks(load_cards=load_cards)
+    """Get all decks with their maintained stats (card counts, cost sum, validity)."""
+    return service.list_decks(load_cards=load_cards, sort_by=sort_by, descending=descending, valid=valid)
+
+
+@router.get("/decks/cache/stats", response_model=DeckPayloadCacheStats)
+def get_deck_cache_stats():
+    """Size, evictions and hit ratio of the deck payload cache of this process."""
+    return service.get_payload_cache_stats()
+
+
+@router.get("/decks/write-buffer/stats", response_model=DeckWriteBufferStats)
+def get_deck_write_buffer_stats():
+    """Pending and written counts of the write-behind quantity buffer of this process."""
+    return service.get_write_buffer_stats()
+
+
+@router.post("/decks/stats/check", response_model=DeckStatsCheckResponse)
+def check_deck_stats(rebuild: bool = Query(False, description="Rebuild the stats of mismatched decks")):
+    """Compare the maintained deck stats with deck_cards and optionally rebuild them."""
+    return service.check_deck_stats(rebuild=rebuild)
 
 
 @router.put("/decks/{deck_id}", response_model=DeckResponse)
@@ -193,6 +689,22 @@ def add_card_to_deck(deck_id: int, card_data: AddCardToDeck):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.patch("/decks/{deck_id}/cards", response_model=DeckCardBatchResponse)
+def apply_card_operations(deck_id: int, batch: DeckCardBatch):
+    """
+    Apply an ordered list of add/set/remove operations to a deck in one transaction.
+    All operations are validated against max_occurrence first; if any fails, none is applied.
+    Returns the resulting deck contents and summary.
+    """
+    try:
+        result = service.apply_card_operations(deck_id, [operation.model_dump() for operation in batch.operations])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return result
+
+
 @router.delete("/decks/{deck_id}/cards/{card_id}")
 def remove_card_from_deck(deck_id: int, card_id: int):
     """Remove a card from a deck."""
@@ -204,17 +716,31 @@ def remove_card_from_deck(deck_id: int, card_id: int):
 
 
 @router.put("/decks/{deck_id}/cards/{card_id}")
-def update_card_quantity(deck_id: int, card_id: int, quantity_data: UpdateCardQuantity):
+def update_card_quantity(
+    deck_id: int,
+    card_id: int,
+    quantity_data: UpdateCardQuantity,
+    write_behind: bool = Query(
+        False,
+        description="Buffer the update: repeated updates of the card within a short window are written once"
+    )
+):
     """
     Update the quantity of a card in a deck.
     Validates that quantity doesn't exceed the card's max_occurrence.
+    With write_behind the validated update is written shortly after (deferred: true);
+    later reads of the deck through the API already see it.
     """
     try:
-        service.update_card_quantity(deck_id, card_id, quantity_data.quantity)
+        if write_behind:
+            service.queue_card_quantity(deck_id, card_id, quantity_data.quantity)
+        else:
+            service.update_card_quantity(deck_id, card_id, quantity_data.quantity)
         return {
             "message": "Card quantity updated successfully",
             "card_id": card_id,
-            "quantity": quantity_data.quantity
+            "quantity": quantity_data.quantity,
+            "deferred": write_behind
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -222,11 +748,11 @@ def update_card_quantity(deck_id: int, card_id: int, quantity_data: UpdateCardQu
 
 @router.get("/decks/{deck_id}/cards", response_model=List[DeckCardResponse])
 def get_deck_cards(deck_id: int):
-    """Get all cards in a deck with their quantities."""
-    cards = service.get_deck_cards(deck_id)
-    if cards is None:
+    """Get all cards in a deck with their quantities (served from the deck payload cache)."""
+    payload = service.get_deck_cards_payload(deck_id, serialize_deck_cards)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Deck not found")
-    return cards
+    return Response(content=payload, media_type="application/json")
 
 
 @router.get("/decks/{deck_id}/cards/{card_id}/quantity")
@@ -253,6 +779,132 @@ def get_total_cards(deck_id: int):
     }
 
 
+@router.post("/decks/{deck_id}/clone", response_model=DeckResponse, status_code=201)
+def clone_deck(deck_id: int, data: DeckClone):
+    """Copy a deck and its cards server-side, optionally changing archetype and substituting cards."""
+    try:
+        result = service.clone_deck(deck_id, **data.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return result
+
+
+@router.get("/decks/{deck_id}/diff/{other_deck_id}", response_model=DeckDiffResponse)
+def diff_decks(deck_id: int, other_deck_id: int):
+    """Cards added, removed and changed in quantity from deck_id to other_deck_id."""
+    result = service.diff_decks(deck_id, other_deck_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return result
+
+
+@router.post("/decks/{deck_id}/probabilities", response_model=DeckProbabilityResponse)
+def get_deck_probabilities(deck_id: int, request: DeckProbabilityRequest):
+    """
+    Opening-hand distribution per type, expected cards per cost by a turn, and the
+    probability of each query: exact for one condition, Monte Carlo for compound ones.
+    """
+    try:
+        result = service.get_probabilities(deck_id, **request.params())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return result
+
+
+@router.get("/decks/{deck_id}/suggestions", response_model=List[CardSuggestionResponse])
+def get_deck_suggestions(
+    deck_id: int,
+    limit: int = Query(20, ge=1, le=200),
+    metric: Literal["pmi", "lift"] = Query("pmi", description="Rank by average PMI or average lift"),
+    min_support: int = Query(1, ge=1, description="Ignore pairs with a smaller co-occurrence weight")
+):
+    """Cards often played with this deck's cards and playable in its archetype, best first."""
+    result = service.get_suggestions(deck_id, limit=limit, metric=metric, min_support=min_support)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return result
+
+
+@router.get("/decks/{deck_id}/similar", response_model=List[SimilarDeckResponse])
+def get_similar_decks(
+    deck_id: int,
+    limit: int = Query(20, ge=1, le=200),
+    min_similarity: float = Query(0.5, ge=0, le=1, description="Minimum estimated Jaccard similarity of the card copies")
+):
+    """Decks with nearly the same cards as this one, most similar first."""
+    result = service.get_similar_decks(deck_id, limit=limit, min_similarity=min_similarity)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return result
+
+
+@router.websocket("/decks/{deck_id}/live")
+async def deck_live(websocket: WebSocket, deck_id: int, since: Optional[int] = Query(None, ge=0)):
+    """
+    Live editing channel of a deck: receives the deck state, sends card changes and
+    receives every change of the deck as a delta (protocol in services/deck_collab.py).
+    """
+    await websocket.accept()
+    client_id = uuid4().hex
+    if not await collab.join(deck_id, client_id, websocket, since):
+        await websocket.close(code=4404, reason="Deck not found")
+        return
+    try:
+        while True:
+            try:
+                message = LiveMessage.model_validate_json(await websocket.receive_text())
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "client_seq": None, "detail": str(e)})
+                continue
+            if message.type == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
+            if message.type == "sync":
+                found = await collab.sync(deck_id, websocket, message.since)
+            else:
+                reply = await collab.apply(
+                    deck_id,
+                    client_id,
+                    message.client_seq,
+                    [change.model_dump() for change in message.changes]
+                )
+                if reply is not None:
+                    await websocket.send_json(reply)
+                found = reply is None or not reply.get("deleted")
+            if not found:
+                await websocket.close(code=4404, reason="Deck not found")
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        collab.leave(deck_id, client_id)
+
+
+@router.get("/decks/{deck_id}/code", response_model=DeckCodeResponse)
+def get_deck_code(deck_id: int):
+    """Get the compact shareable code of a deck, plus the decks with identical contents."""
+    result = service.get_deck_code(deck_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return result
+
+
+@router.get("/decks/{deck_id}/summary", response_model=DeckSummaryResponse)
+def get_deck_summary(deck_id: int):
+    """
+    Get a deck's total cards, cost curve, average combat power and resilience,
+    per-type and per-faction counts and validation errors in one query.
+    """
+    summary = service.get_deck_summary(deck_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return summary
+
+
 @router.get("/decks/{deck_id}/validate", response_model=DeckValidationResponse)
 def validate_deck(deck_id: int):
     """
@@ -0,0 +1,69 @@
+import json
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Literal
+from server.repositories.change_feed import change_feed, ChangeEvent, ENTITIES
+
+router = APIRouter(prefix="/api/v1", tags=["events"])
+
+# Comment line sent when nothing happened for this long, so proxies keep the stream open
+HEARTBEAT_SECONDS = 15.0
+RETRY_MILLISECONDS = 3000
+
+Entity = Literal["card", "deck", "effect", "bonus", "type", "faction", "illustration", "archetype"]
+
+
+def format_change(event: ChangeEvent) -> str:
+    data = json.dumps(
+        {"entity": event.entity, "id": event.entity_id, "op": event.op, "version": event.version},
+        separators=(",", ":")
+    )
+    return f"id: {change_feed.event_id(event.seq)}\nevent: change\ndata: {data}\n\n"
+
+
+def format_marker(name: str, seq: int) -> str:
+    """ready (stream position) or reset (events were missed: refetch everything shown)."""
+    return f"id: {change_feed.event_id(seq)}\nevent: {name}\ndata: {{}}\n\n"
+
+
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    entity: Optional[List[Entity]] = Query(None, description="Only changes of these entities (repeatable)"),
+    last_event_id: Optional[str] = Header(None, description="Resume after this event (sent by EventSource on reconnect)")
+):
+    """
+    Server-sent events stream of committed changes: one `change` event
+    {entity, id, op, version} per created, updated or deleted row (op `cards` when
+    a deck's card list changed). Reconnecting with Last-Event-ID replays the
+    missed events, or sends `reset` if they are no longer available.
+    """
+    wanted = set(entity or ENTITIES)
+
+    async def stream():
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        seq = change_feed.parse_event_id(last_event_id) if last_event_id else None
+        if seq is None:
+            seq = change_feed.last_seq
+            yield format_marker("reset" if last_event_id else "ready", seq)
+        while not await request.is_disconnected():
+            events = change_feed.since(seq)
+            if events is None:
+                seq = change_feed.last_seq
+                yield format_marker("reset", seq)
+                continue
+            if events:
+                for event in events:
+                    if event.entity in wanted:
+                        yield format_change(event)
+                seq = events[-1].seq
+                continue
+            await change_feed.wait(seq, HEARTBEAT_SECONDS)
+            if change_feed.last_seq == seq:
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -10,6 +10,12 @@ from server.db.schema.deck import Deck
 from server.db.schema.card_effect import CardEffect
 from server.db.schema.card_bonus import CardBonus
 from server.db.schema.deck_card import DeckCard
+from server.db.schema.deck_stats import DeckStats
+from server.db.schema.deck_invalidation import DeckInvalidation
+from server.db.schema.card_usage import CardUsage, ArchetypeUsage
+from server.db.schema.deck_signature import DeckSignature
+from server.db.schema.collection import Collection
+from server.db.schema.collection_card import CollectionCard
 
 __all__ = [
     "Archetype",
@@ -24,4 +30,11 @@ __all__ = [
     "CardEffect",
     "CardBonus",
     "DeckCard",
+    "DeckStats",
+    "DeckInvalidation",
+    "CardUsage",
+    "ArchetypeUsage",
+    "DeckSignature",
+    "Collection",
+    "CollectionCard",
 ]
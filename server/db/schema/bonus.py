@@ -17,7 +17,7 @@ class Bonus(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-    cards: Mapped[List["Card"]] = relationship(secondary="card_bonuses", back_populates="bonuses")
+    cards: Mapped[List["Card"]] = relationship(secondary="card_bonuses", back_populates="bonuses", passive_deletes=True)
 
     def __repr__(self) -> str:
         desc_preview = self.description[:50] + "..." if len(self.description) > 50 else self.description
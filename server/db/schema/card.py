@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, Text, DateTime
+from sqlalchemy import String, Integer, ForeignKey, Text, DateTime, Index, DDL, event
 from server.db.base import Base
 from datetime import datetime
+import unicodedata
 from typing import List, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -14,15 +15,31 @@ if TYPE_CHECKING:
     from server.db.schema.illustration import Illustration
 
 
+def normalize_search_text(text: str) -> str:
+    """Lowercase and strip accents so 'Légionnaire' matches 'legionnaire'."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
 class Card(Base):
     __tablename__ = "cards"
+    __table_args__ = (
+        # Trigram index for prefix/fuzzy autocomplete on the normalized name (requires pg_trgm)
+        Index(
+            "ix_cards_search_name_trgm",
+            "search_name",
+            postgresql_using="gin",
+            postgresql_ops={"search_name": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
-    archetype_id: Mapped[int] = mapped_column(Integer, ForeignKey("archetypes.id", ondelete="RESTRICT"), nullable=False)
-    type_id: Mapped[int] = mapped_column(Integer, ForeignKey("types.id", ondelete="RESTRICT"), nullable=False)
-    faction_id: Mapped[int] = mapped_column(Integer, ForeignKey("factions.id", ondelete="RESTRICT"), nullable=False)
-    cost: Mapped[int] = mapped_column(Integer, nullable=False)
+    search_name: Mapped[str] = mapped_column(String(100), nullable=False, default="", server_default="")  # normalize_search_text(name)
+    archetype_id: Mapped[int] = mapped_column(Integer, ForeignKey("archetypes.id", ondelete="RESTRICT"), nullable=False, index=True)
+    type_id: Mapped[int] = mapped_column(Integer, ForeignKey("types.id", ondelete="RESTRICT"), nullable=False, index=True)
+    faction_id: Mapped[int] = mapped_column(Integer, ForeignKey("factions.id", ondelete="RESTRICT"), nullable=False, index=True)
+    cost: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     combat_power: Mapped[int] = mapped_column(Integer, nullable=False)
     resilience: Mapped[int] = mapped_column(Integer, nullable=False)
     illustration_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("illustrations.id", ondelete="SET NULL"), nullable=True)
@@ -31,10 +48,10 @@ class Card(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-    # Many-to-many relationships
-    effects: Mapped[List["Effect"]] = relationship(secondary="card_effects", back_populates="cards")
-    bonuses: Mapped[List["Bonus"]] = relationship(secondary="card_bonuses", back_populates="cards")
-    decks: Mapped[List["Deck"]] = relationship(secondary="deck_cards", back_populates="cards")
+    # Many-to-many relationships (association rows are removed by ON DELETE CASCADE)
+    effects: Mapped[List["Effect"]] = relationship(secondary="card_effects", back_populates="cards", passive_deletes=True)
+    bonuses: Mapped[List["Bonus"]] = relationship(secondary="card_bonuses", back_populates="cards", passive_deletes=True)
+    decks: Mapped[List["Deck"]] = relationship(secondary="deck_cards", back_populates="cards", passive_deletes=True)
     
     # Many-to-one relationships
     archetype: Mapped["Archetype"] = relationship(foreign_keys=[archetype_id])
@@ -44,3 +61,7 @@ class Card(Base):
 
     def __repr__(self) -> str:
         return f"<Card(id={self.id}, name={self.name}, archetype_id={self.archetype_id}, type_id={self.type_id}, faction_id={self.faction_id})>"
+
+
+# The trigram index above needs the pg_trgm extension before the table is created
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
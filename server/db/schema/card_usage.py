@@ -0,0 +1,27 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Integer
+from server.db.base import Base
+
+
+class CardUsage(Base):
+    """How many decks of an archetype play a card, and how many copies in total (see repositories/card_usage.py)."""
+    __tablename__ = "card_usage"
+
+    card_id: Mapped[int] = mapped_column(ForeignKey("cards.id", ondelete="CASCADE"), primary_key=True)
+    archetype_id: Mapped[int] = mapped_column(ForeignKey("archetypes.id", ondelete="CASCADE"), primary_key=True)
+    decks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    copies: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<CardUsage(card_id={self.card_id}, archetype_id={self.archetype_id}, decks={self.decks})>"
+
+
+class ArchetypeUsage(Base):
+    """Number of decks of each archetype, the denominator of the inclusion rates."""
+    __tablename__ = "archetype_usage"
+
+    archetype_id: Mapped[int] = mapped_column(ForeignKey("archetypes.id", ondelete="CASCADE"), primary_key=True)
+    decks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<ArchetypeUsage(archetype_id={self.archetype_id}, decks={self.decks})>"
@@ -0,0 +1,18 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Text, DateTime
+from server.db.base import Base
+from datetime import datetime
+
+
+class Collection(Base):
+    """A player's card collection; the copies owned are in collection_cards."""
+    __tablename__ = "collections"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<Collection(id={self.id}, name={self.name})>"
@@ -0,0 +1,20 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Integer, CheckConstraint, DateTime
+from server.db.base import Base
+from datetime import datetime
+
+
+class CollectionCard(Base):
+    __tablename__ = "collection_cards"
+    __table_args__ = (
+        CheckConstraint('owned_qty > 0', name='check_owned_qty_positive'),
+    )
+
+    collection_id: Mapped[int] = mapped_column(ForeignKey("collections.id", ondelete="CASCADE"), primary_key=True)
+    card_id: Mapped[int] = mapped_column(ForeignKey("cards.id", ondelete="CASCADE"), primary_key=True, index=True)
+    owned_qty: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<CollectionCard(collection_id={self.collection_id}, card_id={self.card_id}, owned_qty={self.owned_qty})>"
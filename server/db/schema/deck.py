@@ -7,6 +7,7 @@ from typing import List, TYPE_CHECKING
 if TYPE_CHECKING:
     from server.db.schema.card import Card
     from server.db.schema.archetype import Archetype
+    from server.db.schema.deck_stats import DeckStats
 
 
 class Deck(Base):
@@ -20,10 +21,13 @@ class Deck(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Many-to-many relationship
-    cards: Mapped[List["Card"]] = relationship(secondary="deck_cards", back_populates="decks")
+    cards: Mapped[List["Card"]] = relationship(secondary="deck_cards", back_populates="decks", passive_deletes=True)
     
     # Many-to-one relationship
     archetype: Mapped["Archetype"] = relationship(foreign_keys=[archetype_id])
+    
+    # One-to-one maintained aggregates
+    stats: Mapped["DeckStats | None"] = relationship(cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self) -> str:
         return f"<Deck(id={self.id}, name={self.name}, archetype_id={self.archetype_id})>"
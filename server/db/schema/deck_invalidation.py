@@ -0,0 +1,18 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Integer, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from server.db.base import Base
+from datetime import datetime
+
+
+class DeckInvalidation(Base):
+    """A deck going from valid to invalid, recorded when its deck_stats are refreshed."""
+    __tablename__ = "deck_invalidations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    deck_id: Mapped[int] = mapped_column(ForeignKey("decks.id", ondelete="CASCADE"), nullable=False, index=True)
+    violations: Mapped[list] = mapped_column(JSONB, nullable=False, default=list)  # [{"rule", "card_id", "message"}]
+    invalidated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DeckInvalidation(id={self.id}, deck_id={self.deck_id})>"
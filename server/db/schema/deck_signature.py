@@ -0,0 +1,23 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Integer, BigInteger, DateTime, Index
+from sqlalchemy.dialects.postgresql import ARRAY
+from server.db.base import Base
+from datetime import datetime
+from typing import List
+
+
+class DeckSignature(Base):
+    """MinHash signature and LSH buckets of a non-empty deck (see repositories/deck_signatures.py)."""
+    __tablename__ = "deck_signatures"
+    __table_args__ = (
+        # Decks sharing a bucket are found with buckets && :buckets through this index
+        Index("ix_deck_signatures_buckets", "buckets", postgresql_using="gin"),
+    )
+
+    deck_id: Mapped[int] = mapped_column(ForeignKey("decks.id", ondelete="CASCADE"), primary_key=True)
+    signature: Mapped[List[int]] = mapped_column(ARRAY(Integer), nullable=False)
+    buckets: Mapped[List[int]] = mapped_column(ARRAY(BigInteger), nullable=False)
+    last_modified: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DeckSignature(deck_id={self.deck_id})>"
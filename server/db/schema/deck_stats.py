@@ -0,0 +1,23 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Integer, Boolean, DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+from server.db.base import Base
+from datetime import datetime
+
+
+class DeckStats(Base):
+    """Per-deck aggregates kept in sync with deck_cards (see repositories/deck_stats.py)."""
+    __tablename__ = "deck_stats"
+
+    deck_id: Mapped[int] = mapped_column(ForeignKey("decks.id", ondelete="CASCADE"), primary_key=True)
+    total_cards: Mapped[int] = mapped_column(Integer, nullable=False, default=0, index=True)
+    distinct_cards: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cost_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    type_counts: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)  # {"<type_id>": quantity}
+    valid: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True, index=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False, default="", index=True)  # see services/deck_code.py
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # bumped whenever content_hash changes
+    last_modified: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DeckStats(deck_id={self.deck_id}, total_cards={self.total_cards}, valid={self.valid})>"
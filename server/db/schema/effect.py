@@ -19,7 +19,7 @@ class Effect(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-    cards: Mapped[List["Card"]] = relationship(secondary="card_effects", back_populates="effects")
+    cards: Mapped[List["Card"]] = relationship(secondary="card_effects", back_populates="effects", passive_deletes=True)
 
     def __repr__(self) -> str:
         return f"<Effect(id={self.id}, name={self.name}, archetype_id={self.archetype_id})>"
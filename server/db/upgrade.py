@@ -0,0 +1,58 @@
+"""
+In-place upgrade of an existing database to the current models.
+
+create_all only creates missing tables: it neither adds columns nor creates
+indexes on tables that already exist. upgrade_db runs after it on every
+startup and is idempotent: it adds the columns introduced since a table was
+created, backfills them, and creates every index of the models that is missing.
+Workers starting together serialize on an advisory lock. Cards inserted outside
+the API (scripts, psql) get an empty search_name, filled on the next startup.
+
+Derived tables created empty on an existing database (deck_stats, card_usage)
+are rebuilt with POST /api/v1/decks/stats/check?rebuild=true and
+POST /api/v1/cards/usage/check?rebuild=true.
+"""
+import logging
+from sqlalchemy import Engine, select, text, update, func, bindparam
+from server.db.base import Base
+
+logger = logging.getLogger(__name__)
+
+UPGRADE_LOCK = 0x41534344  # pg_advisory_xact_lock key
+BATCH_SIZE = 1000
+
+# Columns added to existing tables: (table, column, DDL type, DDL default)
+ADDED_COLUMNS = (
+    ("cards", "search_name", "VARCHAR(100) NOT NULL", "''"),
+)
+
+
+def _backfill_search_names(connection) -> int:
+    """Fill cards.search_name for the rows written without it (e.g. before the column existed)."""
+    from server.db.schema.card import Card, normalize_search_text
+    rows = connection.execute(select(Card.id, Card.name).where(Card.search_name == "")).all()
+    values = [
+        {"card_id": card_id, "search_name": normalize_search_text(name)}
+        for card_id, name in rows
+        if normalize_search_text(name)
+    ]
+    stmt = update(Card).where(Card.id == bindparam("card_id")).values(search_name=bindparam("search_name"))
+    for i in range(0, len(values), BATCH_SIZE):
+        connection.execute(stmt.execution_options(synchronize_session=False), values[i:i + BATCH_SIZE])
+    return len(values)
+
+
+def upgrade_db(engine: Engine):
+    """Add the missing columns and indexes of the models to an existing database."""
+    import server.db.schema  # register every model
+    with engine.begin() as connection:
+        connection.execute(select(func.pg_advisory_xact_lock(UPGRADE_LOCK)))
+        for table, column, ddl, default in ADDED_COLUMNS:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl} DEFAULT {default}"))
+            connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT {default}"))
+        backfilled = _backfill_search_names(connection)
+        if backfilled:
+            logger.info("Backfilled search_name of %d card(s)", backfilled)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
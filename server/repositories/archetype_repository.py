@@ -2,6 +2,8 @@ from typing import List, Optional
 from sqlalchemy import select
 from server.db.schema.archetype import Archetype
 from server.db.db_config import SessionLocal
+from server.repositories.deck_payload_cache import deck_payload_cache
+from server.repositories.change_feed import change_feed
 
 
 class ArchetypeRepository:
@@ -13,6 +15,7 @@ class ArchetypeRepository:
             archetype = Archetype(name=name)
             session.add(archetype)
             session.commit()
+            change_feed.publish("archetype", "create", [archetype.id])
             session.refresh(archetype)
             return archetype
 
@@ -39,6 +42,8 @@ class ArchetypeRepository:
                 return None
             archetype.name = name
             session.commit()
+            deck_payload_cache.invalidate("archetype", [archetype_id])
+            change_feed.publish("archetype", "update", [archetype_id])
             session.refresh(archetype)
             return archetype
 
@@ -49,4 +54,6 @@ class ArchetypeRepository:
                 return False
             session.delete(archetype)
             session.commit()
+            deck_payload_cache.invalidate("archetype", [archetype_id])
+            change_feed.publish("archetype", "delete", [archetype_id])
             return True
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+In-memory reverse indexes from effects and bonuses to the cards that carry them.
+
+Each effect/bonus id maps to a bitmap of card ids (a Python int with bit
+``card_id`` set), so AND/OR/NOT queries are plain integer bit operations.
+The bitmaps are built lazily from ``card_effects``/``card_bonuses`` on first
+use and then maintained incrementally by CardRepository, EffectRepository and
+BonusRepository after each committed write.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import select
+from server.db.schema.card_effect import CardEffect
+from server.db.schema.card_bonus import CardBonus
+from server.db.db_config import SessionLocal
+
+
+def bitmap_to_ids(bitmap: int) -> List[int]:
+    """Return the set bits of a bitmap as a sorted list of ids."""
+    ids = []
+    while bitmap:
+        lowest = bitmap & -bitmap
+        ids.append(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return ids
+
+
+class CardAssociationIndex:
+    def __init__(self, model, key_column):
+        self.model = model
+        self.key_column = key_column
+        self._bitmaps: Dict[int, int] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """Build every bitmap from the association table (called with the lock held)."""
+        if self._loaded:
+            return
+        with SessionLocal() as session:
+            rows = session.execute(select(self.key_column, self.model.card_id)).all()
+        bitmaps = defaultdict(int)
+        for key, card_id in rows:
+            bitmaps[key] |= 1 << card_id
+        self._bitmaps = dict(bitmaps)
+        self._loaded = True
+
+    def get(self, key: int) -> int:
+        """Return the bitmap of card ids associated with key."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._bitmaps.get(key, 0)
+
+    def union(self, keys: Iterable[int]) -> int:
+        result = 0
+        with self._lock:
+            self._ensure_loaded()
+            for key in keys:
+                result |= self._bitmaps.get(key, 0)
+        return result
+
+    def intersection(self, keys: Iterable[int]) -> Optional[int]:
+        """Return the AND of the keys' bitmaps, or None if no key is given."""
+        result = None
+        with self._lock:
+            self._ensure_loaded()
+            for key in keys:
+                bitmap = self._bitmaps.get(key, 0)
+                result = bitmap if result is None else result & bitmap
+        return result
+
+    # Incremental maintenance. Before the first load there is nothing to update:
+    # the lazy load will read the committed rows.
+    def add(self, key: int, card_id: int):
+        with self._lock:
+            if self._loaded:
+                self._bitmaps[key] = self._bitmaps.get(key, 0) | (1 << card_id)
+
+    def remove(self, key: int, card_id: int):
+        with self._lock:
+            if self._loaded and key in self._bitmaps:
+                self._bitmaps[key] &= ~(1 << card_id)
+                if not self._bitmaps[key]:
+                    del self._bitmaps[key]
+
+    def remove_card(self, card_id: int):
+        """Drop a deleted card from every bitmap."""
+        self.remove_cards([card_id])
+
+    def remove_cards(self, card_ids: Iterable[int]):
+        mask = 0
+        for card_id in card_ids:
+            mask |= 1 << card_id
+        with self._lock:
+            if self._loaded and mask:
+                self._bitmaps = {
+                    key: bitmap & ~mask
+                    for key, bitmap in self._bitmaps.items()
+                    if bitmap & ~mask
+                }
+
+    def reload_cards(self, card_ids: Iterable[int]):
+        """Re-read the associations of some cards (changed by another process)."""
+        mask = 0
+        for card_id in card_ids:
+            mask |= 1 << card_id
+        with self._lock:
+            if not self._loaded or not mask:
+                return
+            with SessionLocal() as session:
+                rows = session.execute(
+                    select(self.key_column, self.model.card_id)
+                    .where(self.model.card_id.in_(bitmap_to_ids(mask)))
+                ).all()
+            bitmaps = {key: bitmap & ~mask for key, bitmap in self._bitmaps.items() if bitmap & ~mask}
+            for key, card_id in rows:
+                bitmaps[key] = bitmaps.get(key, 0) | (1 << card_id)
+            self._bitmaps = bitmaps
+
+    def remove_key(self, key: int):
+        """Drop a deleted effect/bonus."""
+        with self._lock:
+            self._bitmaps.pop(key, None)
+
+    def invalidate(self):
+        """Forget everything; the next read rebuilds from the database."""
+        with self._lock:
+            self._bitmaps = {}
+            self._loaded = False
+
+
+effect_card_index = CardAssociationIndex(CardEffect, CardEffect.effect_id)
+bonus_card_index = CardAssociationIndex(CardBonus, CardBonus.bonus_id)
+
+
+def match_cards(
+    all_effects: Iterable[int] = (),
+    any_effects: Iterable[int] = (),
+    no_effects: Iterable[int] = (),
+    all_bonuses: Iterable[int] = (),
+    any_bonuses: Iterable[int] = (),
+    no_bonuses: Iterable[int] = ()
+) -> List[int]:
+    """
+    Evaluate a multi-term query and return the matching card ids in ascending order.
+
+    Cards must have every effect/bonus in the ``all_*`` lists, at least one of the
+    ``any_*`` lists (when given) and none of the ``no_*`` lists. At least one
+    positive (all/any) term is required.
+    """
+    any_effects, any_bonuses = list(any_effects), list(any_bonuses)
+    positive = [
+        effect_card_index.intersection(all_effects),
+        bonus_card_index.intersection(all_bonuses),
+    ]
+    if any_effects or any_bonuses:
+        positive.append(effect_card_index.union(any_effects) | bonus_card_index.union(any_bonuses))
+    positive = [bitmap for bitmap in positive if bitmap is not None]
+    if not positive:
+        raise ValueError("At least one effect or bonus must be required (all/any)")
+
+    result = positive[0]
+    for bitmap in positive[1:]:
+        result &= bitmap
+    result &= ~(effect_card_index.union(no_effects) | bonus_card_index.union(no_bonuses))
+    return bitmap_to_ids(result)
@@ -2,6 +2,8 @@ from server.db.db_config import SessionLocal
 from server.db.schema.bonus import Bonus
 from typing import Optional, List
 from sqlalchemy import select
+from server.repositories.association_index import bonus_card_index
+from server.repositories.change_feed import change_feed
 
 class BonusRepository:
     
@@ -10,6 +12,7 @@ class BonusRepository:
             bonus = Bonus(description=description, archetype_id=archetype_id)
             session.add(bonus)
             session.commit()
+            change_feed.publish("bonus", "create", [bonus.id])
             session.refresh(bonus)
             return bonus
         
@@ -25,6 +28,7 @@ class BonusRepository:
             bonus.description = description
             bonus.archetype_id = archetype_id
             session.commit()
+            change_feed.publish("bonus", "update", [bonus_id])
             session.refresh(bonus)
             return bonus
         
@@ -35,6 +39,8 @@ class BonusRepository:
                 return False
             session.delete(bonus)
             session.commit()
+            bonus_card_index.remove_key(bonus_id)
+            change_feed.publish("bonus", "delete", [bonus_id])
             return True
         
     def list(self, archetype_id: Optional[int] = None) -> List[Bonus]:
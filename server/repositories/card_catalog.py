@@ -0,0 +1,113 @@
+"""
+Column-oriented in-memory copy of the card catalog for CPU-bound services.
+
+Each card attribute is a NumPy array indexed by catalog position, so filters
+and scores over the whole catalog are vectorized expressions. The arrays are
+views of the shared catalog snapshot (catalog_snapshot), so the worker
+processes don't each hold a copy. If the snapshot can't be mapped, they are
+loaded from the database and reloaded when a cheap fingerprint query (card
+count, latest card/faction update, effect link count) changes.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, func
+from server.db.schema.card import Card
+from server.db.schema.faction import Faction
+from server.db.schema.card_effect import CardEffect
+from server.db.db_config import SessionLocal
+from server.repositories.catalog_snapshot import catalog_snapshots, CatalogSnapshot
+
+
+@dataclass(frozen=True)
+class CardCatalog:
+    card_id: np.ndarray
+    archetype_id: np.ndarray
+    faction_id: np.ndarray
+    faction_archetype_id: np.ndarray
+    type_id: np.ndarray
+    cost: np.ndarray
+    combat_power: np.ndarray
+    resilience: np.ndarray
+    max_occurrence: np.ndarray
+    effect_count: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.card_id)
+
+
+_catalog: Optional[CardCatalog] = None
+_fingerprint: Optional[Tuple] = None
+_snapshot: Optional[CatalogSnapshot] = None  # the snapshot _catalog views, if any
+_lock = threading.Lock()
+
+
+def _current_fingerprint(session) -> Tuple:
+    return tuple(session.execute(select(
+        select(func.count()).select_from(Card).scalar_subquery(),
+        select(func.max(Card.updated_at)).scalar_subquery(),
+        select(func.max(Faction.updated_at)).scalar_subquery(),
+        select(func.count()).select_from(CardEffect).scalar_subquery()
+    )).one())
+
+
+def _load(session) -> CardCatalog:
+    effect_count = (
+        select(func.count())
+        .where(CardEffect.card_id == Card.id)
+        .correlate(Card)
+        .scalar_subquery()
+    )
+    rows = session.execute(
+        select(
+            Card.id,
+            Card.archetype_id,
+            Card.faction_id,
+            Faction.archetype_id,
+            Card.type_id,
+            Card.cost,
+            Card.combat_power,
+            Card.resilience,
+            Card.max_occurrence,
+            effect_count
+        )
+        .join(Faction, Faction.id == Card.faction_id)
+        .order_by(Card.id)
+    ).all()
+    columns = list(zip(*rows)) if rows else [()] * 10
+    return CardCatalog(*(np.array(column, dtype=np.int64) for column in columns))
+
+
+def _from_snapshot(snapshot: CatalogSnapshot) -> CardCatalog:
+    return CardCatalog(
+        card_id=snapshot.card_id,
+        archetype_id=snapshot.archetype_id,
+        faction_id=snapshot.faction_id,
+        faction_archetype_id=snapshot.faction_archetype_id,
+        type_id=snapshot.type_id,
+        cost=snapshot.cost,
+        combat_power=snapshot.combat_power,
+        resilience=snapshot.resilience,
+        max_occurrence=snapshot.max_occurrence,
+        effect_count=snapshot.effect_count
+    )
+
+
+def get_catalog() -> CardCatalog:
+    """Return the catalog, up to date with the cards."""
+    global _catalog, _fingerprint, _snapshot
+    snapshot = catalog_snapshots.get()
+    with _lock:
+        if snapshot is not None:
+            if snapshot is not _snapshot:
+                _catalog, _fingerprint, _snapshot = _from_snapshot(snapshot), None, snapshot
+            return _catalog
+        _snapshot = None
+        with SessionLocal() as session:
+            fingerprint = _current_fingerprint(session)
+            if _catalog is None or fingerprint != _fingerprint:
+                _catalog = _load(session)
+                _fingerprint = fingerprint
+        return _catalog
@@ -0,0 +1,274 @@
+"""
+Small query language for cards, compiled to SQLAlchemy predicates.
+
+Examples:
+    cost<=3 type:Combattant faction:Viking effect:"Charge" -bonus:*
+    (faction:Viking OR faction:Spartiate) power>=4
+    "Centurion"
+
+Terms are ANDed by default, ``OR`` combines alternatives, ``-`` negates a term
+or a parenthesised group and a bare word searches card names. Effects and
+bonuses are matched with EXISTS semi-joins on ``card_effects``/``card_bonuses``
+so no relationship is ever loaded.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+from sqlalchemy import and_, or_, not_, exists, func, select
+from server.db.schema.card import Card
+from server.db.schema.type import Type
+from server.db.schema.faction import Faction
+from server.db.schema.archetype import Archetype
+from server.db.schema.effect import Effect
+from server.db.schema.bonus import Bonus
+from server.db.schema.card_effect import CardEffect
+from server.db.schema.card_bonus import CardBonus
+
+
+NUMERIC_FIELDS = {
+    "cost": Card.cost,
+    "combat_power": Card.combat_power,
+    "resilience": Card.resilience,
+    "max_occurrence": Card.max_occurrence,
+}
+
+# Named references resolved through an indexed foreign key column
+REFERENCE_FIELDS = {
+    "type": (Card.type_id, Type),
+    "faction": (Card.faction_id, Faction),
+    "archetype": (Card.archetype_id, Archetype),
+}
+
+FIELD_ALIASES = {
+    "power": "combat_power",
+    "cp": "combat_power",
+    "res": "resilience",
+    "max": "max_occurrence",
+    "desc": "description",
+}
+
+TEXT_FIELDS = {"name", "description"}
+SET_FIELDS = {"effect", "bonus"}
+ALL_FIELDS = set(NUMERIC_FIELDS) | set(REFERENCE_FIELDS) | TEXT_FIELDS | SET_FIELDS
+
+COMPARISON_OPS = {":", "=", "!=", "<", "<=", ">", ">="}
+EQUALITY_OPS = {":", "=", "!="}
+
+FIELD_RE = re.compile(r"([A-Za-z_]+)(<=|>=|!=|:|=|<|>)")
+
+
+# AST nodes (immutable so parsed queries can be cached and shared)
+@dataclass(frozen=True)
+class Term:
+    field: str
+    op: str
+    value: str
+
+
+@dataclass(frozen=True)
+class Not:
+    child: "Node"
+
+
+@dataclass(frozen=True)
+class And:
+    children: Tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    children: Tuple["Node", ...]
+
+
+Node = Union[Term, Not, And, Or]
+
+
+def _read_value(query: str, pos: int) -> Tuple[str, int]:
+    """Read a bare or double-quoted value starting at pos."""
+    if pos < len(query) and query[pos] == '"':
+        end = pos + 1
+        chars = []
+        while end < len(query) and query[end] != '"':
+            if query[end] == "\\" and end + 1 < len(query):
+                end += 1
+            chars.append(query[end])
+            end += 1
+        if end >= len(query):
+            raise ValueError(f"Unterminated quote at position {pos}")
+        return "".join(chars), end + 1
+    end = pos
+    while end < len(query) and not query[end].isspace() and query[end] not in '()"':
+        end += 1
+    if end == pos:
+        raise ValueError(f"Missing value at position {pos}")
+    return query[pos:end], end
+
+
+def _tokenize(query: str) -> list:
+    """Split a query into (kind, payload) tokens."""
+    tokens = []
+    pos = 0
+    while pos < len(query):
+        char = query[pos]
+        if char.isspace():
+            pos += 1
+        elif char in "()":
+            tokens.append((char, None))
+            pos += 1
+        elif char == "-" and pos + 1 < len(query) and not query[pos + 1].isspace():
+            tokens.append(("-", None))
+            pos += 1
+        else:
+            match = FIELD_RE.match(query, pos)
+            if match:
+                value, pos = _read_value(query, match.end())
+                tokens.append(("term", Term(match.group(1).lower(), match.group(2), value)))
+                continue
+            quoted = char == '"'
+            value, pos = _read_value(query, pos)
+            if not quoted and value in ("OR", "|"):
+                tokens.append(("or", None))
+            elif not quoted and value == "AND":
+                continue
+            else:
+                tokens.append(("term", Term("name", ":", value)))
+    return tokens
+
+
+def _normalize_term(term: Term) -> Term:
+    """Resolve aliases and reject unknown fields or unsupported operators."""
+    field = FIELD_ALIASES.get(term.field, term.field)
+    if field not in ALL_FIELDS:
+        raise ValueError(f"Unknown field '{term.field}'")
+    if term.op not in COMPARISON_OPS:
+        raise ValueError(f"Unknown operator '{term.op}'")
+    if field in NUMERIC_FIELDS:
+        try:
+            int(term.value)
+        except ValueError:
+            raise ValueError(f"Field '{field}' expects an integer, got '{term.value}'")
+    elif term.op not in EQUALITY_OPS:
+        raise ValueError(f"Operator '{term.op}' is not supported for field '{field}'")
+    if term.value == "*" and field not in SET_FIELDS:
+        raise ValueError("Wildcard '*' is only supported for effect and bonus")
+    return Term(field, term.op, term.value)
+
+
+class _Parser:
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def parse(self) -> Optional[Node]:
+        if not self.tokens:
+            return None
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError("Unexpected ')'")
+        return node
+
+    def parse_or(self) -> Node:
+        children = [self.parse_and()]
+        while self.peek() == "or":
+            self.pos += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def parse_and(self) -> Node:
+        children = []
+        while self.peek() not in (None, "or", ")"):
+            children.append(self.parse_unary())
+        if not children:
+            raise ValueError("Expected a search term")
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def parse_unary(self) -> Node:
+        kind, payload = self.tokens[self.pos]
+        self.pos += 1
+        if kind == "-":
+            if self.peek() in (None, "or", ")"):
+                raise ValueError("Expected a term after '-'")
+            return Not(self.parse_unary())
+        if kind == "(":
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise ValueError("Missing closing ')'")
+            self.pos += 1
+            return node
+        if kind == "term":
+            return _normalize_term(payload)
+        raise ValueError(f"Unexpected '{kind}'")
+
+
+@lru_cache(maxsize=512)
+def parse_query(query: str) -> Optional[Node]:
+    """Parse a query string into an AST. Returns None for an empty query."""
+    return _Parser(_tokenize(query)).parse()
+
+
+def _compile_term(term: Term):
+    field, op, value = term.field, term.op, term.value
+
+    if field in NUMERIC_FIELDS:
+        column = NUMERIC_FIELDS[field]
+        number = int(value)
+        return {
+            ":": column == number,
+            "=": column == number,
+            "!=": column != number,
+            "<": column < number,
+            "<=": column <= number,
+            ">": column > number,
+            ">=": column >= number,
+        }[op]
+
+    if field in REFERENCE_FIELDS:
+        column, model = REFERENCE_FIELDS[field]
+        if value.isdigit():
+            clause = column == int(value)
+        else:
+            # Uncorrelated subquery on the unique name, then an indexed FK lookup
+            clause = column.in_(select(model.id).where(func.lower(model.name) == value.lower()))
+        return not_(clause) if op == "!=" else clause
+
+    if field in TEXT_FIELDS:
+        column = Card.name if field == "name" else Card.description
+        if op == ":":
+            return column.icontains(value, autoescape=True)
+        clause = func.lower(column) == value.lower()
+        return not_(clause) if op == "!=" else clause
+
+    if field == "effect":
+        clause = exists().where(CardEffect.card_id == Card.id)
+        if value.isdigit():
+            clause = clause.where(CardEffect.effect_id == int(value))
+        elif value != "*":
+            clause = clause.where(
+                CardEffect.effect_id.in_(select(Effect.id).where(func.lower(Effect.name) == value.lower()))
+            )
+    else:
+        clause = exists().where(CardBonus.card_id == Card.id)
+        if value.isdigit():
+            clause = clause.where(CardBonus.bonus_id == int(value))
+        elif value != "*":
+            clause = clause.where(
+                CardBonus.bonus_id.in_(select(Bonus.id).where(Bonus.description.icontains(value, autoescape=True)))
+            )
+    return not_(clause) if op == "!=" else clause
+
+
+def compile_query(node: Optional[Node]):
+    """Compile an AST into a SQLAlchemy boolean clause over Card (None matches everything)."""
+    if node is None:
+        return None
+    if isinstance(node, Term):
+        return _compile_term(node)
+    if isinstance(node, Not):
+        return not_(compile_query(node.child))
+    if isinstance(node, And):
+        return and_(*(compile_query(child) for child in node.children))
+    return or_(*(compile_query(child) for child in node.children))
@@ -1,12 +1,99 @@
-from typing import List, Optional
-from sqlalchemy import select
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Tuple, Any
+import numpy as np
+from sqlalchemy import select, update, delete, func, exists, tuple_, or_, case, literal, values, column, true, String
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import selectinload
-from server.db.schema.card import Card
+from server.db.schema.card import Card, normalize_search_text
 from server.db.schema.effect import Effect
 from server.db.schema.bonus import Bonus
 from server.db.schema.card_effect import CardEffect
 from server.db.schema.card_bonus import CardBonus
+from server.db.schema.deck_card import DeckCard
+from server.db.schema.deck import Deck
+from server.db.schema.card_usage import CardUsage, ArchetypeUsage
 from server.db.db_config import SessionLocal
+from server.repositories.cooccurrence_index import cooccurrence_index
+from server.repositories.card_usage import check_card_usage
+from server.repositories.deck_signatures import refresh_deck_signatures
+from server.repositories.deck_payload_cache import deck_payload_cache
+from server.repositories.change_feed import change_feed
+from server.repositories.catalog_snapshot import catalog_snapshots, CatalogSnapshot, CatalogCard, NULL
+from server.repositories.deck_stats import refresh_stats_for_cards, decks_containing, refresh_deck_stats
+from server.repositories.association_index import (
+    effect_card_index,
+    bonus_card_index,
+    bitmap_to_ids,
+    match_cards,
+)
+
+
+@dataclass
+class CardFilter:
+    """Server-side card filters. Empty lists and None values are ignored."""
+    archetype_id: Optional[int] = None
+    type_ids: List[int] = field(default_factory=list)
+    faction_ids: List[int] = field(default_factory=list)
+    cost_min: Optional[int] = None
+    cost_max: Optional[int] = None
+    combat_power_min: Optional[int] = None
+    combat_power_max: Optional[int] = None
+    resilience_min: Optional[int] = None
+    resilience_max: Optional[int] = None
+    has_effect: Optional[bool] = None
+    has_illustration: Optional[bool] = None
+
+    def conditions(self) -> list:
+        """Build the WHERE clauses for this filter (all ANDed together)."""
+        conditions = []
+        if self.archetype_id is not None:
+            conditions.append(Card.archetype_id == self.archetype_id)
+        if self.type_ids:
+            conditions.append(Card.type_id.in_(self.type_ids))
+        if self.faction_ids:
+            conditions.append(Card.faction_id.in_(self.faction_ids))
+        for column, low, high in (
+            (Card.cost, self.cost_min, self.cost_max),
+            (Card.combat_power, self.combat_power_min, self.combat_power_max),
+            (Card.resilience, self.resilience_min, self.resilience_max),
+        ):
+            if low is not None:
+                conditions.append(column >= low)
+            if high is not None:
+                conditions.append(column <= high)
+        if self.has_effect is not None:
+            has_effect = exists().where(CardEffect.card_id == Card.id)
+            conditions.append(has_effect if self.has_effect else ~has_effect)
+        if self.has_illustration is not None:
+            if self.has_illustration:
+                conditions.append(Card.illustration_id.is_not(None))
+            else:
+                conditions.append(Card.illustration_id.is_(None))
+        return conditions
+
+    def mask(self, snapshot: CatalogSnapshot) -> np.ndarray:
+        """Evaluate the same filter over a catalog snapshot's columns (a boolean array by position)."""
+        mask = np.ones(len(snapshot), dtype=bool)
+        if self.archetype_id is not None:
+            mask &= snapshot.archetype_id == self.archetype_id
+        if self.type_ids:
+            mask &= np.isin(snapshot.type_id, self.type_ids)
+        if self.faction_ids:
+            mask &= np.isin(snapshot.faction_id, self.faction_ids)
+        for column, low, high in (
+            (snapshot.cost, self.cost_min, self.cost_max),
+            (snapshot.combat_power, self.combat_power_min, self.combat_power_max),
+            (snapshot.resilience, self.resilience_min, self.resilience_max),
+        ):
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        if self.has_effect is not None:
+            mask &= (snapshot.effect_count > 0) == self.has_effect
+        if self.has_illustration is not None:
+            mask &= (snapshot.illustration_id != NULL) == self.has_illustration
+        return mask
 
 
 class CardRepository:
@@ -27,6 +114,7 @@ class CardRepository:
         with SessionLocal() as session:
             card = Card(
                 name=name,
+                search_name=normalize_search_text(name),
                 archetype_id=archetype_id,
                 type_id=type_id,
                 faction_id=faction_id,
@@ -39,6 +127,7 @@ class CardRepository:
             )
             session.add(card)
             session.commit()
+            change_feed.publish("card", "create", [card.id])
             session.refresh(card)
             
             # Eagerly load relationships to avoid DetachedInstanceError
@@ -73,15 +162,39 @@ class CardRepository:
                 session.expunge(card)
             return card
 
-    def list(self, archetype_id: Optional[int] = None, load_relationships: bool = False) -> List[Card]:
-        """Return cards in the database, optionally filtered by archetype and loading effects and bonuses."""
+    def list(
+        self,
+        archetype_id: Optional[int] = None,
+        load_relationships: bool = False,
+        filters: Optional[CardFilter] = None
+    ) -> List[CatalogCard]:
+        """
+        Return cards ordered by id, optionally filtered, with their effects and bonuses.
+        Served from the shared catalog snapshot; from the database if it can't be mapped.
+        """
+        snapshot = catalog_snapshots.get()
+        if snapshot is None:
+            return self._list_from_db(archetype_id, load_relationships, filters)
+        mask = (filters or CardFilter()).mask(snapshot)
+        if archetype_id is not None:
+            mask &= snapshot.archetype_id == archetype_id
+        return snapshot.cards(np.flatnonzero(mask))
+
+    def _list_from_db(
+        self,
+        archetype_id: Optional[int] = None,
+        load_relationships: bool = False,
+        filters: Optional[CardFilter] = None
+    ) -> List[Card]:
         with SessionLocal() as session:
             # Build base query
-            stmt = select(Card)
+            stmt = select(Card).order_by(Card.id)
             
             # Add archetype filter if provided
             if archetype_id is not None:
                 stmt = stmt.where(Card.archetype_id == archetype_id)
+            if filters is not None:
+                stmt = stmt.where(*filters.conditions())
             
             # Add relationship loading if requested
             if load_relationships:
@@ -100,6 +213,199 @@ class CardRepository:
             
             return result
 
+    def search(
+        self,
+        filters: CardFilter,
+        limit: int = 50,
+        offset: int = 0,
+        load_relationships: bool = False
+    ) -> Tuple[List[Card], int, Dict[str, List[Dict]]]:
+        """
+        Return one page of filtered cards, the total match count and facet counts.
+        
+        Facets (per type, per faction, per cost) and the total are computed in a
+        single GROUPING SETS query over the same filter as the page.
+        """
+        conditions = filters.conditions()
+        with SessionLocal() as session:
+            stmt = select(Card).where(*conditions).order_by(Card.id).limit(limit).offset(offset)
+            if load_relationships:
+                stmt = stmt.options(
+                    selectinload(Card.effects),
+                    selectinload(Card.bonuses)
+                )
+            cards = session.execute(stmt).scalars().all()
+            for card in cards:
+                _ = card.effects
+                _ = card.bonuses
+                session.expunge(card)
+            
+            # GROUPING() returns a bitmask of the columns *not* grouped in a row:
+            # 0b011 -> per type, 0b101 -> per faction, 0b110 -> per cost, 0b111 -> total
+            facet_stmt = (
+                select(
+                    Card.type_id,
+                    Card.faction_id,
+                    Card.cost,
+                    func.grouping(Card.type_id, Card.faction_id, Card.cost).label("grouping"),
+                    func.count().label("count")
+                )
+                .where(*conditions)
+                .group_by(func.grouping_sets(
+                    tuple_(Card.type_id),
+                    tuple_(Card.faction_id),
+                    tuple_(Card.cost),
+                    tuple_()
+                ))
+            )
+            
+            total = 0
+            facets = {"types": [], "factions": [], "costs": []}
+            for row in session.execute(facet_stmt):
+                if row.grouping == 0b011:
+                    facets["types"].append({"id": row.type_id, "count": row.count})
+                elif row.grouping == 0b101:
+                    facets["factions"].append({"id": row.faction_id, "count": row.count})
+                elif row.grouping == 0b110:
+                    facets["costs"].append({"cost": row.cost, "count": row.count})
+                elif row.grouping == 0b111:
+                    total = row.count
+            
+            facets["types"].sort(key=lambda f: f["id"])
+            facets["factions"].sort(key=lambda f: f["id"])
+            facets["costs"].sort(key=lambda f: f["cost"])
+            return list(cards), total, facets
+
+    def autocomplete(self, query: str, limit: int = 10, archetype_id: Optional[int] = None) -> List[Dict]:
+        """
+        Return the best name matches for a typeahead query.
+        
+        Matching is accent- and case-insensitive on the normalized name: prefix and
+        word-prefix matches rank first, then trigram word similarity, then how many
+        decks use the card. Served by the pg_trgm GIN index on cards.search_name.
+        """
+        term = normalize_search_text(query)
+        if not term:
+            return []
+        is_prefix = Card.search_name.startswith(term, autoescape=True)
+        is_word_prefix = Card.search_name.contains(f" {term}", autoescape=True)
+        deck_count = (
+            select(func.coalesce(func.sum(CardUsage.decks), 0))
+            .where(CardUsage.card_id == Card.id)
+            .correlate(Card)
+            .scalar_subquery()
+        )
+        with SessionLocal() as session:
+            stmt = (
+                select(
+                    Card.id,
+                    Card.name,
+                    Card.archetype_id,
+                    Card.type_id,
+                    Card.cost,
+                    deck_count.label("deck_count")
+                )
+                # %> is "word similar to" (the commutator of <%) and uses the trigram index
+                .where(or_(is_prefix, is_word_prefix, Card.search_name.op("%>")(term)))
+                .order_by(
+                    case((is_prefix, 0), (is_word_prefix, 1), else_=2),
+                    func.word_similarity(literal(term), Card.search_name).desc(),
+                    deck_count.desc(),
+                    Card.name
+                )
+                .limit(limit)
+            )
+            if archetype_id is not None:
+                stmt = stmt.where(Card.archetype_id == archetype_id)
+            return [dict(row._mapping) for row in session.execute(stmt)]
+
+    def resolve_names(self, names: List[str], candidates: int = 3) -> Dict[str, List[Dict]]:
+        """
+        Resolve many card names at once, in one query.
+        
+        Names are normalized like search_name. Each name gets up to `candidates`
+        cards: exact normalized matches first (score 1.0), then trigram-similar
+        names (pg_trgm % operator, served by the GIN index) by similarity.
+        Returns {name: [{id, name, archetype_id, max_occurrence, exact, score}]}.
+        """
+        terms = sorted({normalize_search_text(name) for name in names} - {""})
+        if not terms:
+            return {name: [] for name in names}
+        wanted = values(column("term", String), name="wanted").data([(term,) for term in terms])
+        is_exact = Card.search_name == wanted.c.term
+        matches = (
+            select(
+                Card.id,
+                Card.name,
+                Card.archetype_id,
+                Card.max_occurrence,
+                is_exact.label("exact"),
+                case((is_exact, 1.0), else_=func.similarity(Card.search_name, wanted.c.term)).label("score")
+            )
+            .where(or_(is_exact, Card.search_name.op("%")(wanted.c.term)))
+            .order_by(is_exact.desc(), func.similarity(Card.search_name, wanted.c.term).desc(), Card.id)
+            .limit(candidates)
+            .lateral("matches")
+        )
+        stmt = (
+            select(wanted.c.term, matches)
+            .select_from(wanted)
+            .join(matches, true())
+        )
+        with SessionLocal() as session:
+            resolved: Dict[str, List[Dict]] = {term: [] for term in terms}
+            for row in session.execute(stmt):
+                match = dict(row._mapping)
+                resolved[match.pop("term")].append(match)
+        return {name: resolved.get(normalize_search_text(name), []) for name in names}
+
+    def query(
+        self,
+        condition=None,
+        limit: int = 50,
+        offset: int = 0,
+        load_relationships: bool = False
+    ) -> List[Card]:
+        """Return cards matching a compiled query condition (see card_query.compile_query)."""
+        with SessionLocal() as session:
+            stmt = select(Card).order_by(Card.id).limit(limit).offset(offset)
+            if condition is not None:
+                stmt = stmt.where(condition)
+            if load_relationships:
+                stmt = stmt.options(
+                    selectinload(Card.effects),
+                    selectinload(Card.bonuses)
+                )
+            cards = session.execute(stmt).scalars().all()
+            for card in cards:
+                _ = card.effects
+                _ = card.bonuses
+                session.expunge(card)
+            return list(cards)
+
+    def explain(self, condition=None, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """Return the SQL generated for a compiled query condition and the planner's estimate."""
+        stmt = select(Card).order_by(Card.id).limit(limit).offset(offset)
+        if condition is not None:
+            stmt = stmt.where(condition)
+        with SessionLocal() as session:
+            # Literal values come from the parsed query and are escaped by the dialect;
+            # the named paramstyle renders plain '%' so the returned SQL is runnable as-is
+            sql = str(stmt.compile(
+                dialect=postgresql.dialect(paramstyle="named"),
+                compile_kwargs={"literal_binds": True}
+            ))
+            # The driver still parses '%' placeholders, so escape them for execution
+            explain_sql = "EXPLAIN (FORMAT JSON) " + sql.replace("%", "%%")
+            plan = session.connection().exec_driver_sql(explain_sql).scalar()
+            root = plan[0]["Plan"]
+            return {
+                "sql": sql,
+                "estimated_cost": root["Total Cost"],
+                "estimated_rows": root["Plan Rows"],
+                "plan": root,
+            }
+
     def update(
         self,
         card_id: int,
@@ -122,6 +428,7 @@ class CardRepository:
             
             if name is not None:
                 card.name = name
+                card.search_name = normalize_search_text(name)
             if archetype_id is not None:
                 card.archetype_id = archetype_id
             if type_id is not None:
@@ -141,7 +448,12 @@ class CardRepository:
             if description is not None:
                 card.description = description
             
+            if any(value is not None for value in (type_id, cost, max_occurrence, archetype_id)):
+                session.flush()
+                refresh_stats_for_cards(session, [card_id])
             session.commit()
+            deck_payload_cache.invalidate("card", [card_id])
+            change_feed.publish("card", "update", [card_id])
             session.refresh(card)
             
             # Eagerly load relationships to avoid DetachedInstanceError
@@ -158,10 +470,98 @@ class CardRepository:
             card = session.get(Card, card_id)
             if not card:
                 return False
+            deck_ids = decks_containing(session, [card_id])
             session.delete(card)
+            session.flush()
+            refresh_deck_stats(session, deck_ids)
+            refresh_deck_signatures(session, deck_ids)
             session.commit()
+            deck_payload_cache.invalidate("card", [card_id])
+            effect_card_index.remove_card(card_id)
+            bonus_card_index.remove_card(card_id)
+            change_feed.publish("card", "delete", [card_id])
+            change_feed.publish("deck", "cards", deck_ids)
+            if deck_ids:
+                # Rare: rebuild co-occurrences rather than replaying every affected deck
+                cooccurrence_index.invalidate(notify=True)
             return True
 
+    def bulk_update(
+        self,
+        conditions: list,
+        values: Dict[str, Any],
+        increments: Dict[str, int],
+        dry_run: bool = False
+    ) -> List[int]:
+        """
+        Update every card matching the conditions in a single UPDATE ... WHERE.
+        Values are assigned as-is and increments are added to the current column value.
+        Returns the affected card IDs; with dry_run nothing is modified.
+        Raises ValueError (and rolls back) if a stat would end up out of range.
+        """
+        with SessionLocal() as session:
+            if dry_run:
+                stmt = select(Card.id).where(*conditions).order_by(Card.id)
+                return list(session.scalars(stmt).all())
+            
+            assignments = dict(values)
+            for field_name, delta in increments.items():
+                assignments[field_name] = getattr(Card, field_name) + delta
+            stmt = (
+                update(Card)
+                .where(*conditions)
+                .values(**assignments)
+                .returning(Card.id, Card.cost, Card.combat_power, Card.resilience, Card.max_occurrence)
+                .execution_options(synchronize_session=False)
+            )
+            rows = session.execute(stmt).all()
+            for row in rows:
+                if min(row.cost, row.combat_power, row.resilience) < 0 or row.max_occurrence < 1:
+                    session.rollback()
+                    raise ValueError(f"Update would leave card {row.id} with a negative stat or max_occurrence below 1")
+            if assignments.keys() & {"type_id", "cost", "max_occurrence", "archetype_id"}:
+                refresh_stats_for_cards(session, [row.id for row in rows])
+            session.commit()
+            card_ids = sorted(row.id for row in rows)
+            deck_payload_cache.invalidate("card", card_ids)
+            change_feed.publish("card", "update", card_ids)
+            return card_ids
+
+    def bulk_delete(self, conditions: list, dry_run: bool = False) -> List[int]:
+        """
+        Delete every card matching the conditions in a single DELETE ... WHERE.
+        Deck, effect and bonus associations are removed by the database cascades.
+        Returns the deleted card IDs; with dry_run nothing is deleted.
+        """
+        with SessionLocal() as session:
+            if dry_run:
+                stmt = select(Card.id).where(*conditions).order_by(Card.id)
+                return list(session.scalars(stmt).all())
+            
+            deck_ids = session.scalars(
+                select(DeckCard.deck_id)
+                .where(DeckCard.card_id.in_(select(Card.id).where(*conditions)))
+                .distinct()
+            ).all()
+            stmt = (
+                delete(Card)
+                .where(*conditions)
+                .returning(Card.id)
+                .execution_options(synchronize_session=False)
+            )
+            card_ids = sorted(session.scalars(stmt).all())
+            refresh_deck_stats(session, deck_ids)
+            refresh_deck_signatures(session, deck_ids)
+            session.commit()
+            deck_payload_cache.invalidate("card", card_ids)
+            effect_card_index.remove_cards(card_ids)
+            bonus_card_index.remove_cards(card_ids)
+            change_feed.publish("card", "delete", card_ids)
+            change_feed.publish("deck", "cards", deck_ids)
+            if deck_ids:
+                cooccurrence_index.invalidate(notify=True)
+            return card_ids
+
     def add_effect(self, card_id: int, effect_id: int) -> bool:
         """Add an effect to a card via CardEffect association."""
         with SessionLocal() as session:
@@ -180,6 +580,8 @@ class CardRepository:
             card_effect = CardEffect(card_id=card_id, effect_id=effect_id)
             session.add(card_effect)
             session.commit()
+            effect_card_index.add(effect_id, card_id)
+            change_feed.publish("card", "update", [card_id])
             return True
 
     def remove_effect(self, card_id: int, effect_id: int) -> bool:
@@ -190,6 +592,8 @@ class CardRepository:
                 return False
             session.delete(card_effect)
             session.commit()
+            effect_card_index.remove(effect_id, card_id)
+            change_feed.publish("card", "update", [card_id])
             return True
 
     def add_bonus(self, card_id: int, bonus_id: int) -> bool:
@@ -210,6 +614,8 @@ class CardRepository:
             card_bonus = CardBonus(card_id=card_id, bonus_id=bonus_id)
             session.add(card_bonus)
             session.commit()
+            bonus_card_index.add(bonus_id, card_id)
+            change_feed.publish("card", "update", [card_id])
             return True
 
     def remove_bonus(self, card_id: int, bonus_id: int) -> bool:
@@ -220,6 +626,8 @@ class CardRepository:
                 return False
             session.delete(card_bonus)
             session.commit()
+            bonus_card_index.remove(bonus_id, card_id)
+            change_feed.publish("card", "update", [card_id])
             return True
 
     def get_card_effects(self, card_id: int) -> List[Effect]:
@@ -250,4 +658,106 @@ class CardRepository:
                 for bonus in bonuses:
                     session.expunge(bonus)
                 return bonuses
-            return []
\ No newline at end of file
+            return []
+
+    def get_many(self, card_ids: List[int], load_relationships: bool = False) -> List[Card]:
+        """Return the cards with the given IDs, in the order given."""
+        if not card_ids:
+            return []
+        with SessionLocal() as session:
+            stmt = select(Card).where(Card.id.in_(card_ids))
+            if load_relationships:
+                stmt = stmt.options(
+                    selectinload(Card.effects),
+                    selectinload(Card.bonuses)
+                )
+            cards = {card.id: card for card in session.execute(stmt).scalars().all()}
+            for card in cards.values():
+                _ = card.effects
+                _ = card.bonuses
+                session.expunge(card)
+            return [cards[card_id] for card_id in card_ids if card_id in cards]
+
+    def get_effect_card_ids(self, effect_id: int) -> Optional[List[int]]:
+        """Return the IDs of cards having an effect (from the reverse index), or None if the effect doesn't exist."""
+        bitmap = effect_card_index.get(effect_id)
+        if not bitmap:
+            with SessionLocal() as session:
+                if not session.get(Effect, effect_id):
+                    return None
+        return bitmap_to_ids(bitmap)
+
+    def get_bonus_card_ids(self, bonus_id: int) -> Optional[List[int]]:
+        """Return the IDs of cards having a bonus (from the reverse index), or None if the bonus doesn't exist."""
+        bitmap = bonus_card_index.get(bonus_id)
+        if not bitmap:
+            with SessionLocal() as session:
+                if not session.get(Bonus, bonus_id):
+                    return None
+        return bitmap_to_ids(bitmap)
+
+    def match_card_ids(
+        self,
+        all_effects: List[int],
+        any_effects: List[int],
+        no_effects: List[int],
+        all_bonuses: List[int],
+        any_bonuses: List[int],
+        no_bonuses: List[int]
+    ) -> List[int]:
+        """Return the IDs of cards matching an AND/OR/NOT combination of effects and bonuses."""
+        return match_cards(all_effects, any_effects, no_effects, all_bonuses, any_bonuses, no_bonuses)
+
+    def list_decks(self, card_id: int, limit: int = 50, offset: int = 0) -> Optional[Tuple[List[Dict], int]]:
+        """
+        Return one page of the decks playing a card ([{deck_id, name, archetype_id, quantity}],
+        newest deck first) and their total count, or None if the card doesn't exist.
+        The page is read through the deck_cards.card_id index and the total from card_usage.
+        """
+        with SessionLocal() as session:
+            if session.get(Card, card_id) is None:
+                return None
+            rows = session.execute(
+                select(DeckCard.deck_id, Deck.name, Deck.archetype_id, DeckCard.quantity)
+                .join(Deck, Deck.id == DeckCard.deck_id)
+                .where(DeckCard.card_id == card_id)
+                .order_by(DeckCard.deck_id.desc())
+                .limit(limit)
+                .offset(offset)
+            ).all()
+            total = session.scalar(
+                select(func.coalesce(func.sum(CardUsage.decks), 0)).where(CardUsage.card_id == card_id)
+            )
+            return [dict(row._mapping) for row in rows], total
+
+    def get_usage_snapshot(self) -> Tuple[List[Dict], Dict[int, int]]:
+        """
+        Read the card usage counters: [{card_id, name, archetype_id, usage_archetype_id, decks, copies}]
+        for every card (one row per deck archetype playing it, or one row with
+        usage_archetype_id None if no deck does) and {archetype_id: number of decks}.
+        """
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(
+                    Card.id.label("card_id"),
+                    Card.name,
+                    Card.archetype_id,
+                    CardUsage.archetype_id.label("usage_archetype_id"),
+                    func.coalesce(CardUsage.decks, 0).label("decks"),
+                    func.coalesce(CardUsage.copies, 0).label("copies")
+                )
+                .outerjoin(CardUsage, (CardUsage.card_id == Card.id) & (CardUsage.decks > 0))
+                .order_by(Card.id, CardUsage.archetype_id)
+            ).all()
+            archetypes = dict(session.execute(
+                select(ArchetypeUsage.archetype_id, ArchetypeUsage.decks).where(ArchetypeUsage.decks > 0)
+            ).all())
+            return [dict(row._mapping) for row in rows], archetypes
+
+    def check_usage(self, rebuild: bool = False) -> Dict[str, Any]:
+        """Check the card usage counters against deck_cards, optionally rebuilding them."""
+        return check_card_usage(rebuild=rebuild)
+
+    def get_snapshot_stats(self) -> Dict[str, Any]:
+        """Describe the catalog snapshot this process maps."""
+        return catalog_snapshots.get_stats()
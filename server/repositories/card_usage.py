@@ -0,0 +1,154 @@
+"""
+Maintenance of the card usage snapshot (card_usage and archetype_usage tables).
+
+card_usage holds, per card and deck archetype, the number of decks playing the
+card and the copies they play in total; archetype_usage holds the number of
+decks of each archetype. Inclusion rates and average copies for the meta report
+are ratios of these counters, so reading the report never aggregates deck_cards.
+
+Every write that changes a deck's contents, creates or deletes a deck, or moves
+it to another archetype calls record_deck_change with the deck's state before
+and after, in the session of the write and before committing. The change is
+applied as counter increments (one upsert per table), so its cost depends on
+the deck, not on the number of decks. Deleting a card removes its usage rows by
+cascade.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from server.db.schema.deck import Deck
+from server.db.schema.deck_card import DeckCard
+from server.db.schema.card_usage import CardUsage, ArchetypeUsage
+from server.db.db_config import SessionLocal
+
+
+def _usage_deltas(
+    before_archetype: Optional[int],
+    before: Dict[int, int],
+    after_archetype: Optional[int],
+    after: Dict[int, int]
+) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    """(card_id, archetype_id) -> (decks delta, copies delta), zero deltas left out."""
+    deltas = defaultdict(lambda: [0, 0])
+    if before_archetype is not None:
+        for card_id, quantity in before.items():
+            if quantity:
+                deltas[card_id, before_archetype][0] -= 1
+                deltas[card_id, before_archetype][1] -= quantity
+    if after_archetype is not None:
+        for card_id, quantity in after.items():
+            if quantity:
+                deltas[card_id, after_archetype][0] += 1
+                deltas[card_id, after_archetype][1] += quantity
+    return {key: tuple(delta) for key, delta in deltas.items() if delta != [0, 0]}
+
+
+def record_deck_change(
+    session,
+    before_archetype: Optional[int],
+    before: Dict[int, int],
+    after_archetype: Optional[int],
+    after: Dict[int, int]
+):
+    """
+    Apply one deck's change to the usage counters inside the caller's transaction.
+    The archetype is None on the side where the deck doesn't exist (before a
+    creation, after a deletion); contents are {card_id: quantity}.
+    """
+    deltas = _usage_deltas(before_archetype, before, after_archetype, after)
+    if deltas:
+        # Sorted so that concurrent writers lock the counter rows in the same order
+        stmt = insert(CardUsage).values([
+            {"card_id": card_id, "archetype_id": archetype_id, "decks": decks, "copies": copies}
+            for (card_id, archetype_id), (decks, copies) in sorted(deltas.items())
+        ])
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[CardUsage.card_id, CardUsage.archetype_id],
+            set_={
+                "decks": CardUsage.decks + stmt.excluded.decks,
+                "copies": CardUsage.copies + stmt.excluded.copies
+            }
+        ))
+        session.execute(delete(CardUsage).where(
+            CardUsage.card_id.in_({card_id for card_id, _ in deltas}),
+            CardUsage.decks == 0
+        ))
+
+    if before_archetype != after_archetype:
+        counts = {before_archetype: -1, after_archetype: 1}
+        stmt = insert(ArchetypeUsage).values([
+            {"archetype_id": archetype_id, "decks": delta}
+            for archetype_id, delta in counts.items()
+            if archetype_id is not None
+        ])
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[ArchetypeUsage.archetype_id],
+            set_={"decks": ArchetypeUsage.decks + stmt.excluded.decks}
+        ))
+
+
+def _card_usage_query():
+    """SELECT aggregating card_usage rows from deck_cards."""
+    return (
+        select(DeckCard.card_id, Deck.archetype_id, func.count(), func.sum(DeckCard.quantity))
+        .join(Deck, Deck.id == DeckCard.deck_id)
+        .group_by(DeckCard.card_id, Deck.archetype_id)
+    )
+
+
+def _archetype_usage_query():
+    """SELECT aggregating archetype_usage rows from decks."""
+    return select(Deck.archetype_id, func.count()).group_by(Deck.archetype_id)
+
+
+def check_card_usage(rebuild: bool = False) -> Dict[str, Any]:
+    """
+    Compare the usage counters with a full aggregation of deck_cards.
+    Returns the cards and archetypes whose counters are wrong; with rebuild,
+    replaces both tables with the aggregation.
+    """
+    with SessionLocal() as session:
+        expected_cards = {
+            (card_id, archetype_id): (decks, int(copies))
+            for card_id, archetype_id, decks, copies in session.execute(_card_usage_query())
+        }
+        actual_cards = {
+            (row.card_id, row.archetype_id): (row.decks, row.copies)
+            for row in session.scalars(select(CardUsage)).all()
+            if row.decks
+        }
+        expected_archetypes = dict(session.execute(_archetype_usage_query()).all())
+        actual_archetypes = {
+            row.archetype_id: row.decks
+            for row in session.scalars(select(ArchetypeUsage)).all()
+            if row.decks
+        }
+        mismatched_cards = sorted({
+            card_id for card_id, archetype_id in expected_cards.keys() | actual_cards.keys()
+            if expected_cards.get((card_id, archetype_id)) != actual_cards.get((card_id, archetype_id))
+        })
+        mismatched_archetypes = sorted(
+            archetype_id for archetype_id in expected_archetypes.keys() | actual_archetypes.keys()
+            if expected_archetypes.get(archetype_id) != actual_archetypes.get(archetype_id)
+        )
+        rebuilt = rebuild and bool(mismatched_cards or mismatched_archetypes)
+        if rebuilt:
+            # Block concurrent counter updates until the rebuilt tables are committed;
+            # writers that already updated them are waited for, later ones apply on top
+            session.execute(text("LOCK TABLE card_usage, archetype_usage IN EXCLUSIVE MODE"))
+            session.execute(delete(CardUsage))
+            session.execute(delete(ArchetypeUsage))
+            session.execute(insert(CardUsage).from_select(
+                ["card_id", "archetype_id", "decks", "copies"], _card_usage_query()
+            ))
+            session.execute(insert(ArchetypeUsage).from_select(
+                ["archetype_id", "decks"], _archetype_usage_query()
+            ))
+            session.commit()
+        return {
+            "checked_cards": len(expected_cards.keys() | actual_cards.keys()),
+            "mismatched_card_ids": mismatched_cards,
+            "mismatched_archetype_ids": mismatched_archetypes,
+            "rebuilt": rebuilt
+        }
@@ -0,0 +1,372 @@
+"""
+Immutable, memory-mapped snapshot of the card catalog shared by the worker processes of a host.
+
+The cards, effects, bonuses and their associations are materialised into one
+file of column arrays: a NumPy array per card attribute (indexed by catalog
+position, cards ordered by id), the effect and bonus ids, the card/effect and
+card/bonus links as offsets into those (card i's effects are
+card_effects[card_effect_offsets[i]:card_effect_offsets[i + 1]]), and a string
+table holding every name and description as UTF-8. Every worker maps the
+current file read-only and reads the columns in place: the catalog exists once
+in the page cache however many workers there are, and listing cards needs no
+database round trip.
+
+File layout: MAGIC, the header length (uint64), a JSON header (version, as_of,
+and each column's dtype, offset and length), then the 8-byte aligned columns.
+A snapshot file is never modified. A rebuild writes catalog-<version>.snap
+beside it and then replaces the "current" pointer file, so a new version
+appears atomically; workers still reading an older file keep their mapping.
+
+Snapshots live in CATALOG_SNAPSHOT_DIR if set, else in a temporary directory
+named after a hash of the database URL, so workers of different databases on
+one host never share a file.
+
+Staleness: a worker marks its snapshot stale when it sees a card, effect,
+bonus, faction or illustration change on the change feed (deleting an
+illustration clears the cards' illustration_id without a card event), its own
+or another worker's (change_notifier), noting the time it saw it. as_of is the time a build
+started reading the database, so a snapshot with as_of later than that
+includes the change. On the next read, the worker maps the current file if it
+is recent enough, or rebuilds it under an exclusive file lock: one worker
+builds, the others map its result. Changes made outside the API (scripts,
+psql) are only picked up after a later change or a restart.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from server.db.schema.card import Card
+from server.db.schema.faction import Faction
+from server.db.schema.effect import Effect
+from server.db.schema.bonus import Bonus
+from server.db.schema.card_effect import CardEffect
+from server.db.schema.card_bonus import CardBonus
+from server.db.db_config import SessionLocal, engine
+from server.repositories.change_feed import change_feed
+
+logger = logging.getLogger(__name__)
+
+_DATABASE_KEY = hashlib.sha256(engine.url.render_as_string(hide_password=True).encode()).hexdigest()[:12]
+SNAPSHOT_DIR = Path(
+    os.environ.get("CATALOG_SNAPSHOT_DIR") or Path(tempfile.gettempdir()) / f"ascendance-catalog-{_DATABASE_KEY}"
+)
+MAGIC = b"ACATSNP1"
+ALIGNMENT = 8
+NULL = -1  # illustration_id and string reference of a missing value
+
+# Changes to these entities alter the snapshot's columns
+ENTITIES = ("card", "effect", "bonus", "faction", "illustration")
+
+CARD_COLUMNS = (
+    "card_id", "archetype_id", "type_id", "faction_id", "faction_archetype_id", "cost",
+    "combat_power", "resilience", "illustration_id", "max_occurrence", "name_ref", "description_ref"
+)
+
+
+@dataclass(frozen=True)
+class CatalogEffect:
+    id: int
+    name: str
+    description: str
+
+
+@dataclass(frozen=True)
+class CatalogBonus:
+    id: int
+    description: str
+
+
+@dataclass(frozen=True)
+class CatalogCard:
+    """A card read from the snapshot, with the attributes of the Card model that API responses use."""
+    id: int
+    name: str
+    archetype_id: int
+    type_id: int
+    faction_id: int
+    cost: int
+    combat_power: int
+    resilience: int
+    illustration_id: Optional[int]
+    max_occurrence: int
+    description: Optional[str]
+    effects: List[CatalogEffect]
+    bonuses: List[CatalogBonus]
+
+
+class CatalogSnapshot:
+    """A mapped snapshot file. Column attributes are read-only views of the mapping."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        header_length = int.from_bytes(self._map[len(MAGIC):len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        header = json.loads(self._map[start:start + header_length])
+        self.version: int = header["version"]
+        self.as_of: int = header["as_of"]
+        self.size = len(self._map)
+        self._strings_offset = header["columns"]["string_data"][1]
+        self._columns: Dict[str, np.ndarray] = {}
+        for name, (dtype, offset, length) in header["columns"].items():
+            # frombuffer doesn't accept an empty slice at the very end of the mapping
+            column = np.frombuffer(self._map, dtype=dtype, count=length, offset=offset) if length else np.empty(0, dtype)
+            self._columns[name] = column
+            setattr(self, name, column)
+
+    def __len__(self) -> int:
+        return len(self._columns["card_id"])
+
+    @property
+    def effect_count(self) -> np.ndarray:
+        return np.diff(self._columns["card_effect_offsets"])
+
+    def strings(self, refs: np.ndarray) -> List[Optional[str]]:
+        """Decode string table entries (NULL gives None)."""
+        offsets = self._columns["string_offsets"]
+        base = self._strings_offset
+        return [
+            None if ref == NULL else self._map[base + start:base + end].decode()
+            for ref, start, end in zip(refs.tolist(), offsets[refs].tolist(), offsets[refs + 1].tolist())
+        ]
+
+    def _links(self, positions: np.ndarray, offsets: np.ndarray, links: np.ndarray) -> List[List[int]]:
+        """The linked effect/bonus positions of each card at positions."""
+        return [links[start:end].tolist() for start, end in zip(offsets[positions].tolist(), offsets[positions + 1].tolist())]
+
+    def cards(self, positions) -> List[CatalogCard]:
+        """Decode the cards at these catalog positions, with their effects and bonuses."""
+        c = self._columns
+        positions = np.asarray(positions, dtype=np.int64)
+        card_effects, card_bonuses = (
+            self._links(positions, c["card_effect_offsets"], c["card_effects"]),
+            self._links(positions, c["card_bonus_offsets"], c["card_bonuses"])
+        )
+
+        used = np.unique(np.array([e for effects in card_effects for e in effects], dtype=np.int64))
+        effects = dict(zip(used.tolist(), map(CatalogEffect,
+            c["effect_id"][used].tolist(), self.strings(c["effect_name_ref"][used]), self.strings(c["effect_description_ref"][used])
+        )))
+        used = np.unique(np.array([b for bonuses in card_bonuses for b in bonuses], dtype=np.int64))
+        bonuses = dict(zip(used.tolist(), map(CatalogBonus,
+            c["bonus_id"][used].tolist(), self.strings(c["bonus_description_ref"][used])
+        )))
+
+        columns = zip(
+            *(c[name][positions].tolist() for name in CARD_COLUMNS[:-2]),
+            self.strings(c["name_ref"][positions]),
+            self.strings(c["description_ref"][positions]),
+            card_effects,
+            card_bonuses
+        )
+        return [
+            CatalogCard(
+                id=card_id,
+                name=name,
+                archetype_id=archetype_id,
+                type_id=type_id,
+                faction_id=faction_id,
+                cost=cost,
+                combat_power=combat_power,
+                resilience=resilience,
+                illustration_id=None if illustration_id == NULL else illustration_id,
+                max_occurrence=max_occurrence,
+                description=description,
+                effects=[effects[e] for e in effect_positions],
+                bonuses=[bonuses[b] for b in bonus_positions]
+            )
+            for (card_id, archetype_id, type_id, faction_id, _, cost, combat_power, resilience, illustration_id,
+                 max_occurrence, name, description, effect_positions, bonus_positions) in columns
+        ]
+
+
+class _StringTable:
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.offsets = [0]
+
+    def add(self, text: Optional[str]) -> int:
+        if text is None:
+            return NULL
+        self.parts.append(text.encode())
+        self.offsets.append(self.offsets[-1] + len(self.parts[-1]))
+        return len(self.parts) - 1
+
+
+def _link_columns(rows, card_ids: np.ndarray, key_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(offsets, key positions) of (card_id, key_id) rows sorted by card_id."""
+    card_positions = np.searchsorted(card_ids, np.array([card_id for card_id, _ in rows], dtype=np.int64))
+    key_positions = np.searchsorted(key_ids, np.array([key for _, key in rows], dtype=np.int64))
+    offsets = np.zeros(len(card_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(card_positions, minlength=len(card_ids)), out=offsets[1:])
+    return offsets, key_positions.astype(np.int64)
+
+
+def _load_columns() -> Dict[str, np.ndarray]:
+    """Read the catalog in one consistent database snapshot and encode it as columns."""
+    strings = _StringTable()
+    with SessionLocal() as session:
+        session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        cards = session.execute(
+            select(
+                Card.id, Card.archetype_id, Card.type_id, Card.faction_id, Faction.archetype_id, Card.cost,
+                Card.combat_power, Card.resilience, Card.illustration_id, Card.max_occurrence,
+                Card.name, Card.description
+            )
+            .join(Faction, Faction.id == Card.faction_id)
+            .order_by(Card.id)
+        ).all()
+        effects = session.execute(select(Effect.id, Effect.name, Effect.description).order_by(Effect.id)).all()
+        bonuses = session.execute(select(Bonus.id, Bonus.description).order_by(Bonus.id)).all()
+        effect_links = session.execute(
+            select(CardEffect.card_id, CardEffect.effect_id).order_by(CardEffect.card_id, CardEffect.effect_id)
+        ).all()
+        bonus_links = session.execute(
+            select(CardBonus.card_id, CardBonus.bonus_id).order_by(CardBonus.card_id, CardBonus.bonus_id)
+        ).all()
+
+    rows = [
+        (*row[:8], NULL if row[8] is None else row[8], row[9], strings.add(row[10]), strings.add(row[11]))
+        for row in cards
+    ]
+    columns = {
+        name: np.array(column, dtype=np.int64)
+        for name, column in zip(CARD_COLUMNS, zip(*rows) if rows else [()] * len(CARD_COLUMNS))
+    }
+    columns["effect_id"] = np.array([row[0] for row in effects], dtype=np.int64)
+    columns["effect_name_ref"] = np.array([strings.add(row[1]) for row in effects], dtype=np.int64)
+    columns["effect_description_ref"] = np.array([strings.add(row[2]) for row in effects], dtype=np.int64)
+    columns["bonus_id"] = np.array([row[0] for row in bonuses], dtype=np.int64)
+    columns["bonus_description_ref"] = np.array([strings.add(row[1]) for row in bonuses], dtype=np.int64)
+    columns["card_effect_offsets"], columns["card_effects"] = _link_columns(effect_links, columns["card_id"], columns["effect_id"])
+    columns["card_bonus_offsets"], columns["card_bonuses"] = _link_columns(bonus_links, columns["card_id"], columns["bonus_id"])
+    columns["string_offsets"] = np.array(strings.offsets, dtype=np.int64)
+    columns["string_data"] = np.frombuffer(b"".join(strings.parts), dtype=np.uint8)
+    return columns
+
+
+def _write(path: Path, version: int, as_of: int, columns: Dict[str, np.ndarray]):
+    """Write a snapshot file (to a temporary name, then renamed into place)."""
+    def aligned(n: int) -> int:
+        return -(-n // ALIGNMENT) * ALIGNMENT
+
+    # Column offsets are absolute and depend on the header's length: lay the
+    # columns out again until the header stops growing.
+    start, header = 0, b""
+    while start < len(MAGIC) + 8 + len(header):
+        start = aligned(len(MAGIC) + 8 + len(header))
+        layout, offset = {}, start
+        for name, column in columns.items():
+            layout[name] = [column.dtype.str, offset, len(column)]
+            offset = aligned(offset + column.nbytes)
+        header = json.dumps({"version": version, "as_of": as_of, "columns": layout}, separators=(",", ":")).encode()
+
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, column in columns.items():
+            f.write(b"\0" * (layout[name][1] - f.tell()))
+            f.write(np.ascontiguousarray(column).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+class CatalogSnapshotStore:
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._stale_since = time.time_ns()  # changes made before this process started are unknown
+        self._lock = threading.Lock()  # one refresh at a time in the process
+        self._mark_lock = threading.Lock()
+        self.builds = 0
+        self.maps = 0
+        change_feed.subscribe(self._on_change)
+
+    def _on_change(self, entity: str, op: str, ids: List[int], version: int, remote: bool):
+        if entity in ENTITIES:
+            self.invalidate()
+
+    def invalidate(self):
+        """Mark the mapped snapshot stale: the next read maps or builds a newer one."""
+        with self._mark_lock:
+            self._stale_since = max(self._stale_since, time.time_ns())
+
+    def get(self) -> Optional[CatalogSnapshot]:
+        """The current snapshot, refreshed if stale; None if the snapshot directory is unusable."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.as_of > self._stale_since:
+            return snapshot
+        with self._lock:
+            stale_since = self._stale_since
+            if self._snapshot is None or self._snapshot.as_of <= stale_since:
+                try:
+                    self._snapshot = self._refresh(stale_since)
+                except OSError:
+                    logger.exception("Could not map the catalog snapshot in %s", self.directory)
+                    return None
+            return self._snapshot
+
+    def _refresh(self, stale_since: int) -> CatalogSnapshot:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / "lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file is closed
+            current = self._open_current()
+            if current is not None and current.as_of > stale_since:
+                if self._snapshot is None or current.path != self._snapshot.path:
+                    self.maps += 1
+                return current
+            return self._build(current.version + 1 if current is not None else 1)
+
+    def _open_current(self) -> Optional[CatalogSnapshot]:
+        try:
+            name = (self.directory / "current").read_text().strip()
+            if self._snapshot is not None and self._snapshot.path.name == name:
+                return self._snapshot
+            return CatalogSnapshot(self.directory / name)
+        except (OSError, ValueError, KeyError):
+            return None  # no snapshot yet, or an unreadable one: rebuild
+
+    def _build(self, version: int) -> CatalogSnapshot:
+        as_of = time.time_ns()
+        path = self.directory / f"catalog-{version}.snap"
+        _write(path, version, as_of, _load_columns())
+        pointer = self.directory / "current.tmp"
+        pointer.write_text(path.name)
+        os.replace(pointer, self.directory / "current")
+        self.builds += 1
+        for old in self.directory.glob("catalog-*.snap"):
+            if old != path:
+                try:
+                    old.unlink()  # processes that mapped it keep their mapping
+                except OSError:
+                    pass
+        return CatalogSnapshot(path)
+
+    def get_stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "cards": len(snapshot) if snapshot else 0,
+            "bytes": snapshot.size if snapshot else 0,
+            "stale": snapshot is None or snapshot.as_of <= self._stale_since,
+            "builds": self.builds,
+            "maps": self.maps
+        }
+
+
+catalog_snapshots = CatalogSnapshotStore(SNAPSHOT_DIR)
@@ -0,0 +1,146 @@
+"""
+Change feed of the catalog and decks, streamed by GET /api/v1/events.
+
+Repository write paths publish one compact event per changed row after
+committing: entity, id, op (create, update, delete, or cards for a deck whose
+card list changed) and version. The version is the commit time in
+milliseconds, strictly increasing in the process, so a client can tell whether
+an entity changed after it loaded it.
+
+Events are numbered in publication order and kept in a ring buffer of the
+last DEFAULT_SIZE events. A client resuming with Last-Event-ID gets the events
+it missed; if they left the buffer, or the id comes from another process (each
+process numbers its events under its own epoch), it gets a reset and must
+refetch what it shows.
+
+In-process consumers subscribe to the published events: change_notifier
+forwards the local ones to the other workers (Postgres NOTIFY) and publishes
+theirs here with remote=True, which drops the local caches they affect.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZE = 4096
+
+ENTITIES = ("card", "deck", "effect", "bonus", "type", "faction", "illustration", "archetype")
+
+# subscriber(entity, op, ids, version, remote)
+Subscriber = Callable[[str, str, List[int], int, bool], None]
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    seq: int
+    entity: str
+    entity_id: int
+    op: str
+    version: int
+
+
+class ChangeFeed:
+    def __init__(self, size: int = DEFAULT_SIZE):
+        self.epoch = uuid4().hex[:8]  # prefix of this process' event ids
+        self._events: Deque[ChangeEvent] = deque(maxlen=size)
+        self._seq = 0
+        self._version = 0
+        self._lock = threading.Lock()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._subscribers: List[Subscriber] = []
+
+    @property
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def subscribe(self, subscriber: Subscriber):
+        """Call subscriber after each publication, in the publishing thread."""
+        self._subscribers.append(subscriber)
+
+    def publish(self, entity: str, op: str, ids: Iterable[int], version: Optional[int] = None, remote: bool = False):
+        """
+        Record a committed change of the given rows, wake the waiting streams and
+        notify the subscribers. version and remote are set for another worker's change.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            if version is None:
+                version = self._version = max(time.time_ns() // 1_000_000, self._version + 1)
+            else:
+                self._version = max(self._version, version)
+            for entity_id in ids:
+                self._seq += 1
+                self._events.append(ChangeEvent(self._seq, entity, entity_id, op, version))
+            waiters = list(self._waiters)
+            self._waiters.clear()
+        self._wake(waiters)
+        for subscriber in self._subscribers:
+            try:
+                subscriber(entity, op, ids, version, remote)
+            except Exception:
+                logger.exception("Change feed subscriber failed on %s %s %s", entity, op, ids)
+
+    def reset(self):
+        """Forget the buffered events (changes may have been missed): every stream gets a reset."""
+        with self._lock:
+            self._events.clear()
+            self._seq += 1
+            waiters = list(self._waiters)
+            self._waiters.clear()
+        self._wake(waiters)
+
+    @staticmethod
+    def _wake(waiters):
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # the stream's event loop is closed
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def parse_event_id(self, event_id: str) -> Optional[int]:
+        """The sequence number of one of this process' event ids, or None."""
+        epoch, _, seq = event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq: int) -> Optional[List[ChangeEvent]]:
+        """The events after seq, or None if some of them are no longer buffered."""
+        with self._lock:
+            if seq > self._seq:
+                return None
+            if seq == self._seq:
+                return []
+            if not self._events or self._events[0].seq > seq + 1:
+                return None
+            return [event for event in self._events if event.seq > seq]
+
+    async def wait(self, seq: int, timeout: float):
+        """Wait until an event after seq is published, at most timeout seconds."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if self._seq > seq:
+                return
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+change_feed = ChangeFeed()
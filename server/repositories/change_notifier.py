@@ -0,0 +1,279 @@
+"""
+Propagation of the change feed between worker processes with Postgres LISTEN/NOTIFY.
+
+Every worker keeps state derived from the database in memory: the deck payload
+cache, the co-occurrence index, the effect/bonus indexes, and the change feed
+behind the SSE streams and live deck rooms. Once started, the notifier sends
+each local change published to the change feed on CHANNEL, as
+{"origin", "entity", "op", "version", "ids"}, and listens on a dedicated
+connection. A change from another worker drops the local state it affects
+(apply_remote_change) and is published to the local change feed with
+remote=True, so it reaches this worker's SSE clients and live rooms too.
+
+Deck content changes are also sent as the deck's contents before and after,
+{"origin", "entity": "cooccurrence", "before", "after"}, which the other
+workers apply to their co-occurrence index incrementally instead of rebuilding
+it. A change too large for one notification, or a local invalidation of the
+index, is sent with null contents and drops the index everywhere.
+
+Writers never send notifications themselves: the subscribers queue the
+payloads in an outbox and one sender thread delivers them in order over its own
+connection, a batch per transaction, retrying after reconnecting. A writer
+neither waits on NOTIFY nor takes a second pooled connection. If the outbox
+fills up (MAX_QUEUED, e.g. the database is unreachable for long), further
+payloads are dropped and the sender follows the queued ones with
+{"origin", "entity": "reset"}: the other workers then drop all their caches and
+reset their change feeds. A worker dying with a non-empty outbox loses it.
+
+Notifications sent while the listening connection is down are lost as well:
+after reconnecting, the worker drops all its caches and resets its change feed
+(SSE clients get a reset and refetch), then resumes.
+"""
+import json
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Tuple
+
+import psycopg
+from server.db.db_config import engine
+from server.repositories.change_feed import change_feed, ChangeFeed
+from server.repositories.deck_payload_cache import deck_payload_cache
+from server.repositories.cooccurrence_index import cooccurrence_index
+from server.repositories.association_index import effect_card_index, bonus_card_index
+from server.repositories.catalog_snapshot import catalog_snapshots
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "catalog_changes"
+MAX_IDS = 500  # ids per notification, keeps payloads below the 8000 bytes limit
+MAX_PAYLOAD = 7900  # bytes; NOTIFY payloads must stay below 8000
+COOCCURRENCE = "cooccurrence"
+RESET = "reset"
+MAX_QUEUED = 10_000  # payloads waiting in the outbox
+MAX_BATCH = 100  # payloads sent per transaction
+POLL_SECONDS = 1.0
+KEEPALIVE_SECONDS = 30.0  # idle time after which the listening connection is checked
+RECONNECT_DELAYS = (0.5, 1, 2, 5, 10)
+
+
+def apply_remote_change(entity: str, op: str, ids: List[int]):
+    """Drop the local state affected by another worker's committed change."""
+    if entity == "deck":
+        if op in ("create", "cards", "delete"):
+            for deck_id in ids:
+                deck_payload_cache.invalidate_deck(deck_id)
+            # The co-occurrence index gets the deck's contents in a separate notification
+    elif entity == "card":
+        deck_payload_cache.invalidate("card", ids)
+        for index in (effect_card_index, bonus_card_index):
+            if op == "delete":
+                index.remove_cards(ids)
+            else:
+                index.reload_cards(ids)
+    elif entity in ("effect", "bonus"):
+        if op == "delete":
+            index = effect_card_index if entity == "effect" else bonus_card_index
+            for key in ids:
+                index.remove_key(key)
+    elif entity in ("type", "faction", "illustration", "archetype"):
+        deck_payload_cache.invalidate(entity, ids)
+
+
+def clear_local_caches():
+    """Drop every cache derived from the database (changes may have been missed)."""
+    deck_payload_cache.clear()
+    cooccurrence_index.invalidate()
+    effect_card_index.invalidate()
+    bonus_card_index.invalidate()
+    catalog_snapshots.invalidate()
+
+
+class ChangeNotifier:
+    def __init__(self, feed: ChangeFeed):
+        self.feed = feed
+        self._thread = None
+        self._sender = None
+        self._stop = threading.Event()
+        self._outbox: Deque[str] = deque()
+        self._overflowed = False  # payloads were dropped: the other workers must reset
+        self._outbox_ready = threading.Condition()
+        feed.subscribe(self._send)
+        cooccurrence_index.subscribe(self._send_deck_contents)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start sending local changes and listening for the other workers' ones."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="change-notifier", daemon=True)
+        self._thread.start()
+        self._sender = threading.Thread(target=self._deliver, name="change-notifier-sender", daemon=True)
+        self._sender.start()
+
+    def stop(self):
+        """Stop listening, after sending the queued notifications (if the database is reachable)."""
+        self._stop.set()
+        with self._outbox_ready:
+            self._outbox_ready.notify()
+        for thread in (self._sender, self._thread):
+            if thread is not None:
+                thread.join(timeout=POLL_SECONDS * 5)
+        self._thread = self._sender = None
+
+    def _send(self, entity: str, op: str, ids: List[int], version: int, remote: bool):
+        """Change feed subscriber: NOTIFY the other workers of a local change."""
+        if remote or not self.running:
+            return
+        payloads = [
+            json.dumps(
+                {"origin": self.feed.epoch, "entity": entity, "op": op, "version": version, "ids": ids[i:i + MAX_IDS]},
+                separators=(",", ":")
+            )
+            for i in range(0, len(ids), MAX_IDS)
+        ]
+        self._enqueue(payloads)
+
+    def _send_deck_contents(self, before: Optional[Dict[int, int]], after: Optional[Dict[int, int]]):
+        """Co-occurrence index subscriber: NOTIFY the other workers of a deck's contents change."""
+        if not self.running:
+            return
+        message = {"origin": self.feed.epoch, "entity": COOCCURRENCE, "before": before, "after": after}
+        payload = json.dumps(message, separators=(",", ":"))
+        if len(payload.encode()) > MAX_PAYLOAD:
+            message["before"] = message["after"] = None
+            payload = json.dumps(message, separators=(",", ":"))
+        self._enqueue([payload])
+
+    def _enqueue(self, payloads: List[str]):
+        """Queue payloads for the sender thread (called by the writers, never blocks on the database)."""
+        with self._outbox_ready:
+            if len(self._outbox) + len(payloads) > MAX_QUEUED:
+                if not self._overflowed:
+                    logger.warning("Change notification outbox full; the other workers will be told to reset")
+                self._overflowed = True
+                return
+            self._outbox.extend(payloads)
+            self._outbox_ready.notify()
+
+    def _next_batch(self) -> Optional[Tuple[List[str], bool]]:
+        """
+        Wait for payloads to send: the oldest queued ones, and whether a reset follows
+        them (once the outbox is drained after an overflow). None once stopped with
+        nothing left to send.
+        """
+        with self._outbox_ready:
+            while not self._outbox and not self._overflowed:
+                if self._stop.is_set():
+                    return None
+                self._outbox_ready.wait(POLL_SECONDS)
+            payloads = list(islice(self._outbox, MAX_BATCH))
+            return payloads, self._overflowed and len(payloads) == len(self._outbox)
+
+    def _sent(self, count: int, reset: bool):
+        """Remove a delivered batch from the outbox (only the sender removes payloads)."""
+        with self._outbox_ready:
+            for _ in range(count):
+                self._outbox.popleft()
+            if reset:
+                self._overflowed = False
+
+    def _deliver(self):
+        """Sender thread: send the outbox in order, retrying a failed batch after reconnecting."""
+        failures = 0
+        while True:
+            try:
+                with psycopg.connect(self._conninfo(), autocommit=True) as conn:
+                    failures = 0
+                    while True:
+                        batch = self._next_batch()
+                        if batch is None:
+                            return
+                        payloads, reset = batch
+                        if reset:
+                            payloads = payloads + [json.dumps({"origin": self.feed.epoch, "entity": RESET}, separators=(",", ":"))]
+                        with conn.transaction():
+                            for payload in payloads:
+                                conn.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+                        self._sent(len(batch[0]), reset)
+            except psycopg.Error as e:
+                if self._stop.is_set():
+                    logger.warning("Dropped %d queued change notification(s) on shutdown (%s)", len(self._outbox), e)
+                    return
+                delay = RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)]
+                failures += 1
+                logger.warning("Could not send change notifications (%s); retrying in %ss", e, delay)
+                self._stop.wait(delay)
+
+    @staticmethod
+    def _conninfo() -> str:
+        return engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+    def _receive_deck_contents(self, message: dict):
+        before, after = message["before"], message["after"]
+        if before is None or after is None:
+            cooccurrence_index.invalidate()
+            return
+        cooccurrence_index.update_deck(
+            {int(card_id): quantity for card_id, quantity in before.items()},
+            {int(card_id): quantity for card_id, quantity in after.items()},
+            notify=False
+        )
+
+    def _receive(self, payload: str):
+        try:
+            message = json.loads(payload)
+            if message["origin"] == self.feed.epoch:
+                return
+            if message["entity"] == COOCCURRENCE:
+                self._receive_deck_contents(message)
+                return
+            if message["entity"] == RESET:
+                clear_local_caches()
+                self.feed.reset()
+                logger.info("Another worker dropped change notifications; local caches dropped")
+                return
+            entity, op, ids, version = message["entity"], message["op"], message["ids"], message["version"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignored malformed change notification %r", payload)
+            return
+        apply_remote_change(entity, op, ids)
+        self.feed.publish(entity, op, ids, version=version, remote=True)
+
+    def _listen(self):
+        conninfo = self._conninfo()
+        missed = False  # whether notifications may have been lost since the caches were filled
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    if missed:
+                        clear_local_caches()
+                        self.feed.reset()
+                        logger.info("Change notifications resumed; local caches dropped")
+                    failures = 0
+                    idle = 0.0
+                    while not self._stop.is_set():
+                        received = False
+                        for notify in conn.notifies(timeout=POLL_SECONDS):
+                            self._receive(notify.payload)
+                            received = True
+                        idle = 0.0 if received else idle + POLL_SECONDS
+                        if idle >= KEEPALIVE_SECONDS:
+                            conn.execute("SELECT 1")
+                            idle = 0.0
+            except psycopg.Error as e:
+                missed = True
+                delay = RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)]
+                failures += 1
+                logger.warning("Change notification listener disconnected (%s); retrying in %ss", e, delay)
+                self._stop.wait(delay)
+
+
+change_notifier = ChangeNotifier(change_feed)
@@ -0,0 +1,229 @@
+from datetime import datetime
+from typing import List, Optional, Dict, Any
+from sqlalchemy import select, delete, func, Integer, Float
+from sqlalchemy.dialects.postgresql import insert
+from server.db.schema.collection import Collection
+from server.db.schema.collection_card import CollectionCard
+from server.db.schema.card import Card
+from server.db.schema.deck import Deck
+from server.db.schema.deck_card import DeckCard
+from server.db.schema.deck_stats import DeckStats
+from server.db.db_config import SessionLocal
+
+
+def _owned_join(collection_id: int):
+    """Join condition matching each deck_cards row with the collection's copies of the card."""
+    return (CollectionCard.card_id == DeckCard.card_id) & (CollectionCard.collection_id == collection_id)
+
+
+def _owned_qty():
+    return func.coalesce(CollectionCard.owned_qty, 0)
+
+
+class CollectionRepository:
+
+    def create(self, name: str, description: Optional[str] = None) -> Collection:
+        """Create a new, empty collection."""
+        with SessionLocal() as session:
+            collection = Collection(name=name, description=description)
+            session.add(collection)
+            session.commit()
+            session.refresh(collection)
+            return collection
+
+    def get(self, collection_id: int) -> Optional[Collection]:
+        """Get a collection by its ID."""
+        with SessionLocal() as session:
+            return session.get(Collection, collection_id)
+
+    def list(self) -> List[Collection]:
+        """Return all collections."""
+        with SessionLocal() as session:
+            return list(session.scalars(select(Collection).order_by(Collection.id)).all())
+
+    def update(
+        self,
+        collection_id: int,
+        name: Optional[str] = None,
+        description: Optional[str] = None
+    ) -> Optional[Collection]:
+        """Update a collection's attributes."""
+        with SessionLocal() as session:
+            collection = session.get(Collection, collection_id)
+            if not collection:
+                return None
+            if name is not None:
+                collection.name = name
+            if description is not None:
+                collection.description = description
+            session.commit()
+            session.refresh(collection)
+            return collection
+
+    def delete(self, collection_id: int) -> bool:
+        """Delete a collection and its inventory."""
+        with SessionLocal() as session:
+            collection = session.get(Collection, collection_id)
+            if not collection:
+                return False
+            session.delete(collection)
+            session.commit()
+            return True
+
+    def get_cards(self, collection_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Get the collection's inventory [{card_id, name, owned_qty}], or None if it doesn't exist."""
+        with SessionLocal() as session:
+            if session.get(Collection, collection_id) is None:
+                return None
+            rows = session.execute(
+                select(CollectionCard.card_id, Card.name, CollectionCard.owned_qty)
+                .join(Card, Card.id == CollectionCard.card_id)
+                .where(CollectionCard.collection_id == collection_id)
+                .order_by(Card.name)
+            )
+            return [dict(row._mapping) for row in rows]
+
+    def set_cards(self, collection_id: int, quantities: Dict[int, int]) -> Optional[int]:
+        """
+        Set the owned quantity of several cards with one bulk DELETE (quantity 0) and
+        one bulk upsert. Returns the number of cards in the collection afterwards, or
+        None if it doesn't exist. Raises ValueError (nothing is written) for unknown cards.
+        """
+        with SessionLocal() as session:
+            collection = session.get(Collection, collection_id)
+            if collection is None:
+                return None
+            found = set(session.scalars(select(Card.id).where(Card.id.in_(quantities.keys()))).all())
+            missing = sorted(quantities.keys() - found)
+            if missing:
+                raise ValueError(f"Card(s) not found: {', '.join(map(str, missing))}")
+
+            removed = [card_id for card_id, quantity in quantities.items() if quantity == 0]
+            upserts = [
+                {"collection_id": collection_id, "card_id": card_id, "owned_qty": quantity}
+                for card_id, quantity in sorted(quantities.items())
+                if quantity
+            ]
+            if removed:
+                session.execute(delete(CollectionCard).where(
+                    CollectionCard.collection_id == collection_id,
+                    CollectionCard.card_id.in_(removed)
+                ))
+            if upserts:
+                stmt = insert(CollectionCard).values(upserts)
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=[CollectionCard.collection_id, CollectionCard.card_id],
+                    set_={"owned_qty": stmt.excluded.owned_qty, "updated_at": datetime.utcnow()}
+                ))
+            collection.updated_at = datetime.utcnow()
+            session.commit()
+            return session.scalar(
+                select(func.count()).where(CollectionCard.collection_id == collection_id)
+            )
+
+    def buildable_decks(
+        self,
+        collection_id: int,
+        archetype_id: Optional[int] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the non-empty decks the collection owns every copy of ([{deck_id, name,
+        archetype_id, total_cards}]), or None if the collection doesn't exist.
+        One anti-join: a deck qualifies when none of its deck_cards rows is short.
+        """
+        with SessionLocal() as session:
+            if session.get(Collection, collection_id) is None:
+                return None
+            short = (
+                select(DeckCard.card_id)
+                .outerjoin(CollectionCard, _owned_join(collection_id))
+                .where(DeckCard.deck_id == Deck.id, _owned_qty() < DeckCard.quantity)
+            )
+            stmt = (
+                select(Deck.id.label("deck_id"), Deck.name, Deck.archetype_id, DeckStats.total_cards)
+                .join(DeckStats, DeckStats.deck_id == Deck.id)
+                .where(DeckStats.total_cards > 0, ~short.exists())
+                .order_by(Deck.id)
+                .limit(limit)
+                .offset(offset)
+            )
+            if archetype_id is not None:
+                stmt = stmt.where(Deck.archetype_id == archetype_id)
+            return [dict(row._mapping) for row in session.execute(stmt)]
+
+    def missing_cards(self, collection_id: int, deck_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the cards of a deck the collection is short of ([{card_id, name, needed,
+        owned, missing}]), or None if the collection or the deck doesn't exist.
+        """
+        with SessionLocal() as session:
+            if session.get(Collection, collection_id) is None or session.get(Deck, deck_id) is None:
+                return None
+            missing = DeckCard.quantity - _owned_qty()
+            stmt = (
+                select(
+                    DeckCard.card_id,
+                    Card.name,
+                    DeckCard.quantity.label("needed"),
+                    _owned_qty().label("owned"),
+                    missing.label("missing")
+                )
+                .join(Card, Card.id == DeckCard.card_id)
+                .outerjoin(CollectionCard, _owned_join(collection_id))
+                .where(DeckCard.deck_id == deck_id, missing > 0)
+                .order_by(Card.name)
+            )
+            return [dict(row._mapping) for row in session.execute(stmt)]
+
+    def closest_decks(
+        self,
+        collection_id: int,
+        archetype_id: Optional[int] = None,
+        max_missing: Optional[int] = None,
+        include_complete: bool = False,
+        limit: int = 20
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Rank decks by how many card copies the collection lacks to build them, fewest
+        first ([{deck_id, name, archetype_id, total_cards, owned_cards, missing_cards,
+        completion}]), or None if the collection doesn't exist. One aggregate over
+        deck_cards outer-joined to the inventory.
+        """
+        with SessionLocal() as session:
+            if session.get(Collection, collection_id) is None:
+                return None
+            per_deck = (
+                select(
+                    DeckCard.deck_id,
+                    func.sum(DeckCard.quantity).cast(Integer).label("total_cards"),
+                    func.sum(func.least(DeckCard.quantity, _owned_qty())).cast(Integer).label("owned_cards")
+                )
+                .outerjoin(CollectionCard, _owned_join(collection_id))
+                .group_by(DeckCard.deck_id)
+                .subquery("per_deck")
+            )
+            missing = per_deck.c.total_cards - per_deck.c.owned_cards
+            completion = per_deck.c.owned_cards.cast(Float) / per_deck.c.total_cards
+            stmt = (
+                select(
+                    Deck.id.label("deck_id"),
+                    Deck.name,
+                    Deck.archetype_id,
+                    per_deck.c.total_cards,
+                    per_deck.c.owned_cards,
+                    missing.label("missing_cards"),
+                    completion.label("completion")
+                )
+                .join(per_deck, per_deck.c.deck_id == Deck.id)
+                .order_by(missing, completion.desc(), Deck.id)
+                .limit(limit)
+            )
+            if archetype_id is not None:
+                stmt = stmt.where(Deck.archetype_id == archetype_id)
+            if max_missing is not None:
+                stmt = stmt.where(missing <= max_missing)
+            if not include_complete:
+                stmt = stmt.where(missing > 0)
+            return [dict(row._mapping) for row in session.execute(stmt)]
@@ -0,0 +1,160 @@
+"""
+In-memory card co-occurrence index over deck_cards.
+
+For every pair of cards played together the index keeps the quantity-weighted
+co-occurrence ``W[a][b] = sum over decks of q_a * q_b``, and for every card the
+total ``n[a] = sum over decks of q_a``, plus the number of non-empty decks N.
+The lift of a pair is ``W[a][b] * N / (n[a] * n[b])`` (1 when the quantities are
+independent) and PMI its logarithm.
+
+The index is built lazily with one self-join on deck_cards and then maintained
+incrementally: DeckRepository reports each committed deck change as the deck's
+contents before and after, and only the pairs involving changed cards are updated.
+Subscribers receive the same before/after contents (change_notifier forwards them
+to the other workers, whose indexes apply them in turn), or (None, None) when a
+write invalidated the index.
+"""
+import math
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+from server.db.schema.deck_card import DeckCard
+from server.db.db_config import SessionLocal
+
+# subscriber(before, after): a local deck change, or (None, None) after a local invalidation
+Subscriber = Callable[[Optional[Dict[int, int]], Optional[Dict[int, int]]], None]
+
+
+class CardCooccurrenceIndex:
+    def __init__(self):
+        self._pairs: Dict[int, Dict[int, int]] = {}
+        self._totals: Dict[int, int] = {}
+        self._decks = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, subscriber: Subscriber):
+        """Call subscriber after each local update or notifying invalidation, in the calling thread."""
+        self._subscribers.append(subscriber)
+
+    def _notify(self, before: Optional[Dict[int, int]], after: Optional[Dict[int, int]]):
+        for subscriber in self._subscribers:
+            subscriber(before, after)
+
+    def _ensure_loaded(self):
+        """Build the index from deck_cards (called with the lock held)."""
+        if self._loaded:
+            return
+        other = aliased(DeckCard)
+        with SessionLocal() as session:
+            pair_rows = session.execute(
+                select(DeckCard.card_id, other.card_id, func.sum(DeckCard.quantity * other.quantity))
+                .join(other, (other.deck_id == DeckCard.deck_id) & (other.card_id != DeckCard.card_id))
+                .group_by(DeckCard.card_id, other.card_id)
+            ).all()
+            total_rows = session.execute(
+                select(DeckCard.card_id, func.sum(DeckCard.quantity)).group_by(DeckCard.card_id)
+            ).all()
+            decks = session.scalar(select(func.count(func.distinct(DeckCard.deck_id))))
+        pairs = defaultdict(dict)
+        for card_id, other_id, weight in pair_rows:
+            pairs[card_id][other_id] = int(weight)
+        self._pairs = dict(pairs)
+        self._totals = {card_id: int(total) for card_id, total in total_rows}
+        self._decks = decks or 0
+        self._loaded = True
+
+    def _add_pair(self, a: int, b: int, delta: int):
+        for x, y in ((a, b), (b, a)):
+            row = self._pairs.setdefault(x, {})
+            weight = row.get(y, 0) + delta
+            if weight:
+                row[y] = weight
+            else:
+                row.pop(y, None)
+                if not row:
+                    del self._pairs[x]
+
+    def update_deck(self, before: Dict[int, int], after: Dict[int, int], notify: bool = True):
+        """
+        Apply a committed change of one deck's contents ({card_id: quantity} before and
+        after). notify is unset for another worker's change, already sent everywhere.
+        """
+        if notify:
+            self._notify(before, after)
+        with self._lock:
+            if not self._loaded:
+                return  # the lazy load will read the committed rows
+            changed = [card_id for card_id in before.keys() | after.keys() if before.get(card_id, 0) != after.get(card_id, 0)]
+            if not changed:
+                return
+            cards = before.keys() | after.keys()
+            done = set()
+            for a in changed:
+                qa_before, qa_after = before.get(a, 0), after.get(a, 0)
+                for b in cards:
+                    if b == a or b in done:
+                        continue
+                    delta = qa_after * after.get(b, 0) - qa_before * before.get(b, 0)
+                    if delta:
+                        self._add_pair(a, b, delta)
+                done.add(a)
+                total = self._totals.get(a, 0) + qa_after - qa_before
+                if total:
+                    self._totals[a] = total
+                else:
+                    self._totals.pop(a, None)
+            self._decks += bool(any(after.values())) - bool(any(before.values()))
+
+    def invalidate(self, notify: bool = False):
+        """
+        Forget everything; the next read rebuilds from the database. notify is set
+        when a local write made the index stale, so the other workers drop theirs too.
+        """
+        with self._lock:
+            self._pairs, self._totals, self._decks = {}, {}, 0
+            self._loaded = False
+        if notify:
+            self._notify(None, None)
+
+    def suggest(
+        self,
+        contents: Dict[int, int],
+        metric: str = "pmi",
+        min_support: int = 1,
+        limit: Optional[int] = None
+    ) -> List[Tuple[int, float, int]]:
+        """
+        Rank the cards not in `contents` by their average lift (or PMI) with the deck's
+        cards, weighted by the deck's quantities. Pairs never seen together count as
+        no evidence. Returns (card_id, score, support) where support is the summed
+        co-occurrence weight with the deck.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            weight_sum = sum(contents.values())
+            if not weight_sum or not self._decks:
+                return []
+            scores: Dict[int, float] = defaultdict(float)
+            support: Dict[int, int] = defaultdict(int)
+            for a, qa in contents.items():
+                total_a = self._totals.get(a)
+                if not total_a:
+                    continue
+                for b, weight in self._pairs.get(a, {}).items():
+                    if b in contents or weight < min_support:
+                        continue
+                    lift = weight * self._decks / (total_a * self._totals[b])
+                    scores[b] += qa * (math.log(lift) if metric == "pmi" else lift)
+                    support[b] += weight
+        ranked = sorted(
+            ((card_id, score / weight_sum, support[card_id]) for card_id, score in scores.items()),
+            key=lambda item: (-item[1], -item[2], item[0])
+        )
+        return ranked[:limit] if limit is not None else ranked
+
+
+cooccurrence_index = CardCooccurrenceIndex()
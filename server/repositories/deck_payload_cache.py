@@ -0,0 +1,119 @@
+"""
+In-process cache of serialized deck card lists (GET /decks/{id}/cards).
+
+Each entry holds the JSON payload of one deck and the rows it was built from:
+its cards and their types, factions, archetypes and illustrations. A reverse
+dependency map from each of those rows to the cached decks lets a write drop
+exactly the entries that embed it: a deck_cards change drops its deck, a card
+edit drops the decks containing the card, a type rename the decks containing a
+card of that type, and so on.
+
+Entries are evicted least recently used first once the payloads exceed
+max_bytes. Writers invalidate after committing; a reader takes a token before
+loading and the entry is only stored if no matching invalidation happened in
+between, so a load racing with a write never caches the old payload.
+"""
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+Dependency = Tuple[str, int]  # ("card" | "type" | "faction" | "archetype" | "illustration", id)
+
+
+class DeckPayloadCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[bytes, Set[Dependency]]]" = OrderedDict()
+        self._dependents: Dict[Dependency, Set[int]] = defaultdict(set)
+        self._bytes = 0
+        self._epoch = 0  # bumped by dependency invalidations
+        self._deck_versions: Dict[int, int] = defaultdict(int)  # bumped by deck invalidations
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def token(self, deck_id: int) -> Tuple[int, int]:
+        """Take before loading a deck's payload from the database; pass to put()."""
+        with self._lock:
+            return self._epoch, self._deck_versions[deck_id]
+
+    def get(self, deck_id: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(deck_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(deck_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, deck_id: int, payload: bytes, dependencies: Iterable[Dependency], token: Tuple[int, int]):
+        """Store a payload loaded after token() unless a relevant write committed since."""
+        with self._lock:
+            if token != (self._epoch, self._deck_versions[deck_id]) or len(payload) > self.max_bytes:
+                return
+            self._remove(deck_id)
+            dependencies = set(dependencies)
+            self._entries[deck_id] = (payload, dependencies)
+            self._bytes += len(payload)
+            for dependency in dependencies:
+                self._dependents[dependency].add(deck_id)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, deck_id: int) -> bool:
+        entry = self._entries.pop(deck_id, None)
+        if entry is None:
+            return False
+        payload, dependencies = entry
+        self._bytes -= len(payload)
+        for dependency in dependencies:
+            decks = self._dependents.get(dependency)
+            if decks is not None:
+                decks.discard(deck_id)
+                if not decks:
+                    del self._dependents[dependency]
+        return True
+
+    def invalidate_deck(self, deck_id: int):
+        """Drop a deck's entry after a committed change of its deck_cards rows."""
+        with self._lock:
+            self._deck_versions[deck_id] += 1
+            self.invalidations += self._remove(deck_id)
+
+    def invalidate(self, kind: str, ids: Iterable[int]):
+        """Drop the entries embedding any of the given rows (kind is card, type, faction, archetype or illustration)."""
+        with self._lock:
+            self._epoch += 1
+            for row_id in ids:
+                for deck_id in list(self._dependents.get((kind, row_id), ())):
+                    self.invalidations += self._remove(deck_id)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._dependents.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+deck_payload_cache = DeckPayloadCache()
@@ -1,10 +1,50 @@
-from typing import List, Optional, Dict
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload, joinedload
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import select, delete, func, tuple_, values, column, literal, or_, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload, joinedload, contains_eager
 from server.db.schema.deck import Deck
+from server.db.schema.archetype import Archetype
 from server.db.schema.card import Card
 from server.db.schema.deck_card import DeckCard
+from server.db.schema.deck_stats import DeckStats
+from server.db.schema.deck_invalidation import DeckInvalidation
 from server.db.db_config import SessionLocal
+from server.repositories.deck_stats import refresh_deck_stats, check_deck_stats
+from server.repositories.deck_rules import (
+    DeckRuleConfig, run_rules, RULES, UNIVERSAL_ARCHETYPE, default_rules, collect_violations
+)
+from server.repositories.cooccurrence_index import cooccurrence_index
+from server.repositories.card_usage import record_deck_change
+from server.repositories.deck_payload_cache import deck_payload_cache
+from server.repositories.change_feed import change_feed
+from server.repositories.deck_signatures import refresh_deck_signatures, similar_decks, cluster_decks, rebuild_deck_signatures
+
+
+DECK_SORT_COLUMNS = {
+    "name": Deck.name,
+    "created_at": Deck.created_at,
+    "total_cards": DeckStats.total_cards,
+    "distinct_cards": DeckStats.distinct_cards,
+    "valid": DeckStats.valid,
+    "last_modified": DeckStats.last_modified,
+}
+
+
+def _deck_quantities(session, deck_id: int) -> Dict[int, int]:
+    """Current {card_id: quantity} of a deck as seen by the session."""
+    rows = session.execute(select(DeckCard.card_id, DeckCard.quantity).where(DeckCard.deck_id == deck_id))
+    return {row.card_id: row.quantity for row in rows}
+
+
+def _replaced(contents: Dict[int, int], card_id: int, quantity: int) -> Dict[int, int]:
+    """Copy of contents with one card's quantity replaced (0 removes it)."""
+    contents = dict(contents)
+    if quantity:
+        contents[card_id] = quantity
+    else:
+        contents.pop(card_id, None)
+    return contents
 
 
 class DeckRepository:
@@ -14,15 +54,134 @@ class DeckRepository:
         with SessionLocal() as session:
             deck = Deck(name=name, description=description, archetype_id=archetype_id)
             session.add(deck)
+            session.flush()
+            refresh_deck_stats(session, [deck.id])
+            record_deck_change(session, None, {}, archetype_id, {})
+            session.commit()
+            change_feed.publish("deck", "create", [deck.id])
+            session.refresh(deck)
+            # Load relationships used by the response before leaving the session
+            _ = deck.archetype
+            _ = deck.stats
+            return deck
+    
+    def create_with_cards(
+        self,
+        name: str,
+        archetype_id: int,
+        quantities: Dict[int, int],
+        description: Optional[str] = None
+    ) -> Deck:
+        """
+        Create a deck and all its deck_cards rows in one transaction.
+        Raises ValueError (nothing is written) if the archetype or a card is unknown
+        or a quantity exceeds the card's max_occurrence.
+        """
+        with SessionLocal() as session:
+            if session.get(Archetype, archetype_id) is None:
+                raise ValueError(f"Archetype with ID {archetype_id} not found")
+            cards = {
+                row.id: row
+                for row in session.execute(
+                    select(Card.id, Card.name, Card.max_occurrence).where(Card.id.in_(quantities.keys()))
+                )
+            }
+            missing = sorted(quantities.keys() - cards.keys())
+            if missing:
+                raise ValueError(f"Card(s) not found: {', '.join(map(str, missing))}")
+            for card_id, quantity in quantities.items():
+                card = cards[card_id]
+                if quantity > card.max_occurrence:
+                    raise ValueError(
+                        f"Quantity ({quantity}) exceeds max_occurrence ({card.max_occurrence}) for card '{card.name}'"
+                    )
+            
+            deck = Deck(name=name, description=description, archetype_id=archetype_id)
+            session.add(deck)
+            session.flush()
+            if quantities:
+                session.execute(insert(DeckCard).values([
+                    {"deck_id": deck.id, "card_id": card_id, "quantity": quantity}
+                    for card_id, quantity in sorted(quantities.items())
+                ]))
+            refresh_deck_stats(session, [deck.id])
+            refresh_deck_signatures(session, [deck.id])
+            record_deck_change(session, None, {}, archetype_id, quantities)
             session.commit()
+            cooccurrence_index.update_deck({}, quantities)
+            change_feed.publish("deck", "create", [deck.id])
             session.refresh(deck)
+            _ = deck.archetype
+            _ = deck.stats
             return deck
     
+    def get_contents(self, deck_id: int) -> Optional[Dict[str, Any]]:
+        """Get a deck's archetype_id, {card_id: quantity} and content hash, or None if it doesn't exist."""
+        with SessionLocal() as session:
+            deck = session.execute(
+                select(Deck.archetype_id, DeckStats.content_hash)
+                .outerjoin(DeckStats, DeckStats.deck_id == Deck.id)
+                .where(Deck.id == deck_id)
+            ).first()
+            if deck is None:
+                return None
+            content_hash = deck.content_hash
+            if content_hash is None:
+                # Deck without a stats row yet (created before deck_stats existed): build it now
+                refresh_deck_stats(session, [deck_id])
+                content_hash = session.scalar(select(DeckStats.content_hash).where(DeckStats.deck_id == deck_id))
+                session.commit()
+            rows = session.execute(
+                select(DeckCard.card_id, DeckCard.quantity).where(DeckCard.deck_id == deck_id)
+            )
+            return {
+                "archetype_id": deck.archetype_id,
+                "quantities": {row.card_id: row.quantity for row in rows},
+                "content_hash": content_hash
+            }
+    
+    def suggest_cards(
+        self,
+        deck_id: int,
+        limit: int = 20,
+        metric: str = "pmi",
+        min_support: int = 1
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Rank cards often played with the deck's cards (see cooccurrence_index), keeping
+        only cards playable in the deck's archetype. Returns None if the deck doesn't exist.
+        """
+        contents = self.get_contents(deck_id)
+        if contents is None:
+            return None
+        ranked = cooccurrence_index.suggest(contents["quantities"], metric=metric, min_support=min_support)
+        if not ranked:
+            return []
+        with SessionLocal() as session:
+            universal = select(Archetype.id).where(Archetype.name == UNIVERSAL_ARCHETYPE)
+            names = dict(session.execute(
+                select(Card.id, Card.name).where(
+                    Card.id.in_([card_id for card_id, _, _ in ranked]),
+                    or_(Card.archetype_id == contents["archetype_id"], Card.archetype_id.in_(universal))
+                )
+            ).all())
+        return [
+            {"card_id": card_id, "name": names[card_id], "score": score, "support": support}
+            for card_id, score, support in ranked if card_id in names
+        ][:limit]
+    
+    def find_by_content_hash(self, content_hash: str) -> List[int]:
+        """Get the IDs of decks with the given content hash (indexed lookup on deck_stats)."""
+        with SessionLocal() as session:
+            stmt = select(DeckStats.deck_id).where(DeckStats.content_hash == content_hash).order_by(DeckStats.deck_id)
+            return list(session.scalars(stmt).all())
+    
     def get(self, deck_id: int, load_cards: bool = False) -> Optional[Deck]:
         """Retrieve a deck by its ID, optionally loading cards."""
         with SessionLocal() as session:
             stmt = select(Deck).where(Deck.id == deck_id).options(
-                joinedload(Deck.archetype)
+                joinedload(Deck.archetype),
+                joinedload(Deck.stats)
             )
             if load_cards:
                 stmt = stmt.options(selectinload(Deck.cards))
@@ -34,12 +193,30 @@ class DeckRepository:
                 session.expunge(result)
             return result
          
-    def list(self, load_cards: bool = False) -> List[Deck]:
-        """Return all decks in the database, optionally loading cards."""
+    def list(
+        self,
+        load_cards: bool = False,
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        valid: Optional[bool] = None
+    ) -> List[Deck]:
+        """
+        Return all decks in the database, optionally loading cards.
+        Sorting by size or validity and filtering by validity use deck_stats only.
+        """
         with SessionLocal() as session:
-            stmt = select(Deck).options(joinedload(Deck.archetype))
+            stmt = (
+                select(Deck)
+                .outerjoin(DeckStats, DeckStats.deck_id == Deck.id)
+                .options(joinedload(Deck.archetype), contains_eager(Deck.stats))
+            )
             if load_cards:
                 stmt = stmt.options(selectinload(Deck.cards))
+            if valid is not None:
+                stmt = stmt.where(DeckStats.valid.is_(valid))
+            if sort_by is not None:
+                column = DECK_SORT_COLUMNS[sort_by]
+                stmt = stmt.order_by(column.desc() if descending else column.asc(), Deck.id)
             
             result = session.execute(stmt).unique().scalars().all()
             for deck in result:
@@ -70,10 +247,17 @@ class DeckRepository:
                 deck.name = name
             if description is not None:
                 deck.description = description
-            if archetype_id is not None:
+            if archetype_id is not None and archetype_id != deck.archetype_id:
+                contents = _deck_quantities(session, deck_id)
+                record_deck_change(session, deck.archetype_id, contents, archetype_id, contents)
                 deck.archetype_id = archetype_id
+                session.flush()
+                refresh_deck_stats(session, [deck_id])
             session.commit()
+            change_feed.publish("deck", "update", [deck_id])
             session.refresh(deck)
+            _ = deck.archetype
+            _ = deck.stats
             return deck
         
     def delete(self, deck_id: int) -> bool:
@@ -82,10 +266,208 @@ class DeckRepository:
             deck = session.get(Deck, deck_id)
             if not deck:
                 return False
+            before = _deck_quantities(session, deck_id)
+            record_deck_change(session, deck.archetype_id, before, None, {})
             session.delete(deck)
             session.commit()
+            cooccurrence_index.update_deck(before, {})
+            deck_payload_cache.invalidate_deck(deck_id)
+            change_feed.publish("deck", "delete", [deck_id])
             return True
 
+    def clone(
+        self,
+        deck_id: int,
+        name: Optional[str] = None,
+        archetype_id: Optional[int] = None,
+        description: Optional[str] = None,
+        substitutions: Optional[Dict[int, int]] = None
+    ) -> Optional[Deck]:
+        """
+        Copy a deck and its cards with one INSERT ... SELECT per table.
+        
+        substitutions maps card ids of the source deck to the card ids to use in
+        the copy; quantities are merged if a substitute is already in the deck.
+        Returns the new deck, or None if the source deck doesn't exist.
+        Raises ValueError (nothing is written) for an unknown archetype or substitute,
+        or if a substitute ends up above its max_occurrence.
+        """
+        substitutions = {old: new for old, new in (substitutions or {}).items() if old != new}
+        now = datetime.utcnow()
+        with SessionLocal() as session:
+            if archetype_id is not None and session.get(Archetype, archetype_id) is None:
+                raise ValueError(f"Archetype with ID {archetype_id} not found")
+            if substitutions:
+                targets = set(substitutions.values())
+                found = set(session.scalars(select(Card.id).where(Card.id.in_(targets))).all())
+                if targets - found:
+                    raise ValueError(f"Card(s) not found: {', '.join(map(str, sorted(targets - found)))}")
+            
+            source = select(
+                func.coalesce(literal(name), func.left(Deck.name + " (copy)", 100)),
+                func.coalesce(literal(description), Deck.description),
+                func.coalesce(literal(archetype_id, Integer), Deck.archetype_id),
+                literal(now),
+                literal(now)
+            ).where(Deck.id == deck_id)
+            new_id = session.execute(
+                insert(Deck)
+                .from_select(["name", "description", "archetype_id", "created_at", "updated_at"], source)
+                .returning(Deck.id)
+            ).scalar()
+            if new_id is None:
+                return None
+            
+            cards = select(DeckCard.card_id, DeckCard.quantity).where(DeckCard.deck_id == deck_id)
+            if substitutions:
+                swaps = values(column("old_id", Integer), column("new_id", Integer), name="swaps").data(
+                    list(substitutions.items())
+                )
+                cards = (
+                    select(func.coalesce(swaps.c.new_id, DeckCard.card_id).label("card_id"), DeckCard.quantity)
+                    .outerjoin(swaps, swaps.c.old_id == DeckCard.card_id)
+                    .where(DeckCard.deck_id == deck_id)
+                )
+            cards = cards.subquery("source_cards")
+            cards = (
+                select(literal(new_id), cards.c.card_id, func.sum(cards.c.quantity), literal(now), literal(now))
+                .group_by(cards.c.card_id)
+            )
+            session.execute(
+                insert(DeckCard).from_select(["deck_id", "card_id", "quantity", "created_at", "updated_at"], cards)
+            )
+            
+            if substitutions:
+                over = session.execute(
+                    select(Card.name, Card.max_occurrence, DeckCard.quantity)
+                    .join(Card, Card.id == DeckCard.card_id)
+                    .where(
+                        DeckCard.deck_id == new_id,
+                        DeckCard.card_id.in_(substitutions.values()),
+                        DeckCard.quantity > Card.max_occurrence
+                    )
+                ).first()
+                if over is not None:
+                    session.rollback()
+                    raise ValueError(
+                        f"Quantity ({over.quantity}) exceeds max_occurrence ({over.max_occurrence}) for card '{over.name}'"
+                    )
+            
+            refresh_deck_stats(session, [new_id])
+            refresh_deck_signatures(session, [new_id])
+            after = _deck_quantities(session, new_id)
+            deck = session.get(Deck, new_id)
+            record_deck_change(session, None, {}, deck.archetype_id, after)
+            session.commit()
+            cooccurrence_index.update_deck({}, after)
+            change_feed.publish("deck", "create", [new_id])
+            _ = deck.archetype
+            _ = deck.stats
+            return deck
+
+    def diff(self, deck_id: int, other_deck_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Compare the cards of two decks with one FULL OUTER JOIN.
+        Returns [{card_id, name, quantity, other_quantity}] for the cards whose quantity
+        differs (0 when absent), or None if either deck doesn't exist.
+        """
+        with SessionLocal() as session:
+            found = session.scalar(select(func.count()).where(Deck.id.in_([deck_id, other_deck_id])))
+            if found < len({deck_id, other_deck_id}):
+                return None
+            left = select(DeckCard.card_id, DeckCard.quantity).where(DeckCard.deck_id == deck_id).subquery("a")
+            right = select(DeckCard.card_id, DeckCard.quantity).where(DeckCard.deck_id == other_deck_id).subquery("b")
+            card_id = func.coalesce(left.c.card_id, right.c.card_id)
+            quantity = func.coalesce(left.c.quantity, 0)
+            other_quantity = func.coalesce(right.c.quantity, 0)
+            stmt = (
+                select(
+                    card_id.label("card_id"),
+                    Card.name,
+                    quantity.label("quantity"),
+                    other_quantity.label("other_quantity")
+                )
+                .select_from(left)
+                .join(right, left.c.card_id == right.c.card_id, full=True)
+                .join(Card, Card.id == card_id)
+                .where(quantity != other_quantity)
+                .order_by(card_id)
+            )
+            return [dict(row._mapping) for row in session.execute(stmt)]
+
+    def find_similar(
+        self,
+        deck_id: int,
+        limit: int = 20,
+        min_similarity: float = 0.5
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Find the decks most similar to a deck through the LSH buckets of deck_signatures.
+        Returns [{deck_id, name, archetype_id, similarity}] (estimated Jaccard similarity
+        of the card copies), or None if the deck doesn't exist.
+        """
+        with SessionLocal() as session:
+            ranked = similar_decks(session, deck_id, min_similarity=min_similarity)
+            if ranked is None:
+                return None
+            ranked = ranked[:limit]
+            decks = {
+                row.id: row
+                for row in session.execute(
+                    select(Deck.id, Deck.name, Deck.archetype_id).where(Deck.id.in_([d for d, _ in ranked]))
+                )
+            }
+            return [
+                {
+                    "deck_id": similar_id,
+                    "name": decks[similar_id].name,
+                    "archetype_id": decks[similar_id].archetype_id,
+                    "similarity": similarity
+                }
+                for similar_id, similarity in ranked
+                if similar_id in decks
+            ]
+
+    def cluster(self, min_similarity: float = 0.8, min_size: int = 2) -> Dict[str, Any]:
+        """Group near-duplicate decks into clusters (see deck_signatures.cluster_decks)."""
+        return cluster_decks(min_similarity=min_similarity, min_size=min_size)
+
+    def rebuild_signatures(self) -> int:
+        """Recompute every deck's MinHash signature; returns the number of decks."""
+        return rebuild_deck_signatures()
+
+    def check_stats(self, rebuild: bool = False) -> Dict[str, Any]:
+        """Check deck_stats against deck_cards, optionally rebuilding mismatched rows."""
+        return check_deck_stats(rebuild=rebuild)
+
+    def list_invalidations(
+        self,
+        after_id: int = 0,
+        limit: int = 100,
+        deck_id: Optional[int] = None
+    ) -> List[DeckInvalidation]:
+        """List recorded deck invalidations with an id greater than after_id, oldest first."""
+        with SessionLocal() as session:
+            stmt = select(DeckInvalidation).where(DeckInvalidation.id > after_id)
+            if deck_id is not None:
+                stmt = stmt.where(DeckInvalidation.deck_id == deck_id)
+            stmt = stmt.order_by(DeckInvalidation.id).limit(limit)
+            return list(session.scalars(stmt).all())
+
+    def list_rules(self) -> List[Dict[str, str]]:
+        """List the registered validation rules."""
+        return [{"code": rule.code, "description": rule.description} for rule in RULES.values()]
+
+    def validate_all(
+        self,
+        deck_ids: Optional[List[int]] = None,
+        archetype_id: Optional[int] = None,
+        rules: Optional[List[str]] = None,
+        config: Optional[DeckRuleConfig] = None
+    ) -> Dict[str, Any]:
+        """Run the validation rules over all decks (or a subset) with one query per rule."""
+        return run_rules(deck_ids=deck_ids, archetype_id=archetype_id, rule_codes=rules, config=config)
+
     def add_card(self, deck_id: int, card_id: int, quantity: int) -> bool:
         """Add a card to a deck with specified quantity."""
         with SessionLocal() as session:
@@ -96,7 +478,8 @@ class DeckRepository:
                 return False
             
             # Check if association already exists
-            existing = session.get(DeckCard, {"deck_id": deck_id, "card_id": card_id})
+            existing = session.get(DeckCard, {"deck_id": deck_id, "card_id": card_id}, with_for_update=True)
+            previous = existing.quantity if existing else 0
             if existing:
                 # Update quantity
                 existing.quantity = quantity
@@ -105,35 +488,287 @@ class DeckRepository:
                 deck_card = DeckCard(deck_id=deck_id, card_id=card_id, quantity=quantity)
                 session.add(deck_card)
             
+            session.flush()
+            refresh_deck_stats(session, [deck_id])
+            refresh_deck_signatures(session, [deck_id])
+            after = _deck_quantities(session, deck_id)
+            before = _replaced(after, card_id, previous)
+            record_deck_change(session, deck.archetype_id, before, deck.archetype_id, after)
             session.commit()
+            cooccurrence_index.update_deck(before, after)
+            deck_payload_cache.invalidate_deck(deck_id)
+            change_feed.publish("deck", "cards", [deck_id])
             return True
 
     def remove_card(self, deck_id: int, card_id: int) -> bool:
         """Remove a card from a deck."""
         with SessionLocal() as session:
-            deck_card = session.get(DeckCard, {"deck_id": deck_id, "card_id": card_id})
+            deck_card = session.get(DeckCard, {"deck_id": deck_id, "card_id": card_id}, with_for_update=True)
             if not deck_card:
                 return False
+            previous = deck_card.quantity
             session.delete(deck_card)
+            session.flush()
+            refresh_deck_stats(session, [deck_id])
+            refresh_deck_signatures(session, [deck_id])
+            after = _deck_quantities(session, deck_id)
+            before = _replaced(after, card_id, previous)
+            archetype_id = session.scalar(select(Deck.archetype_id).where(Deck.id == deck_id))
+            record_deck_change(session, archetype_id, before, archetype_id, after)
             session.commit()
+            cooccurrence_index.update_deck(before, after)
+            deck_payload_cache.invalidate_deck(deck_id)
+            change_feed.publish("deck", "cards", [deck_id])
             return True
 
     def update_card_quantity(self, deck_id: int, card_id: int, quantity: int) -> bool:
         """Update the quantity of a card in a deck."""
         with SessionLocal() as session:
-            deck_card = session.get(DeckCard, {"deck_id": deck_id, "card_id": card_id})
+            deck_card = session.get(DeckCard, {"deck_id": deck_id, "card_id": card_id}, with_for_update=True)
             if not deck_card:
                 return False
+            previous = deck_card.quantity
             deck_card.quantity = quantity
+            session.flush()
+            refresh_deck_stats(session, [deck_id])
+            refresh_deck_signatures(session, [deck_id])
+            after = _deck_quantities(session, deck_id)
+            before = _replaced(after, card_id, previous)
+            archetype_id = session.scalar(select(Deck.archetype_id).where(Deck.id == deck_id))
+            record_deck_change(session, archetype_id, before, archetype_id, after)
             session.commit()
+            cooccurrence_index.update_deck(before, after)
+            deck_payload_cache.invalidate_deck(deck_id)
+            change_feed.publish("deck", "cards", [deck_id])
             return True
 
-    def get_deck_cards(self, deck_id: int) -> List[Dict]:
-        """Get all cards in a deck with their quantities."""
+    def apply_card_operations(self, deck_id: int, operations: List[Dict[str, Any]]) -> Optional[Dict[int, int]]:
+        """
+        Apply an ordered list of {op, card_id, quantity} operations to a deck in one transaction.
+        
+        'add' adds copies, 'set' sets the quantity and 'remove' takes the card out.
+        The current quantities and every card's max_occurrence are read in one query
+        (with the deck row locked), the final state is validated, and changes are
+        written with one bulk DELETE and one bulk upsert.
+        Returns the resulting {card_id: quantity}, or None if the deck doesn't exist.
+        Raises ValueError (nothing is written) if a card is unknown or a quantity invalid.
+        """
+        card_ids = {operation["card_id"] for operation in operations}
+        with SessionLocal() as session:
+            # Lock the deck so concurrent batches on it are serialized
+            archetype_id = session.execute(
+                select(Deck.archetype_id).where(Deck.id == deck_id).with_for_update()
+            ).scalar()
+            if archetype_id is None:
+                return None
+            
+            stmt = (
+                select(Card.id, Card.name, Card.max_occurrence, DeckCard.quantity)
+                .outerjoin(DeckCard, (DeckCard.card_id == Card.id) & (DeckCard.deck_id == deck_id))
+                .where(Card.id.in_(card_ids))
+            )
+            cards = {row.id: row for row in session.execute(stmt)}
+            missing = sorted(card_ids - cards.keys())
+            if missing:
+                raise ValueError(f"Card(s) not found: {', '.join(map(str, missing))}")
+            
+            original = {card_id: row.quantity or 0 for card_id, row in cards.items()}
+            quantities = dict(original)
+            for operation in operations:
+                card_id = operation["card_id"]
+                if operation["op"] == "add":
+                    quantities[card_id] += operation["quantity"]
+                elif operation["op"] == "set":
+                    quantities[card_id] = operation["quantity"]
+                else:
+                    quantities[card_id] = 0
+            
+            for card_id, quantity in quantities.items():
+                card = cards[card_id]
+                if quantity > card.max_occurrence:
+                    raise ValueError(
+                        f"Quantity ({quantity}) exceeds max_occurrence ({card.max_occurrence}) for card '{card.name}'"
+                    )
+            
+            after, _ = self._write_quantities(session, deck_id, archetype_id, original, quantities)
+            return after
+    
+    def _write_quantities(
+        self,
+        session,
+        deck_id: int,
+        archetype_id: int,
+        original: Dict[int, int],
+        quantities: Dict[int, int]
+    ) -> Tuple[Dict[int, int], int]:
+        """
+        Write new quantities of some cards of a locked deck (0 removes the card) with one
+        bulk DELETE and one bulk upsert, maintain the derived tables and commit.
+        Returns the resulting {card_id: quantity} and the deck's content version.
+        """
+        removed = [card_id for card_id, quantity in quantities.items() if quantity == 0 and original[card_id]]
+        upserts = [
+            {"deck_id": deck_id, "card_id": card_id, "quantity": quantity}
+            for card_id, quantity in quantities.items()
+            if quantity and quantity != original[card_id]
+        ]
+        if removed:
+            session.execute(
+                delete(DeckCard).where(DeckCard.deck_id == deck_id, DeckCard.card_id.in_(removed))
+            )
+        if upserts:
+            stmt = insert(DeckCard).values(upserts)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=[DeckCard.deck_id, DeckCard.card_id],
+                set_={"quantity": stmt.excluded.quantity, "updated_at": datetime.utcnow()}
+            ))
+        if removed or upserts:
+            refresh_deck_stats(session, [deck_id])
+            refresh_deck_signatures(session, [deck_id])
+        after = _deck_quantities(session, deck_id)
+        before = dict(after)
+        for card_id, quantity in original.items():
+            before = _replaced(before, card_id, quantity)
+        record_deck_change(session, archetype_id, before, archetype_id, after)
+        version = session.scalar(select(DeckStats.version).where(DeckStats.deck_id == deck_id)) or 0
+        session.commit()
+        cooccurrence_index.update_deck(before, after)
+        deck_payload_cache.invalidate_deck(deck_id)
+        if removed or upserts:
+            change_feed.publish("deck", "cards", [deck_id])
+        return after, version
+    
+    def get_live_state(self, deck_id: int) -> Optional[Dict[str, Any]]:
+        """Get a deck's content version and {card_id: quantity}, or None if it doesn't exist."""
+        with SessionLocal() as session:
+            exists = session.execute(
+                select(Deck.id, func.coalesce(DeckStats.version, 0).label("version"))
+                .outerjoin(DeckStats, DeckStats.deck_id == Deck.id)
+                .where(Deck.id == deck_id)
+            ).first()
+            if exists is None:
+                return None
+            return {"version": exists.version, "quantities": _deck_quantities(session, deck_id)}
+    
+    def merge_card_changes(self, deck_id: int, changes: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Apply the changes of one live editing message to a deck in one transaction.
+        
+        A change is {card_id, delta} or {card_id, quantity[, expected]}. Deltas are
+        applied to the current quantity, whatever concurrent edits happened, and
+        clamped to [0, max_occurrence]. A quantity is a compare-and-set: with
+        expected, it only applies if the current quantity still is expected.
+        If any compare-and-set fails nothing is written and the conflicting cards
+        are returned. Returns {version, applied: [{card_id, quantity, delta}],
+        conflicts: [{card_id, quantity}]}, or None if the deck doesn't exist.
+        Raises ValueError (nothing is written) if a card is unknown or a quantity invalid.
+        """
+        card_ids = {change["card_id"] for change in changes}
+        with SessionLocal() as session:
+            archetype_id = session.execute(
+                select(Deck.archetype_id).where(Deck.id == deck_id).with_for_update()
+            ).scalar()
+            if archetype_id is None:
+                return None
+            
+            stmt = (
+                select(Card.id, Card.name, Card.max_occurrence, DeckCard.quantity)
+                .outerjoin(DeckCard, (DeckCard.card_id == Card.id) & (DeckCard.deck_id == deck_id))
+                .where(Card.id.in_(card_ids))
+            )
+            cards = {row.id: row for row in session.execute(stmt)}
+            missing = sorted(card_ids - cards.keys())
+            if missing:
+                raise ValueError(f"Card(s) not found: {', '.join(map(str, missing))}")
+            
+            original = {card_id: row.quantity or 0 for card_id, row in cards.items()}
+            quantities = dict(original)
+            conflicts = set()
+            for change in changes:
+                card_id = change["card_id"]
+                card = cards[card_id]
+                if change.get("delta") is not None:
+                    quantities[card_id] = min(max(quantities[card_id] + change["delta"], 0), card.max_occurrence)
+                    continue
+                if change.get("expected") is not None and change["expected"] != quantities[card_id]:
+                    conflicts.add(card_id)
+                    continue
+                if change["quantity"] > card.max_occurrence:
+                    raise ValueError(
+                        f"Quantity ({change['quantity']}) exceeds max_occurrence ({card.max_occurrence}) for card '{card.name}'"
+                    )
+                quantities[card_id] = change["quantity"]
+            
+            applied = [
+                {"card_id": card_id, "quantity": quantity, "delta": quantity - original[card_id]}
+                for card_id, quantity in sorted(quantities.items())
+                if quantity != original[card_id]
+            ]
+            if conflicts or not applied:
+                version = session.scalar(select(DeckStats.version).where(DeckStats.deck_id == deck_id))
+                session.rollback()
+                return {
+                    "version": version or 0,
+                    "applied": [],
+                    "conflicts": [
+                        {"card_id": card_id, "quantity": original[card_id]} for card_id in sorted(conflicts)
+                    ]
+                }
+            
+            _, version = self._write_quantities(session, deck_id, archetype_id, original, quantities)
+            return {
+                "version": version,
+                "applied": applied,
+                "conflicts": []
+            }
+
+    def get_profile(self, deck_id: int) -> Optional[List[Dict[str, int]]]:
+        """
+        Get [{card_id, quantity, type_id, cost}] for a deck with one lean query
+        (no relationships loaded), or None if the deck doesn't exist.
+        """
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(Deck.id, DeckCard.card_id, DeckCard.quantity, Card.type_id, Card.cost)
+                .outerjoin(DeckCard, DeckCard.deck_id == Deck.id)
+                .outerjoin(Card, Card.id == DeckCard.card_id)
+                .where(Deck.id == deck_id)
+            ).all()
+            if not rows:
+                return None
+            return [
+                {"card_id": row.card_id, "quantity": row.quantity, "type_id": row.type_id, "cost": row.cost}
+                for row in rows if row.card_id is not None
+            ]
+
+    def profile_decklist(self, quantities: Dict[int, int]) -> List[Dict[str, int]]:
+        """
+        Get the same profile as get_profile for an unsaved {card_id: quantity}, with
+        each card's max_occurrence; unknown cards are left out.
+        """
+        if not quantities:
+            return []
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(Card.id, Card.type_id, Card.cost, Card.max_occurrence).where(Card.id.in_(quantities.keys()))
+            )
+            return [
+                {
+                    "card_id": row.id,
+                    "quantity": quantities[row.id],
+                    "type_id": row.type_id,
+                    "cost": row.cost,
+                    "max_occurrence": row.max_occurrence
+                }
+                for row in rows
+            ]
+
+    def get_deck_cards(self, deck_id: int) -> Optional[List[Dict]]:
+        """Get all cards in a deck with their quantities, or None if the deck doesn't exist."""
         with SessionLocal() as session:
             deck = session.get(Deck, deck_id)
             if not deck:
-                return []
+                return None
             
             # Query DeckCard associations with Card data, eagerly loading relationships
             stmt = (
@@ -179,7 +814,150 @@ class DeckRepository:
     def get_total_cards(self, deck_id: int) -> int:
         """Get the total number of cards in a deck (sum of all quantities)."""
         with SessionLocal() as session:
-            stmt = select(DeckCard).where(DeckCard.deck_id == deck_id)
-            deck_cards = session.scalars(stmt).all()
-            return sum(dc.quantity for dc in deck_cards)
+            stmt = select(func.coalesce(func.sum(DeckCard.quantity), 0)).where(DeckCard.deck_id == deck_id)
+            return session.scalar(stmt)
+
+    def _summarize(self, session, source) -> Optional[Dict[str, Any]]:
+        """
+        Aggregate a decklist in one GROUPING SETS query.
+        
+        `source` must expose deck_id, card_id and quantity columns; card_id and
+        quantity may be NULL (empty deck). Returns None if source has no rows.
+        """
+        card = Card.__table__
+        quantity = source.c.quantity
+        # GROUPING() bitmask of the columns *not* grouped in a row:
+        # 0b011 -> per cost, 0b101 -> per type, 0b110 -> per faction, 0b111 -> totals
+        stmt = (
+            select(
+                card.c.cost,
+                card.c.type_id,
+                card.c.faction_id,
+                func.grouping(card.c.cost, card.c.type_id, card.c.faction_id).label("grouping"),
+                func.count(source.c.deck_id).label("rows"),
+                func.count(card.c.id).label("distinct_cards"),
+                func.coalesce(func.sum(quantity), 0).label("total_cards"),
+                func.sum(card.c.combat_power * quantity).label("combat_power_sum"),
+                func.sum(card.c.resilience * quantity).label("resilience_sum"),
+                func.json_agg(
+                    func.json_build_object(
+                        "card_id", card.c.id,
+                        "card_name", card.c.name,
+                        "quantity", quantity,
+                        "max_occurrence", card.c.max_occurrence
+                    )
+                ).filter(quantity > card.c.max_occurrence).label("violations"),
+                func.array_agg(source.c.card_id).filter(
+                    source.c.card_id.is_not(None) & card.c.id.is_(None)
+                ).label("unknown_card_ids")
+            )
+            .select_from(source.outerjoin(card, card.c.id == source.c.card_id))
+            .group_by(func.grouping_sets(
+                tuple_(card.c.cost),
+                tuple_(card.c.type_id),
+                tuple_(card.c.faction_id),
+                tuple_()
+            ))
+        )
+        
+        summary = None
+        cost_curve, types, factions = [], [], []
+        for row in session.execute(stmt):
+            if row.grouping == 0b111:
+                if not row.rows:
+                    return None
+                summary = row
+            elif row.grouping == 0b011 and row.cost is not None:
+                cost_curve.append({"cost": row.cost, "count": row.total_cards})
+            elif row.grouping == 0b101 and row.type_id is not None:
+                types.append({"id": row.type_id, "count": row.total_cards})
+            elif row.grouping == 0b110 and row.faction_id is not None:
+                factions.append({"id": row.faction_id, "count": row.total_cards})
+        
+        if summary is None:
+            return None
+        total = summary.total_cards
+        return {
+            "total_cards": total,
+            "distinct_cards": summary.distinct_cards,
+            "cost_curve": sorted(cost_curve, key=lambda c: c["cost"]),
+            "average_combat_power": summary.combat_power_sum / total if total else None,
+            "average_resilience": summary.resilience_sum / total if total else None,
+            "types": sorted(types, key=lambda t: t["id"]),
+            "factions": sorted(factions, key=lambda f: f["id"]),
+            "violations": summary.violations or [],
+            "unknown_card_ids": sorted(summary.unknown_card_ids or []),
+        }
+
+    def get_summary(self, deck_id: int) -> Optional[Dict[str, Any]]:
+        """Return aggregate statistics for a deck, or None if the deck doesn't exist."""
+        source = (
+            select(Deck.id.label("deck_id"), DeckCard.card_id, DeckCard.quantity)
+            .select_from(Deck)
+            .outerjoin(DeckCard, DeckCard.deck_id == Deck.id)
+            .where(Deck.id == deck_id)
+            .subquery("decklist")
+        )
+        with SessionLocal() as session:
+            summary = self._summarize(session, source)
+            if summary is not None:
+                summary["violations"] = self._rule_violations(session, deck_id)
+            return summary
+
+    def _rule_violations(self, session, deck_id: int) -> List[Dict[str, Any]]:
+        """
+        Violations of the default rules (the ones deciding deck_stats.valid) by a
+        saved deck, with the name, quantity and max_occurrence of the cards involved.
+        """
+        violations = collect_violations(session, default_rules(), [deck_id], DeckRuleConfig()).get(deck_id, [])
+        card_ids = {v["card_id"] for v in violations if v["card_id"] is not None}
+        cards = {
+            row.id: row
+            for row in session.execute(
+                select(Card.id, Card.name, Card.max_occurrence, DeckCard.quantity)
+                .join(DeckCard, (DeckCard.card_id == Card.id) & (DeckCard.deck_id == deck_id))
+                .where(Card.id.in_(card_ids))
+            )
+        } if card_ids else {}
+        return [
+            {
+                "rule": v["rule"],
+                "card_id": v["card_id"],
+                "card_name": cards[v["card_id"]].name if v["card_id"] in cards else None,
+                "quantity": cards[v["card_id"]].quantity if v["card_id"] in cards else None,
+                "max_occurrence": cards[v["card_id"]].max_occurrence if v["card_id"] in cards else None,
+                "message": v["message"]
+            }
+            for v in violations
+        ]
+
+    def summarize_decklist(self, quantities: Dict[int, int]) -> Dict[str, Any]:
+        """Return aggregate statistics for an unsaved decklist given as {card_id: quantity}."""
+        if not quantities:
+            return self._empty_summary()
+        source = (
+            values(
+                column("deck_id", Integer),
+                column("card_id", Integer),
+                column("quantity", Integer),
+                name="decklist"
+            )
+            .data([(0, card_id, quantity) for card_id, quantity in quantities.items()])
+        )
+        with SessionLocal() as session:
+            return self._summarize(session, source)
+
+    @staticmethod
+    def _empty_summary() -> Dict[str, Any]:
+        return {
+            "total_cards": 0,
+            "distinct_cards": 0,
+            "cost_curve": [],
+            "average_combat_power": None,
+            "average_resilience": None,
+            "types": [],
+            "factions": [],
+            "violations": [],
+            "unknown_card_ids": [],
+        }
 
@@ -0,0 +1,229 @@
+"""
+Pluggable deck validation rules.
+
+Each rule compiles to one set-based SELECT that returns a row per violation
+for a whole set of decks at once, with the columns
+(deck_id, card_id, type_id, actual, allowed); card_id/type_id are NULL when
+they don't apply. New rules are added by subclassing DeckRule and decorating
+the class with @register_rule.
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any
+from sqlalchemy import select, func, literal, null, values, column, Integer, or_, case
+from server.db.schema.deck import Deck
+from server.db.schema.card import Card
+from server.db.schema.deck_card import DeckCard
+from server.db.schema.deck_stats import DeckStats
+from server.db.schema.archetype import Archetype
+from server.db.db_config import SessionLocal
+
+
+# Cards of this archetype may be played in any deck
+UNIVERSAL_ARCHETYPE = "Universelle"
+
+
+@dataclass
+class DeckRuleConfig:
+    """Parameters of the configurable rules; a rule whose parameters are unset is skipped."""
+    min_cards: Optional[int] = None
+    max_cards: Optional[int] = None
+    type_limits: Dict[int, int] = field(default_factory=dict)  # {type_id: max copies of that type}
+
+
+class DeckRule(ABC):
+    code: str = ""
+    description: str = ""
+
+    def applies(self, config: DeckRuleConfig) -> bool:
+        return True
+
+    @abstractmethod
+    def violations(self, deck_ids, config: DeckRuleConfig):
+        """Return a SELECT of (deck_id, card_id, type_id, actual, allowed) for decks in deck_ids."""
+
+    @abstractmethod
+    def message(self, row) -> str:
+        """Describe one violation row."""
+
+
+RULES: Dict[str, DeckRule] = {}
+
+
+def register_rule(rule_cls):
+    """Class decorator adding a rule to the registry under its code."""
+    RULES[rule_cls.code] = rule_cls()
+    return rule_cls
+
+
+@register_rule
+class MaxOccurrenceRule(DeckRule):
+    code = "max_occurrence"
+    description = "A card cannot be played more times than its max_occurrence"
+
+    def violations(self, deck_ids, config):
+        return (
+            select(
+                DeckCard.deck_id,
+                DeckCard.card_id,
+                null().label("type_id"),
+                DeckCard.quantity.label("actual"),
+                Card.max_occurrence.label("allowed")
+            )
+            .join(Card, Card.id == DeckCard.card_id)
+            .where(DeckCard.deck_id.in_(deck_ids), DeckCard.quantity > Card.max_occurrence)
+        )
+
+    def message(self, row):
+        return f"Card {row.card_id} has quantity {row.actual} but max_occurrence is {row.allowed}"
+
+
+@register_rule
+class ArchetypeRule(DeckRule):
+    code = "archetype"
+    description = f"Cards must belong to the deck's archetype or to '{UNIVERSAL_ARCHETYPE}'"
+
+    def violations(self, deck_ids, config):
+        universal = select(Archetype.id).where(Archetype.name == UNIVERSAL_ARCHETYPE)
+        return (
+            select(
+                DeckCard.deck_id,
+                DeckCard.card_id,
+                null().label("type_id"),
+                Card.archetype_id.label("actual"),
+                Deck.archetype_id.label("allowed")
+            )
+            .join(Card, Card.id == DeckCard.card_id)
+            .join(Deck, Deck.id == DeckCard.deck_id)
+            .where(
+                DeckCard.deck_id.in_(deck_ids),
+                Card.archetype_id != Deck.archetype_id,
+                Card.archetype_id.not_in(universal)
+            )
+        )
+
+    def message(self, row):
+        return f"Card {row.card_id} belongs to archetype {row.actual}, deck archetype is {row.allowed}"
+
+
+@register_rule
+class DeckSizeRule(DeckRule):
+    code = "deck_size"
+    description = "The deck must contain between min_cards and max_cards cards"
+
+    def applies(self, config):
+        return config.min_cards is not None or config.max_cards is not None
+
+    def violations(self, deck_ids, config):
+        # Served from the maintained deck_stats table, no deck_cards scan
+        total = DeckStats.total_cards
+        too_small = total < config.min_cards if config.min_cards is not None else literal(False)
+        too_large = total > config.max_cards if config.max_cards is not None else literal(False)
+        return (
+            select(
+                DeckStats.deck_id,
+                null().label("card_id"),
+                null().label("type_id"),
+                total.label("actual"),
+                case((too_small, config.min_cards), else_=config.max_cards).label("allowed")
+            )
+            .where(DeckStats.deck_id.in_(deck_ids), or_(too_small, too_large))
+        )
+
+    def message(self, row):
+        if row.actual < row.allowed:
+            return f"Deck has {row.actual} cards, minimum is {row.allowed}"
+        return f"Deck has {row.actual} cards, maximum is {row.allowed}"
+
+
+@register_rule
+class TypeLimitRule(DeckRule):
+    code = "type_limits"
+    description = "The deck cannot contain more cards of a type than that type's limit"
+
+    def applies(self, config):
+        return bool(config.type_limits)
+
+    def violations(self, deck_ids, config):
+        limits = (
+            values(column("type_id", Integer), column("max_cards", Integer), name="type_limits")
+            .data(list(config.type_limits.items()))
+        )
+        total = func.sum(DeckCard.quantity)
+        return (
+            select(
+                DeckCard.deck_id,
+                null().label("card_id"),
+                Card.type_id,
+                total.label("actual"),
+                func.min(limits.c.max_cards).label("allowed")
+            )
+            .join(Card, Card.id == DeckCard.card_id)
+            .join(limits, limits.c.type_id == Card.type_id)
+            .where(DeckCard.deck_id.in_(deck_ids))
+            .group_by(DeckCard.deck_id, Card.type_id)
+            .having(total > func.min(limits.c.max_cards))
+        )
+
+    def message(self, row):
+        return f"Deck has {row.actual} cards of type {row.type_id}, limit is {row.allowed}"
+
+
+def default_rules() -> List[DeckRule]:
+    """Rules that need no parameters; together they decide the persisted deck_stats.valid."""
+    config = DeckRuleConfig()
+    return [rule for rule in RULES.values() if rule.applies(config)]
+
+
+def collect_violations(session, rules: List[DeckRule], deck_ids, config: DeckRuleConfig) -> Dict[int, List[Dict[str, Any]]]:
+    """Run each rule once over deck_ids (a list or a SELECT of ids) and group the violations by deck."""
+    violations: Dict[int, List[Dict[str, Any]]] = {}
+    for rule in rules:
+        for row in session.execute(rule.violations(deck_ids, config)):
+            violations.setdefault(row.deck_id, []).append({
+                "rule": rule.code,
+                "card_id": row.card_id,
+                "type_id": row.type_id,
+                "actual": row.actual,
+                "allowed": row.allowed,
+                "message": rule.message(row)
+            })
+    return violations
+
+
+def run_rules(
+    deck_ids: Optional[List[int]] = None,
+    archetype_id: Optional[int] = None,
+    rule_codes: Optional[List[str]] = None,
+    config: Optional[DeckRuleConfig] = None
+) -> Dict[str, Any]:
+    """
+    Validate every deck (or the decks matching deck_ids/archetype_id) against the rules.
+    Runs one query per applicable rule and returns the violations grouped by deck.
+    """
+    config = config or DeckRuleConfig()
+    codes = rule_codes if rule_codes is not None else list(RULES)
+    unknown = [code for code in codes if code not in RULES]
+    if unknown:
+        raise ValueError(f"Unknown rule(s): {', '.join(unknown)}")
+    rules = [RULES[code] for code in codes if RULES[code].applies(config)]
+
+    selected = select(Deck.id)
+    if deck_ids is not None:
+        selected = selected.where(Deck.id.in_(deck_ids))
+    if archetype_id is not None:
+        selected = selected.where(Deck.archetype_id == archetype_id)
+
+    with SessionLocal() as session:
+        checked = session.scalar(select(func.count()).select_from(selected.subquery()))
+        violations = collect_violations(session, rules, selected, config)
+
+    return {
+        "checked_decks": checked,
+        "invalid_decks": len(violations),
+        "rules": [rule.code for rule in rules],
+        "results": [
+            {"deck_id": deck_id, "violations": deck_violations}
+            for deck_id, deck_violations in sorted(violations.items())
+        ]
+    }
@@ -0,0 +1,188 @@
+"""
+MinHash signatures and LSH buckets for near-duplicate deck detection.
+
+A deck is seen as the set of its card copies, (card_id, copy index) for every
+copy, so the Jaccard similarity of two such sets is
+sum(min(qa, qb)) / sum(max(qa, qb)) over the cards. Each deck_signatures row
+holds NUM_HASHES minima of random hash functions over that set: the share of
+equal positions between two signatures estimates the Jaccard similarity.
+
+The signature is cut into BANDS bands of ROWS values and each band is hashed
+into a 64-bit bucket. Decks sharing at least one bucket are the candidates of a
+lookup, found through the GIN index on deck_signatures.buckets; with 32 bands of
+4 rows, pairs above ~0.5 similarity are almost always candidates and pairs below
+~0.2 rarely are.
+
+Like deck_stats, signatures are refreshed from deck_cards inside the
+transaction of every write that changes a deck's cards. The hash functions are
+fixed by HASH_SEED: changing it (or the constants) requires a rebuild.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from server.db.schema.deck import Deck
+from server.db.schema.deck_card import DeckCard
+from server.db.schema.deck_signature import DeckSignature
+from server.db.db_config import SessionLocal
+
+
+NUM_HASHES = 128
+BANDS = 32
+ROWS = NUM_HASHES // BANDS
+HASH_SEED = 20240611
+PRIME = (1 << 31) - 1  # hash values fit in an INTEGER column
+COPY_SLOTS = 1024  # copy indexes per card in the element encoding
+REBUILD_BATCH = 1000
+
+_rng = np.random.default_rng(HASH_SEED)
+_A = _rng.integers(1, PRIME, NUM_HASHES, dtype=np.uint64)
+_B = _rng.integers(0, PRIME, NUM_HASHES, dtype=np.uint64)
+
+
+def minhash(contents: Dict[int, int]) -> np.ndarray:
+    """MinHash signature of a non-empty {card_id: quantity}."""
+    elements = np.array(
+        [card_id * COPY_SLOTS + copy for card_id, quantity in contents.items() for copy in range(quantity)],
+        dtype=np.uint64
+    ) % PRIME
+    # a * x + b stays below 2**63 because a, b and x are below 2**31
+    return ((_A[:, None] * elements[None, :] + _B[:, None]) % PRIME).min(axis=1).astype(np.int64)
+
+
+def lsh_buckets(signature: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket per band; the band number is part of the hash."""
+    buckets = []
+    for band in range(BANDS):
+        payload = band.to_bytes(2, "little") + signature[band * ROWS:(band + 1) * ROWS].astype("<i4").tobytes()
+        digest = hashlib.blake2b(payload, digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+def estimate_similarity(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity between one signature and each row of others."""
+    return (others == signature).mean(axis=1)
+
+
+def refresh_deck_signatures(session, deck_ids: Iterable[int]):
+    """Recompute the signatures of the given decks from deck_cards inside the caller's transaction."""
+    deck_ids = sorted(set(deck_ids))
+    if not deck_ids:
+        return
+    contents: Dict[int, Dict[int, int]] = defaultdict(dict)
+    for row in session.execute(
+        select(DeckCard.deck_id, DeckCard.card_id, DeckCard.quantity).where(DeckCard.deck_id.in_(deck_ids))
+    ):
+        contents[row.deck_id][row.card_id] = row.quantity
+
+    now = datetime.utcnow()
+    rows = []
+    for deck_id in deck_ids:
+        if deck_id in contents:
+            signature = minhash(contents[deck_id])
+            rows.append({
+                "deck_id": deck_id,
+                "signature": signature.tolist(),
+                "buckets": lsh_buckets(signature),
+                "last_modified": now
+            })
+    if rows:
+        stmt = insert(DeckSignature).values(rows)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[DeckSignature.deck_id],
+            set_={name: stmt.excluded[name] for name in ("signature", "buckets", "last_modified")}
+        ))
+    empty = [deck_id for deck_id in deck_ids if deck_id not in contents]
+    if empty:
+        session.execute(delete(DeckSignature).where(DeckSignature.deck_id.in_(empty)))
+
+
+def similar_decks(session, deck_id: int, min_similarity: float = 0.5) -> Optional[List[Tuple[int, float]]]:
+    """
+    Return (deck_id, estimated similarity) for the decks sharing an LSH bucket with
+    the deck and at least min_similarity, most similar first; [] for an empty deck
+    and None if the deck doesn't exist.
+    """
+    own = session.get(DeckSignature, deck_id)
+    if own is None:
+        return [] if session.get(Deck, deck_id) is not None else None
+    rows = session.execute(
+        select(DeckSignature.deck_id, DeckSignature.signature)
+        .where(DeckSignature.buckets.overlap(own.buckets), DeckSignature.deck_id != deck_id)
+    ).all()
+    if not rows:
+        return []
+    similarity = estimate_similarity(
+        np.array(own.signature, dtype=np.int64),
+        np.array([row.signature for row in rows], dtype=np.int64)
+    )
+    return sorted(
+        ((row.deck_id, float(score)) for row, score in zip(rows, similarity) if score >= min_similarity),
+        key=lambda item: (-item[1], item[0])
+    )
+
+
+def cluster_decks(min_similarity: float = 0.8, min_size: int = 2) -> Dict[str, Any]:
+    """
+    Group decks into clusters of near-duplicates: decks are linked when they share
+    a bucket and their estimated similarity reaches min_similarity, and clusters
+    are the connected components. Returns the clusters of at least min_size decks,
+    largest first.
+    """
+    with SessionLocal() as session:
+        signatures = {
+            row.deck_id: np.array(row.signature, dtype=np.int64)
+            for row in session.execute(select(DeckSignature.deck_id, DeckSignature.signature))
+        }
+        members = select(DeckSignature.deck_id, func.unnest(DeckSignature.buckets).label("bucket")).subquery()
+        groups = session.scalars(
+            select(func.array_agg(members.c.deck_id))
+            .group_by(members.c.bucket)
+            .having(func.count() > 1)
+        ).all()
+
+    parent = {deck_id: deck_id for deck_id in signatures}
+
+    def find(deck_id: int) -> int:
+        while parent[deck_id] != deck_id:
+            parent[deck_id] = parent[parent[deck_id]]
+            deck_id = parent[deck_id]
+        return deck_id
+
+    # The same group of decks often shares several bands: compare it once
+    for group in {tuple(sorted(group)) for group in groups}:
+        group = [deck_id for deck_id in group if deck_id in signatures]
+        matrix = np.array([signatures[deck_id] for deck_id in group])
+        for i in range(len(group) - 1):
+            similarity = estimate_similarity(matrix[i], matrix[i + 1:])
+            for j in np.nonzero(similarity >= min_similarity)[0]:
+                a, b = find(group[i]), find(group[i + 1 + j])
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for deck_id in sorted(signatures):
+        clusters[find(deck_id)].append(deck_id)
+    found = sorted(
+        (deck_ids for deck_ids in clusters.values() if len(deck_ids) >= min_size),
+        key=lambda deck_ids: (-len(deck_ids), deck_ids[0])
+    )
+    return {
+        "decks": len(signatures),
+        "clusters": [{"size": len(deck_ids), "deck_ids": deck_ids} for deck_ids in found]
+    }
+
+
+def rebuild_deck_signatures() -> int:
+    """Recompute the signatures of every deck, REBUILD_BATCH decks per transaction; returns the deck count."""
+    with SessionLocal() as session:
+        deck_ids = list(session.scalars(select(Deck.id).order_by(Deck.id)).all())
+        for start in range(0, len(deck_ids), REBUILD_BATCH):
+            refresh_deck_signatures(session, deck_ids[start:start + REBUILD_BATCH])
+            session.commit()
+    return len(deck_ids)
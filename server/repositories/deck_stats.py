@@ -0,0 +1,191 @@
+"""
+Maintenance of the deck_stats table.
+
+Every write that changes a deck's contents (or the cost, type or max_occurrence
+of a card in it) calls one of the refresh helpers with the session of the write,
+before committing, so deck_stats always commits together with the change it
+reflects. A refresh recomputes the affected decks from deck_cards with one
+INSERT ... SELECT ... ON CONFLICT statement.
+
+A deck is valid when it breaks none of the parameterless rules of deck_rules
+(max_occurrence, archetype). Because refreshes only touch the decks affected
+by a write, revalidation costs are proportional to those decks; each deck that
+goes from valid to invalid is appended to the deck_invalidations feed.
+
+deck_stats.version counts the changes of a deck's contents (archetype and
+cards): a refresh increments it when the content hash changes. It is the
+per-deck sequence number of the live editing channel (services/deck_collab.py).
+"""
+from datetime import datetime
+from typing import Iterable, List, Dict, Any
+from sqlalchemy import select, func, literal, union_all, case, Integer, String
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by
+from server.db.schema.deck import Deck
+from server.db.schema.card import Card
+from server.db.schema.deck_card import DeckCard
+from server.db.schema.deck_stats import DeckStats
+from server.db.schema.deck_invalidation import DeckInvalidation
+from server.db.db_config import SessionLocal
+from server.repositories.deck_rules import DeckRuleConfig, default_rules, collect_violations
+
+
+STATS_COLUMNS = ("total_cards", "distinct_cards", "cost_sum", "type_counts", "valid", "content_hash")
+
+
+def _content_hash():
+    """
+    sha256 of "<archetype_id>|<card_id>:<quantity>,..." for the outer Deck row,
+    the same canonical form as services.deck_code.deck_content_hash.
+    """
+    cards = (
+        select(func.string_agg(
+            func.concat(DeckCard.card_id, ":", DeckCard.quantity),
+            aggregate_order_by(literal(","), DeckCard.card_id)
+        ))
+        .where(DeckCard.deck_id == Deck.id)
+        .scalar_subquery()
+    )
+    canonical = func.concat(Deck.archetype_id, "|", func.coalesce(cards, ""))
+    return func.encode(func.sha256(func.convert_to(canonical, "UTF8")), "hex")
+
+
+def _expected_stats(deck_ids=None):
+    """SELECT computing deck_stats rows from deck_cards (all decks if deck_ids is None)."""
+    per_type = (
+        select(
+            DeckCard.deck_id,
+            Card.type_id,
+            func.sum(DeckCard.quantity).label("quantity"),
+            func.count().label("distinct_cards"),
+            func.sum(Card.cost * DeckCard.quantity).label("cost_sum")
+        )
+        .join(Card, Card.id == DeckCard.card_id)
+        .group_by(DeckCard.deck_id, Card.type_id)
+    )
+    if deck_ids is not None:
+        per_type = per_type.where(DeckCard.deck_id.in_(deck_ids))
+    per_type = per_type.subquery("per_type")
+
+    deck_filter = deck_ids if deck_ids is not None else select(Deck.id)
+    invalid = union_all(*(
+        select(rule.violations(deck_filter, DeckRuleConfig()).subquery().c.deck_id)
+        for rule in default_rules()
+    ))
+
+    stmt = (
+        select(
+            Deck.id.label("deck_id"),
+            func.coalesce(func.sum(per_type.c.quantity), 0).cast(Integer).label("total_cards"),
+            func.coalesce(func.sum(per_type.c.distinct_cards), 0).cast(Integer).label("distinct_cards"),
+            func.coalesce(func.sum(per_type.c.cost_sum), 0).cast(Integer).label("cost_sum"),
+            func.coalesce(
+                func.jsonb_object_agg(per_type.c.type_id.cast(String), per_type.c.quantity)
+                .filter(per_type.c.type_id.is_not(None)),
+                func.jsonb_build_object()
+            ).label("type_counts"),
+            Deck.id.not_in(invalid).label("valid"),
+            _content_hash().label("content_hash")
+        )
+        .select_from(Deck)
+        .outerjoin(per_type, per_type.c.deck_id == Deck.id)
+        .group_by(Deck.id)
+    )
+    if deck_ids is not None:
+        stmt = stmt.where(Deck.id.in_(deck_ids))
+    return stmt
+
+
+def refresh_deck_stats(session, deck_ids: Iterable[int]) -> List[int]:
+    """
+    Recompute deck_stats for the given decks inside the caller's transaction.
+    Returns the IDs of the decks that became invalid.
+    """
+    deck_ids = sorted(set(deck_ids))
+    if not deck_ids:
+        return []
+    # Lock the stats rows first so that a concurrent refresh of the same deck waits
+    # for our commit and then recomputes from a snapshot that includes our change
+    was_valid = dict(session.execute(
+        select(DeckStats.deck_id, DeckStats.valid)
+        .where(DeckStats.deck_id.in_(deck_ids))
+        .order_by(DeckStats.deck_id)
+        .with_for_update()
+    ).all())
+    expected = _expected_stats(deck_ids).add_columns(literal(datetime.utcnow()).label("last_modified"))
+    stmt = insert(DeckStats).from_select(
+        ["deck_id", *STATS_COLUMNS, "last_modified"],
+        expected
+    )
+    rows = session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DeckStats.deck_id],
+            set_={
+                **{name: stmt.excluded[name] for name in (*STATS_COLUMNS, "last_modified")},
+                "version": case(
+                    (DeckStats.content_hash != stmt.excluded.content_hash, DeckStats.version + 1),
+                    else_=DeckStats.version
+                )
+            }
+        ).returning(DeckStats.deck_id, DeckStats.valid)
+    ).all()
+
+    invalidated = sorted(row.deck_id for row in rows if not row.valid and was_valid.get(row.deck_id, True))
+    if invalidated:
+        _record_invalidations(session, invalidated)
+    return invalidated
+
+
+def _record_invalidations(session, deck_ids: List[int]):
+    """Append the newly invalid decks, with the violations that broke them, to the feed."""
+    violations = collect_violations(session, default_rules(), deck_ids, DeckRuleConfig())
+    session.add_all([
+        DeckInvalidation(
+            deck_id=deck_id,
+            violations=[
+                {"rule": v["rule"], "card_id": v["card_id"], "message": v["message"]}
+                for v in violations.get(deck_id, [])
+            ]
+        )
+        for deck_id in deck_ids
+    ])
+    session.flush()
+
+
+def decks_containing(session, card_ids: Iterable[int]) -> List[int]:
+    """Return the IDs of decks containing any of the cards (uses the deck_cards.card_id index)."""
+    card_ids = list(card_ids)
+    if not card_ids:
+        return []
+    stmt = select(DeckCard.deck_id).where(DeckCard.card_id.in_(card_ids)).distinct()
+    return list(session.scalars(stmt).all())
+
+
+def refresh_stats_for_cards(session, card_ids: Iterable[int]) -> List[int]:
+    """Recompute deck_stats for every deck containing one of the cards; returns the newly invalid decks."""
+    return refresh_deck_stats(session, decks_containing(session, card_ids))
+
+
+def check_deck_stats(rebuild: bool = False) -> Dict[str, Any]:
+    """
+    Compare deck_stats with a full recomputation from deck_cards.
+    Returns the decks whose stats are wrong or missing; with rebuild, fixes them.
+    """
+    with SessionLocal() as session:
+        expected = {row.deck_id: row for row in session.execute(_expected_stats())}
+        actual = {
+            stats.deck_id: stats
+            for stats in session.scalars(select(DeckStats)).all()
+        }
+        mismatched = sorted(
+            deck_id for deck_id, row in expected.items()
+            if deck_id not in actual
+            or any(getattr(row, name) != getattr(actual[deck_id], name) for name in STATS_COLUMNS)
+        )
+        if rebuild and mismatched:
+            refresh_deck_stats(session, mismatched)
+            session.commit()
+        return {
+            "checked": len(expected),
+            "mismatched_deck_ids": mismatched,
+            "rebuilt": rebuild and bool(mismatched)
+        }
@@ -2,6 +2,8 @@ from server.db.db_config import SessionLocal
 from server.db.schema.effect import Effect
 from typing import Optional, List
 from sqlalchemy import select
+from server.repositories.association_index import effect_card_index
+from server.repositories.change_feed import change_feed
 
 
 class EffectRepository:
@@ -17,6 +19,7 @@ class EffectRepository:
             )
             session.add(effect)
             session.commit()
+            change_feed.publish("effect", "create", [effect.id])
             session.refresh(effect)
             return effect
 
@@ -36,6 +39,7 @@ class EffectRepository:
             effect.archetype_id = archetype_id
             effect.effect_type_id = effect_type_id
             session.commit()
+            change_feed.publish("effect", "update", [effect_id])
             session.refresh(effect)
             return effect
 
@@ -47,6 +51,8 @@ class EffectRepository:
                 return False
             session.delete(effect)
             session.commit()
+            effect_card_index.remove_key(effect_id)
+            change_feed.publish("effect", "delete", [effect_id])
             return True
 
     def list(self, archetype_id: Optional[int] = None) -> List[Effect]:
@@ -2,6 +2,8 @@ from server.db.db_config import SessionLocal
 from server.db.schema.faction import Faction
 from typing import Optional, List
 from sqlalchemy import select
+from server.repositories.deck_payload_cache import deck_payload_cache
+from server.repositories.change_feed import change_feed
 
 class FactionRepository:
     
@@ -10,6 +12,7 @@ class FactionRepository:
             faction = Faction(name=name, archetype_id=archetype_id)
             session.add(faction)
             session.commit()
+            change_feed.publish("faction", "create", [faction.id])
             session.refresh(faction)
             return faction
         
@@ -25,6 +28,8 @@ class FactionRepository:
             faction.name = name
             faction.archetype_id = archetype_id
             session.commit()
+            deck_payload_cache.invalidate("faction", [faction_id])
+            change_feed.publish("faction", "update", [faction_id])
             session.refresh(faction)
             return faction
         
@@ -35,6 +40,8 @@ class FactionRepository:
                 return False
             session.delete(faction)
             session.commit()
+            deck_payload_cache.invalidate("faction", [faction_id])
+            change_feed.publish("faction", "delete", [faction_id])
             return True
         
     def list(self, archetype_id: Optional[int] = None) -> List[Faction]:
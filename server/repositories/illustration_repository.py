@@ -2,6 +2,8 @@ from server.db.db_config import SessionLocal
 from server.db.schema.illustration import Illustration
 from typing import Optional, List
 from sqlalchemy import select
+from server.repositories.deck_payload_cache import deck_payload_cache
+from server.repositories.change_feed import change_feed
 
 class IllustrationRepository:
     
@@ -15,6 +17,7 @@ class IllustrationRepository:
             )
             session.add(illustration)
             session.commit()
+            change_feed.publish("illustration", "create", [illustration.id])
             session.refresh(illustration)
             return illustration
         
@@ -60,6 +63,9 @@ class IllustrationRepository:
             archetype_id = illustration.archetype_id
             session.delete(illustration)
             session.commit()
+            # Cards showing it lose their illustration (ON DELETE SET NULL)
+            deck_payload_cache.invalidate("illustration", [illustration_id])
+            change_feed.publish("illustration", "delete", [illustration_id])
             # Return detached object with filename for cleanup
             deleted = Illustration(filename=filename, archetype_id=archetype_id)
             deleted.id = illustration_id
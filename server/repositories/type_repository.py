@@ -2,6 +2,8 @@ from server.db.db_config import SessionLocal
 from server.db.schema.type import Type
 from typing import Optional, List
 from sqlalchemy import select
+from server.repositories.deck_payload_cache import deck_payload_cache
+from server.repositories.change_feed import change_feed
 
 class TypeRepository:
     
@@ -11,6 +13,7 @@ class TypeRepository:
             type_obj = Type(name=name, icon_path=icon_path, color=color)
             session.add(type_obj)
             session.commit()
+            change_feed.publish("type", "create", [type_obj.id])
             session.refresh(type_obj)
             return type_obj
         
@@ -38,6 +41,8 @@ class TypeRepository:
             if color is not None:
                 type_obj.color = color
             session.commit()
+            deck_payload_cache.invalidate("type", [type_id])
+            change_feed.publish("type", "update", [type_id])
             session.refresh(type_obj)
             return type_obj
         
@@ -49,4 +54,6 @@ class TypeRepository:
                 return False
             session.delete(type_obj)
             session.commit()
+            deck_payload_cache.invalidate("type", [type_id])
+            change_feed.publish("type", "delete", [type_id])
             return True
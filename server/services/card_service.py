@@ -1,5 +1,6 @@
-from typing import Optional, List
-from server.repositories.card_repository import CardRepository
+from typing import Optional, List, Dict, Any
+from server.repositories.card_repository import CardRepository, CardFilter
+from server.repositories.card_query import parse_query, compile_query
 
 
 class CardService:
@@ -63,9 +64,46 @@ class CardService:
         """Get a card by ID, optionally loading effects and bonuses."""
         return self.repo.get(card_id, load_relationships=load_relationships)
 
-    def list_cards(self, archetype_id: Optional[int] = None, load_relationships: bool = False):
-        """List cards, optionally filtered by archetype and loading effects and bonuses."""
-        return self.repo.list(archetype_id=archetype_id, load_relationships=load_relationships)
+    def list_cards(
+        self,
+        archetype_id: Optional[int] = None,
+        load_relationships: bool = False,
+        filters: Optional[CardFilter] = None
+    ):
+        """List cards, optionally filtered and loading effects and bonuses."""
+        return self.repo.list(archetype_id=archetype_id, load_relationships=load_relationships, filters=filters)
+    
+    def search_cards(self, filters: CardFilter, limit: int = 50, offset: int = 0, load_relationships: bool = False):
+        """Return a page of filtered cards along with the total count and facet counts."""
+        items, total, facets = self.repo.search(
+            filters, limit=limit, offset=offset, load_relationships=load_relationships
+        )
+        return {"items": items, "total": total, "facets": facets}
+    
+    def autocomplete_cards(self, query: str, limit: int = 10, archetype_id: Optional[int] = None):
+        """Return typeahead suggestions for a partial card name."""
+        return self.repo.autocomplete(query, limit=limit, archetype_id=archetype_id)
+    
+    def query_cards(
+        self,
+        query: str,
+        limit: int = 50,
+        offset: int = 0,
+        load_relationships: bool = False,
+        explain: bool = False
+    ):
+        """
+        Run a card query expression (e.g. 'cost<=3 type:Combattant -bonus:*').
+        Raises ValueError if the expression cannot be parsed.
+        """
+        condition = compile_query(parse_query(query.strip()))
+        result = {
+            "items": self.repo.query(condition, limit=limit, offset=offset, load_relationships=load_relationships),
+            "explain": None
+        }
+        if explain:
+            result["explain"] = self.repo.explain(condition, limit=limit, offset=offset)
+        return result
     
     def update_card(
         self,
@@ -106,6 +144,49 @@ class CardService:
             description=description
         )
     
+    def _bulk_conditions(self, filters: Optional[CardFilter], query: Optional[str]) -> list:
+        """Combine a structured filter and a query expression; refuse to target every card."""
+        conditions = filters.conditions() if filters is not None else []
+        if query and query.strip():
+            conditions.append(compile_query(parse_query(query.strip())))
+        if not conditions:
+            raise ValueError("A filter or query is required for bulk operations")
+        return conditions
+    
+    def bulk_update_cards(
+        self,
+        filters: Optional[CardFilter] = None,
+        query: Optional[str] = None,
+        values: Optional[dict] = None,
+        increments: Optional[dict] = None,
+        dry_run: bool = False
+    ):
+        """
+        Patch every card matching the filter/query with field values and/or arithmetic deltas.
+        Returns the affected card IDs.
+        """
+        conditions = self._bulk_conditions(filters, query)
+        values = {k: v for k, v in (values or {}).items() if v is not None}
+        increments = {k: v for k, v in (increments or {}).items() if v}
+        if not values and not increments and not dry_run:
+            raise ValueError("Nothing to update")
+        if values.keys() & increments.keys():
+            raise ValueError("A field cannot be both set and incremented")
+        for field_name in ("cost", "combat_power", "resilience"):
+            if values.get(field_name, 0) < 0:
+                raise ValueError(f"{field_name} cannot be negative")
+        if values.get("max_occurrence", 1) < 1:
+            raise ValueError("Max occurrence must be at least 1")
+        
+        card_ids = self.repo.bulk_update(conditions, values, increments, dry_run=dry_run)
+        return {"dry_run": dry_run, "count": len(card_ids), "card_ids": card_ids}
+    
+    def bulk_delete_cards(self, filters: Optional[CardFilter] = None, query: Optional[str] = None, dry_run: bool = False):
+        """Delete every card matching the filter/query. Returns the deleted card IDs."""
+        conditions = self._bulk_conditions(filters, query)
+        card_ids = self.repo.bulk_delete(conditions, dry_run=dry_run)
+        return {"dry_run": dry_run, "count": len(card_ids), "card_ids": card_ids}
+    
     def delete_card(self, card_id: int):
         """Delete a card by ID."""
         return self.repo.delete(card_id)
@@ -134,3 +215,110 @@ class CardService:
         """Get all bonuses for a card."""
         return self.repo.get_card_bonuses(card_id)
     
+    def get_effect_cards(self, effect_id: int, limit: int = 100, offset: int = 0, load_relationships: bool = False):
+        """Get the cards that have an effect, or None if the effect doesn't exist."""
+        card_ids = self.repo.get_effect_card_ids(effect_id)
+        if card_ids is None:
+            return None
+        return self.repo.get_many(card_ids[offset:offset + limit], load_relationships=load_relationships)
+    
+    def get_bonus_cards(self, bonus_id: int, limit: int = 100, offset: int = 0, load_relationships: bool = False):
+        """Get the cards that have a bonus, or None if the bonus doesn't exist."""
+        card_ids = self.repo.get_bonus_card_ids(bonus_id)
+        if card_ids is None:
+            return None
+        return self.repo.get_many(card_ids[offset:offset + limit], load_relationships=load_relationships)
+    
+    def match_cards(
+        self,
+        all_effects: List[int],
+        any_effects: List[int],
+        no_effects: List[int],
+        all_bonuses: List[int],
+        any_bonuses: List[int],
+        no_bonuses: List[int],
+        limit: int = 100,
+        offset: int = 0,
+        load_relationships: bool = False
+    ):
+        """
+        Get cards matching an AND/OR/NOT combination of effects and bonuses.
+        Raises ValueError if no positive (all/any) term is given.
+        """
+        card_ids = self.repo.match_card_ids(
+            all_effects, any_effects, no_effects, all_bonuses, any_bonuses, no_bonuses
+        )
+        return {
+            "total": len(card_ids),
+            "items": self.repo.get_many(card_ids[offset:offset + limit], load_relationships=load_relationships)
+        }
+    
+    def get_card_decks(self, card_id: int, limit: int = 50, offset: int = 0):
+        """Get one page of the decks playing a card with their total, or None if the card doesn't exist."""
+        result = self.repo.list_decks(card_id, limit=limit, offset=offset)
+        if result is None:
+            return None
+        items, total = result
+        return {"card_id": card_id, "total": total, "items": items}
+    
+    def get_meta_report(
+        self,
+        archetype_id: Optional[int] = None,
+        sort_by: str = "inclusion_rate",
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Build the meta report from the usage counters: for every card, the share of
+        decks playing it, the average copies in those decks and the same figures per
+        deck archetype. With archetype_id, only decks of that archetype are counted.
+        """
+        rows, archetype_decks = self.repo.get_usage_snapshot()
+        if archetype_id is not None:
+            archetype_decks = {archetype_id: archetype_decks.get(archetype_id, 0)}
+        total_decks = sum(archetype_decks.values())
+        
+        cards: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            card = cards.setdefault(row["card_id"], {
+                "card_id": row["card_id"],
+                "name": row["name"],
+                "archetype_id": row["archetype_id"],
+                "decks": 0,
+                "copies": 0,
+                "archetypes": []
+            })
+            if row["usage_archetype_id"] not in archetype_decks:
+                continue
+            card["decks"] += row["decks"]
+            card["copies"] += row["copies"]
+            card["archetypes"].append({
+                "archetype_id": row["usage_archetype_id"],
+                "decks": row["decks"],
+                "inclusion_rate": row["decks"] / archetype_decks[row["usage_archetype_id"]],
+                "average_copies": row["copies"] / row["decks"]
+            })
+        for card in cards.values():
+            card["inclusion_rate"] = card["decks"] / total_decks if total_decks else 0.0
+            card["average_copies"] = card["copies"] / card["decks"] if card["decks"] else None
+        
+        if sort_by == "name":
+            ranked = sorted(cards.values(), key=lambda card: card["name"])
+        else:
+            ranked = sorted(cards.values(), key=lambda card: (-(card[sort_by] or 0), card["name"]))
+        return {
+            "total_decks": total_decks,
+            "archetypes": [
+                {"archetype_id": a, "decks": decks} for a, decks in sorted(archetype_decks.items())
+            ],
+            "total_cards": len(ranked),
+            "cards": ranked[offset:offset + limit] if limit is not None else ranked[offset:]
+        }
+    
+    def check_card_usage(self, rebuild: bool = False):
+        """Compare the card usage counters with deck_cards and optionally rebuild them."""
+        return self.repo.check_usage(rebuild=rebuild)
+
+    def get_snapshot_stats(self):
+        """Get the state of the shared catalog snapshot."""
+        return self.repo.get_snapshot_stats()
@@ -0,0 +1,91 @@
+from typing import Optional, Dict
+from server.repositories.collection_repository import CollectionRepository
+from server.services.deck_service import DeckService
+
+
+class CollectionService:
+    def __init__(self, repo: CollectionRepository, deck_service: Optional[DeckService] = None):
+        """deck_service, if given, has its buffered deck writes flushed before deck queries."""
+        self.repo = repo
+        self.deck_service = deck_service
+
+    def _flush_deck_writes(self, deck_id: Optional[int] = None):
+        if self.deck_service is not None:
+            self.deck_service.flush_pending_writes(None if deck_id is None else [deck_id])
+
+    def create_collection(self, name: str, description: Optional[str] = None):
+        """Create a new, empty collection."""
+        return self.repo.create(name, description=description)
+
+    def get_collection(self, collection_id: int):
+        """Get a collection by ID."""
+        return self.repo.get(collection_id)
+
+    def list_collections(self):
+        """List all collections."""
+        return self.repo.list()
+
+    def update_collection(self, collection_id: int, name: Optional[str] = None, description: Optional[str] = None):
+        """Update a collection's attributes."""
+        return self.repo.update(collection_id, name=name, description=description)
+
+    def delete_collection(self, collection_id: int):
+        """Delete a collection and its inventory."""
+        return self.repo.delete(collection_id)
+
+    def get_inventory(self, collection_id: int):
+        """Get the cards owned by a collection, or None if it doesn't exist."""
+        return self.repo.get_cards(collection_id)
+
+    def set_inventory(self, collection_id: int, quantities: Dict[int, int]):
+        """
+        Set the owned quantity of several cards (0 removes a card).
+        Returns None if the collection doesn't exist; raises ValueError for unknown cards.
+        """
+        distinct_cards = self.repo.set_cards(collection_id, quantities)
+        if distinct_cards is None:
+            return None
+        return {"collection_id": collection_id, "updated": len(quantities), "distinct_cards": distinct_cards}
+
+    def get_buildable_decks(
+        self,
+        collection_id: int,
+        archetype_id: Optional[int] = None,
+        limit: int = 100,
+        offset: int = 0
+    ):
+        """Get the decks that can be built entirely from a collection."""
+        self._flush_deck_writes()
+        return self.repo.buildable_decks(collection_id, archetype_id=archetype_id, limit=limit, offset=offset)
+
+    def get_missing_cards(self, collection_id: int, deck_id: int):
+        """Get what a collection lacks to build a deck, or None if either doesn't exist."""
+        self._flush_deck_writes(deck_id)
+        missing = self.repo.missing_cards(collection_id, deck_id)
+        if missing is None:
+            return None
+        return {
+            "collection_id": collection_id,
+            "deck_id": deck_id,
+            "buildable": not missing,
+            "missing_cards": sum(row["missing"] for row in missing),
+            "cards": missing
+        }
+
+    def get_closest_decks(
+        self,
+        collection_id: int,
+        archetype_id: Optional[int] = None,
+        max_missing: Optional[int] = None,
+        include_complete: bool = False,
+        limit: int = 20
+    ):
+        """Get the decks a collection is closest to completing, fewest missing copies first."""
+        self._flush_deck_writes()
+        return self.repo.closest_decks(
+            collection_id,
+            archetype_id=archetype_id,
+            max_missing=max_missing,
+            include_complete=include_complete,
+            limit=limit
+        )
@@ -0,0 +1,187 @@
+"""
+Constraint-based deck builder.
+
+Every copy of a card adds its utility to a deck's score:
+
+    value   = (combat_power + resilience + effect_count) / (cost + 1)
+    utility = value / max(value) - curve_weight * (cost - curve_center) ** 2
+
+(value is normalised over the candidates), so the curve term pulls the deck
+towards curve_center. The constraints are bounds per card (included copies,
+max_occurrence), bounds per type and the deck size. Because types partition
+the cards and the score is a sum over copies, this integer program is solved
+exactly by a greedy pass: fill each type's minimum with its best copies, then
+the rest of the deck with the best copies overall while respecting the type
+maximums.
+
+The runner-up decks come from a randomized search run in the deck builder's process
+pool within a time budget. Each iteration perturbs the utilities with noise,
+solves again, and keeps the distinct decks with the best true scores.
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from server.repositories.card_catalog import CardCatalog
+from server.services.worker_pool import get_builder_pool, BUILDER_WORKERS
+
+
+NO_LIMIT = np.iinfo(np.int64).max
+NOISE_LEVEL = 0.5  # noise standard deviation, relative to the spread of the utilities
+
+
+def _solve(
+    utility: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    type_index: np.ndarray,
+    type_min: np.ndarray,
+    type_max: np.ndarray,
+    size: int
+) -> Optional[np.ndarray]:
+    """Return the copies of each candidate in the best deck, or None if no deck fits the constraints."""
+    x = lower.copy()
+    counts = np.bincount(type_index, weights=x, minlength=len(type_min)).astype(np.int64)
+    if x.sum() > size or (counts > type_max).any():
+        return None
+
+    # One entry per optional copy, best first (copies of a card stay adjacent)
+    extra = upper - lower
+    copies = np.repeat(np.arange(len(utility)), extra)
+    order = copies[np.argsort(-utility[copies], kind="stable")]
+
+    for t in np.nonzero(counts < type_min)[0]:
+        need = type_min[t] - counts[t]
+        picks = order[type_index[order] == t][:need]
+        if len(picks) < need:
+            return None
+        np.add.at(x, picks, 1)
+        counts[t] += need
+
+    remaining = size - int(x.sum())
+    used = x - lower
+    seen = np.zeros_like(x)
+    for card in order:
+        if remaining <= 0:
+            break
+        seen[card] += 1
+        if seen[card] <= used[card]:
+            continue  # copy already taken for a type minimum
+        t = type_index[card]
+        if counts[t] >= type_max[t]:
+            continue
+        x[card] += 1
+        counts[t] += 1
+        remaining -= 1
+    return x if remaining == 0 else None
+
+
+def _search(problem: Dict[str, Any], budget: float, seed, keep: int) -> List[tuple]:
+    """Randomized search for alternative decks; returns up to `keep` (score, copies) pairs."""
+    deadline = time.monotonic() + budget
+    rng = np.random.default_rng(seed)
+    utility = problem["utility"]
+    noise = NOISE_LEVEL * max(float(utility.std()), 1e-6)
+    found: Dict[bytes, tuple] = {}
+    while time.monotonic() < deadline:
+        x = _solve(utility + rng.normal(0.0, noise, len(utility)), problem["lower"], problem["upper"],
+                   problem["type_index"], problem["type_min"], problem["type_max"], problem["size"])
+        if x is None:
+            break
+        found.setdefault(x.tobytes(), (float(utility @ x), x))
+        if len(found) > 4 * keep:
+            found = dict(sorted(found.items(), key=lambda item: -item[1][0])[:keep])
+    return sorted(found.values(), key=lambda item: -item[0])[:keep]
+
+
+def build_decks(
+    catalog: CardCatalog,
+    archetype_id: int,
+    universal_archetype_id: Optional[int],
+    size: int,
+    curve_center: Optional[float] = None,
+    curve_weight: float = 0.1,
+    type_min: Optional[Dict[int, int]] = None,
+    type_max: Optional[Dict[int, int]] = None,
+    include: Optional[Dict[int, int]] = None,
+    exclude: Optional[List[int]] = None,
+    faction_ids: Optional[List[int]] = None,
+    count: int = 3,
+    time_budget: float = 1.0,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Propose up to `count` decks of `size` cards for an archetype, best first.
+    Only cards whose archetype and faction belong to the deck's archetype (or the
+    universal one) are candidates. Raises ValueError if the constraints can't be met.
+    """
+    type_min, type_max = type_min or {}, type_max or {}
+    include, exclude = include or {}, set(exclude or [])
+    archetypes = [archetype_id] + ([universal_archetype_id] if universal_archetype_id is not None else [])
+
+    mask = np.isin(catalog.archetype_id, archetypes) & np.isin(catalog.faction_archetype_id, archetypes)
+    mask &= ~np.isin(catalog.card_id, list(exclude))
+    if faction_ids:
+        mask &= np.isin(catalog.faction_id, faction_ids)
+    candidates = np.nonzero(mask)[0]
+
+    card_ids = catalog.card_id[candidates]
+    position = {int(card_id): i for i, card_id in enumerate(card_ids)}
+    lower = np.zeros(len(candidates), dtype=np.int64)
+    upper = catalog.max_occurrence[candidates].copy()
+    for card_id, quantity in include.items():
+        if card_id not in position:
+            raise ValueError(f"Card {card_id} can't be included: unknown, excluded or not playable in this archetype")
+        if quantity > upper[position[card_id]]:
+            raise ValueError(f"Card {card_id} can't be included {quantity} times (max_occurrence {upper[position[card_id]]})")
+        lower[position[card_id]] = quantity
+
+    cost = catalog.cost[candidates].astype(float)
+    value = (catalog.combat_power[candidates] + catalog.resilience[candidates] + catalog.effect_count[candidates]) / (cost + 1)
+    value = value / value.max() if len(value) and value.max() > 0 else value
+    utility = value - (curve_weight * (cost - curve_center) ** 2 if curve_center is not None else 0.0)
+
+    types = sorted(set(catalog.type_id[candidates].tolist()) | set(type_min) | set(type_max))
+    type_position = {type_id: i for i, type_id in enumerate(types)}
+    problem = {
+        "utility": utility,
+        "lower": lower,
+        "upper": upper,
+        "type_index": np.array([type_position[t] for t in catalog.type_id[candidates].tolist()], dtype=np.int64),
+        "type_min": np.array([type_min.get(t, 0) for t in types], dtype=np.int64),
+        "type_max": np.array([type_max.get(t, NO_LIMIT) for t in types], dtype=np.int64),
+        "size": size,
+    }
+
+    best = _solve(utility, lower, upper, problem["type_index"], problem["type_min"], problem["type_max"], size)
+    if best is None:
+        raise ValueError("No deck satisfies the constraints")
+    decks = {best.tobytes(): (float(utility @ best), best)}
+    if count > 1:
+        seeds = np.random.SeedSequence(seed).spawn(BUILDER_WORKERS)
+        futures = [get_builder_pool().submit(_search, problem, time_budget, child, count) for child in seeds]
+        for future in futures:
+            for score, x in future.result(timeout=time_budget + 30):
+                decks.setdefault(x.tobytes(), (score, x))
+
+    ranked = sorted(decks.values(), key=lambda item: -item[0])[:count]
+    return {
+        "candidates": len(candidates),
+        "optimal_score": decks[best.tobytes()][0],
+        "decks": [_describe(x, score, card_ids, catalog.type_id[candidates], cost) for score, x in ranked]
+    }
+
+
+def _describe(x: np.ndarray, score: float, card_ids: np.ndarray, type_ids: np.ndarray, cost: np.ndarray) -> Dict[str, Any]:
+    chosen = np.nonzero(x)[0]
+    type_counts: Dict[int, int] = {}
+    for i in chosen:
+        type_counts[int(type_ids[i])] = type_counts.get(int(type_ids[i]), 0) + int(x[i])
+    return {
+        "score": score,
+        "total_cards": int(x.sum()),
+        "average_cost": float((x * cost).sum() / x.sum()) if x.sum() else None,
+        "type_counts": type_counts,
+        "cards": [{"card_id": int(card_ids[i]), "quantity": int(x[i])} for i in chosen]
+    }
@@ -0,0 +1,114 @@
+"""
+Compact, shareable deck codes.
+
+A code is the base64url encoding (without padding) of a byte string made of
+unsigned LEB128 varints:
+
+    version, archetype_id, group count,
+    then for each group of cards sharing a quantity (ascending quantity):
+        quantity, card count, card_ids as deltas from the previous id (ascending)
+
+Grouping by quantity and delta-encoding the sorted ids keeps a typical deck
+well under 100 bytes, and makes the encoding canonical: the same deck always
+gives the same code.
+"""
+import base64
+import binascii
+import hashlib
+from typing import Dict, Tuple
+
+
+DECK_CODE_VERSION = 1
+
+
+def _write_varint(out: bytearray, value: int):
+    if value < 0:
+        raise ValueError("Deck codes cannot encode negative numbers")
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Invalid deck code: truncated")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("Invalid deck code: number too large")
+
+
+def encode_deck_code(archetype_id: int, quantities: Dict[int, int]) -> str:
+    """Encode an archetype and {card_id: quantity} into a deck code."""
+    groups: Dict[int, list] = {}
+    for card_id, quantity in quantities.items():
+        if quantity > 0:
+            groups.setdefault(quantity, []).append(card_id)
+
+    out = bytearray()
+    _write_varint(out, DECK_CODE_VERSION)
+    _write_varint(out, archetype_id)
+    _write_varint(out, len(groups))
+    for quantity in sorted(groups):
+        card_ids = sorted(groups[quantity])
+        _write_varint(out, quantity)
+        _write_varint(out, len(card_ids))
+        previous = 0
+        for card_id in card_ids:
+            _write_varint(out, card_id - previous)
+            previous = card_id
+    return base64.urlsafe_b64encode(bytes(out)).rstrip(b"=").decode("ascii")
+
+
+def decode_deck_code(code: str) -> Tuple[int, Dict[int, int]]:
+    """Decode a deck code into (archetype_id, {card_id: quantity}). Raises ValueError if invalid."""
+    code = code.strip()
+    try:
+        data = base64.b64decode(code + "=" * (-len(code) % 4), altchars=b"-_", validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid deck code: not base64url")
+
+    version, pos = _read_varint(data, 0)
+    if version != DECK_CODE_VERSION:
+        raise ValueError(f"Unsupported deck code version {version}")
+    archetype_id, pos = _read_varint(data, pos)
+    group_count, pos = _read_varint(data, pos)
+
+    quantities: Dict[int, int] = {}
+    for _ in range(group_count):
+        quantity, pos = _read_varint(data, pos)
+        count, pos = _read_varint(data, pos)
+        if quantity < 1:
+            raise ValueError("Invalid deck code: quantity must be at least 1")
+        card_id = 0
+        for _ in range(count):
+            delta, pos = _read_varint(data, pos)
+            card_id += delta
+            if card_id < 1 or card_id in quantities:
+                raise ValueError("Invalid deck code: duplicate or invalid card id")
+            quantities[card_id] = quantity
+    if pos != len(data):
+        raise ValueError("Invalid deck code: trailing data")
+    return archetype_id, quantities
+
+
+def deck_content_hash(archetype_id: int, quantities: Dict[int, int]) -> str:
+    """
+    Canonical hash of a deck's archetype and contents, used to find duplicate decks.
+    Must match the content_hash computed in SQL by repositories/deck_stats.py:
+    sha256 of "<archetype_id>|<card_id>:<quantity>,..." with cards in ascending id order.
+    """
+    cards = ",".join(f"{card_id}:{quantity}" for card_id, quantity in sorted(quantities.items()) if quantity > 0)
+    return hashlib.sha256(f"{archetype_id}|{cards}".encode("utf-8")).hexdigest()
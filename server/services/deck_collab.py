@@ -0,0 +1,247 @@
+"""
+Live collaborative editing of a deck's cards over WebSockets.
+
+The clients editing a deck share a room. On joining, a client receives a
+snapshot of the deck ({card_id: quantity} and its content version); a client
+reconnecting with the last version it saw (since) only receives the deltas it
+missed, when the room still has them. It then sends changes and receives every
+committed change of the deck as a delta: the cards whose quantity changed, the
+change and the new quantity, and the deck version it produced. Versions are
+deck_stats.version, so clients never refetch the full card list.
+
+Conflicts: a {card_id, delta} change (the editor's +/- buttons) always merges
+with concurrent edits and is clamped to [0, max_occurrence]. A {card_id,
+quantity, expected} change is a compare-and-set: if another edit changed the
+card first, the message is rejected with the current quantity of the
+conflicting cards. The changes of a room are applied one message at a time, so
+deltas are broadcast in version order. Changes made outside the room (REST
+API, another worker) reach it through the change feed: the room then
+broadcasts a fresh snapshot. A client that sees a version gap can also ask for
+a sync message.
+
+Messages from a client:
+    {"type": "changes", "client_seq": 7, "changes": [{"card_id": 3, "delta": 1}]}
+    {"type": "sync", "since": 12}
+    {"type": "ping"}
+Messages to a client:
+    {"type": "snapshot", "version": 12, "quantities": {"3": 2}}
+    {"type": "delta", "version": 13, "client_id": "...", "client_seq": 7,
+     "changes": [{"card_id": 3, "quantity": 3, "delta": 1}]}
+    {"type": "synced", "version": 13}  (after the replayed deltas)
+    {"type": "ack", "client_seq": 7, "version": 13}  (changes without effect)
+    {"type": "conflict", "client_seq": 7, "version": 13, "conflicts": [{"card_id": 3, "quantity": 2}]}
+    {"type": "error", "client_seq": 7, "detail": "..."}
+    {"type": "deleted"}  (the deck was deleted)
+    {"type": "rejected", "changes": [{"card_id": 3, "quantity": 4, "detail": "..."}]}
+        (acknowledged write-behind REST updates that could not be written)
+    {"type": "pong"}
+"""
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from server.repositories.change_feed import change_feed
+
+LOG_SIZE = 256  # deltas kept per room for reconnecting clients
+
+
+class DeckRoom:
+    def __init__(self):
+        self.clients: Dict[str, Any] = {}  # client_id -> websocket
+        self.lock = asyncio.Lock()  # one message applied (and broadcast) at a time
+        self.log: Deque[Dict[str, Any]] = deque(maxlen=LOG_SIZE)  # consecutive versions, oldest first
+        self.version: Optional[int] = None  # last version sent to the clients
+
+    def record(self, delta: Dict[str, Any]):
+        if self.log and delta["version"] != self.log[-1]["version"] + 1:
+            self.log.clear()  # versions were produced outside the room: the log can't be replayed across them
+        self.log.append(delta)
+        self.version = delta["version"]
+
+    def replay(self, since: int, version: int) -> Optional[List[Dict[str, Any]]]:
+        """The deltas after since up to the current version, or None if the log doesn't cover them."""
+        if since == version:
+            return []
+        if not self.log or self.log[-1]["version"] != version or since < self.log[0]["version"] - 1:
+            return None
+        return [delta for delta in self.log if delta["version"] > since]
+
+
+class DeckCollabHub:
+    def __init__(self, service):
+        """service is the DeckService; its blocking calls run in the thread pool."""
+        self.service = service
+        self._rooms: Dict[int, DeckRoom] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        change_feed.subscribe(self._on_change)
+        service.write_buffer.on_rejected = self._on_write_rejected
+
+    def _on_change(self, entity: str, op: str, ids: List[int], version: int, remote: bool):
+        """Change feed subscriber (any thread): resync the open rooms of changed decks."""
+        if entity != "deck" or self._loop is None:
+            return
+        for deck_id in ids:
+            if deck_id in self._rooms:
+                asyncio.run_coroutine_threadsafe(self.resync(deck_id), self._loop)
+
+    def _on_write_rejected(self, deck_id: int, rejections: List[Dict[str, Any]]):
+        """Write buffer callback (any thread): tell the deck's room that buffered updates were dropped."""
+        if deck_id in self._rooms and self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._broadcast_rejected(deck_id, rejections), self._loop)
+
+    async def _broadcast_rejected(self, deck_id: int, rejections: List[Dict[str, Any]]):
+        room = self._rooms.get(deck_id)
+        if room is None:
+            return
+        await room.lock.acquire()
+        try:
+            if self._rooms.get(deck_id) is room:
+                await self._broadcast(room, {"type": "rejected", "changes": rejections})
+        finally:
+            self._release(deck_id, room)
+
+    async def _locked_room(self, deck_id: int) -> DeckRoom:
+        """Acquire the lock of the deck's live room, creating it if needed."""
+        while True:
+            room = self._rooms.setdefault(deck_id, DeckRoom())
+            await room.lock.acquire()
+            if self._rooms.get(deck_id) is room:
+                return room
+            room.lock.release()  # the room was closed while we waited
+
+    def _release(self, deck_id: int, room: DeckRoom):
+        room.lock.release()
+        if not room.lock.locked():
+            self._close_if_empty(deck_id, room)
+
+    async def join(self, deck_id: int, client_id: str, websocket, since: Optional[int] = None) -> bool:
+        """Add a client to the deck's room and send it the state; False if the deck doesn't exist."""
+        self._loop = asyncio.get_running_loop()
+        room = await self._locked_room(deck_id)
+        try:
+            state = await run_in_threadpool(self.service.get_live_state, deck_id)
+            if state is None:
+                return False
+            await self._catch_up(room, state)
+            room.clients[client_id] = websocket
+            await self._send_state(room, websocket, state, since)
+            return True
+        finally:
+            self._release(deck_id, room)
+
+    async def sync(self, deck_id: int, websocket, since: Optional[int]) -> bool:
+        """Send a client the deltas after since, or a snapshot; False if the deck was deleted."""
+        room = await self._locked_room(deck_id)
+        try:
+            state = await run_in_threadpool(self.service.get_live_state, deck_id)
+            if state is None:
+                return False
+            await self._send_state(room, websocket, state, since)
+            return True
+        finally:
+            self._release(deck_id, room)
+
+    async def resync(self, deck_id: int):
+        """Bring a room up to date after a change made outside it."""
+        room = self._rooms.get(deck_id)
+        if room is None:
+            return
+        await room.lock.acquire()
+        try:
+            if self._rooms.get(deck_id) is not room:
+                return
+            state = await run_in_threadpool(self.service.get_live_state, deck_id)
+            if state is None:
+                await self._broadcast(room, {"type": "deleted"})
+                return
+            await self._catch_up(room, state)
+        finally:
+            self._release(deck_id, room)
+
+    async def _catch_up(self, room: DeckRoom, state: Dict[str, Any]):
+        """Broadcast a snapshot if the deck changed since the room's last message."""
+        if room.version is not None and state["version"] != room.version and room.clients:
+            room.log.clear()
+            await self._broadcast(room, self._snapshot(state))
+        room.version = state["version"]
+
+    def leave(self, deck_id: int, client_id: str):
+        room = self._rooms.get(deck_id)
+        if room is not None:
+            room.clients.pop(client_id, None)
+            if not room.lock.locked():
+                self._close_if_empty(deck_id, room)
+
+    def _close_if_empty(self, deck_id: int, room: DeckRoom):
+        if not room.clients and self._rooms.get(deck_id) is room:
+            del self._rooms[deck_id]
+
+    @staticmethod
+    def _snapshot(state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "type": "snapshot",
+            "version": state["version"],
+            "quantities": {str(card_id): quantity for card_id, quantity in state["quantities"].items()}
+        }
+
+    async def _send_state(self, room: DeckRoom, websocket, state: Dict[str, Any], since: Optional[int]):
+        deltas = room.replay(since, state["version"]) if since is not None else None
+        if deltas is None:
+            await websocket.send_json(self._snapshot(state))
+            return
+        for delta in deltas:
+            await websocket.send_json(delta)
+        await websocket.send_json({"type": "synced", "version": state["version"]})
+
+    async def apply(
+        self,
+        deck_id: int,
+        client_id: str,
+        client_seq: Optional[int],
+        changes: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Apply a client's changes and broadcast the resulting delta to the room.
+        Returns the reply for the sender alone (ack, conflict or error), if any;
+        None once the delta is broadcast. The error for a deleted deck has "deleted": true.
+        """
+        room = await self._locked_room(deck_id)
+        try:
+            try:
+                result = await run_in_threadpool(self.service.merge_card_changes, deck_id, changes)
+            except ValueError as e:
+                return {"type": "error", "client_seq": client_seq, "detail": str(e)}
+            if result is None:
+                return {"type": "error", "client_seq": client_seq, "detail": "Deck not found", "deleted": True}
+            if result["conflicts"]:
+                return {
+                    "type": "conflict",
+                    "client_seq": client_seq,
+                    "version": result["version"],
+                    "conflicts": result["conflicts"]
+                }
+            if not result["applied"]:
+                return {"type": "ack", "client_seq": client_seq, "version": result["version"]}
+            delta = {
+                "type": "delta",
+                "version": result["version"],
+                "client_id": client_id,
+                "client_seq": client_seq,
+                "changes": result["applied"]
+            }
+            room.record(delta)
+            await self._broadcast(room, delta)
+            return None
+        finally:
+            self._release(deck_id, room)
+
+    async def _broadcast(self, room: DeckRoom, message: Dict[str, Any]):
+        clients = list(room.clients.items())
+        results = await asyncio.gather(
+            *(websocket.send_json(message) for _, websocket in clients),
+            return_exceptions=True
+        )
+        for (client_id, _), result in zip(clients, results):
+            if isinstance(result, Exception):
+                room.clients.pop(client_id, None)  # disconnected; its receive loop will call leave()
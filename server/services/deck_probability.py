@@ -0,0 +1,186 @@
+"""
+Draw probabilities for decks.
+
+A deck is analysed as a "profile": one entry per card with its quantity, type
+and cost. Questions about a single condition ("at least 2 Combattant by turn 3")
+are answered exactly with the hypergeometric distribution. Compound questions
+(several conditions that must all hold) are estimated with a vectorized NumPy
+Monte Carlo: each simulation draws a uniform random subset of the deck, and
+large runs are split across a process pool.
+
+Results are cached by a hash of the profile and the question, so repeated
+requests for an unchanged deck are free; changing a card's type or cost
+changes the hash as well.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from math import comb, sqrt
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from server.services.worker_pool import get_process_pool, MAX_WORKERS
+
+
+MONTE_CARLO_CELLS = 2_500_000  # random keys per vectorized batch (bounds memory use to ~20 MB)
+MAX_DECK_SIZE = 200  # larger decks are rejected: the simulations draw one key per card copy
+PARALLEL_THRESHOLD = 400_000  # below this many shuffles, simulate in-process
+CACHE_SIZE = 256
+
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _matches(card: Dict[str, Any], condition: Dict[str, Any]) -> bool:
+    if condition.get("card_ids") and card["card_id"] not in condition["card_ids"]:
+        return False
+    if condition.get("type_id") is not None and card["type_id"] != condition["type_id"]:
+        return False
+    if condition.get("min_cost") is not None and card["cost"] < condition["min_cost"]:
+        return False
+    if condition.get("max_cost") is not None and card["cost"] > condition["max_cost"]:
+        return False
+    return True
+
+
+def _hypergeometric_pmf(population: int, successes: int, draws: int) -> List[float]:
+    """P(X = k) for k = 0..min(successes, draws)."""
+    total = comb(population, draws)
+    return [
+        comb(successes, k) * comb(population - successes, draws - k) / total
+        for k in range(min(successes, draws) + 1)
+    ]
+
+
+def _at_least(population: int, successes: int, draws: int, k: int) -> float:
+    if k <= 0:
+        return 1.0
+    return sum(_hypergeometric_pmf(population, successes, draws)[k:])
+
+
+def _simulate(masks: np.ndarray, thresholds: np.ndarray, draws: int, simulations: int, seed) -> int:
+    """
+    Count the simulations in which every condition is met.
+    masks is a (conditions x deck size) boolean matrix telling which deck slots
+    satisfy each condition; a hand is the `draws` slots with the smallest random keys.
+    """
+    rng = np.random.default_rng(seed)
+    deck_size = masks.shape[1]
+    chunk = max(1, MONTE_CARLO_CELLS // deck_size)
+    hits = 0
+    for start in range(0, simulations, chunk):
+        size = min(chunk, simulations - start)
+        keys = rng.random((size, deck_size))
+        drawn = np.argpartition(keys, draws - 1, axis=1)[:, :draws]
+        counts = masks[:, drawn].sum(axis=2)
+        hits += int(np.all(counts >= thresholds[:, None], axis=0).sum())
+    return hits
+
+
+def _monte_carlo(masks: np.ndarray, thresholds: np.ndarray, draws: int, simulations: int, seed: Optional[int]) -> float:
+    if draws >= masks.shape[1]:
+        return float(np.all(masks.sum(axis=1) >= thresholds))
+    seeds = np.random.SeedSequence(seed)
+    if simulations < PARALLEL_THRESHOLD or MAX_WORKERS == 1:
+        return _simulate(masks, thresholds, draws, simulations, seeds) / simulations
+    parts = [simulations // MAX_WORKERS + (1 if i < simulations % MAX_WORKERS else 0) for i in range(MAX_WORKERS)]
+    futures = [
+        get_process_pool().submit(_simulate, masks, thresholds, draws, part, child)
+        for part, child in zip(parts, seeds.spawn(MAX_WORKERS))
+    ]
+    return sum(future.result() for future in futures) / simulations
+
+
+def _cache_key(profile: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    content = sorted((c["card_id"], c["quantity"], c["type_id"], c["cost"]) for c in profile)
+    payload = json.dumps({"deck": content, "params": params}, sort_keys=True, default=sorted)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def analyze_deck(
+    profile: List[Dict[str, Any]],
+    hand_size: int,
+    turn: int,
+    draws_per_turn: int,
+    queries: List[List[Dict[str, Any]]],
+    simulations: int,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Analyse a deck profile ([{card_id, quantity, type_id, cost}]).
+
+    Returns the opening-hand distribution of each type, the expected number of
+    cards of each cost seen by `turn`, and for each query (a list of conditions
+    {type_id, min_cost, max_cost, card_ids, at_least} that must all hold) the
+    probability that it is met by `turn`. Raises ValueError for an empty deck
+    or one larger than MAX_DECK_SIZE.
+    """
+    params = {
+        "hand_size": hand_size, "turn": turn, "draws_per_turn": draws_per_turn,
+        "queries": queries, "simulations": simulations, "seed": seed
+    }
+    key = _cache_key(profile, params)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    quantities = np.array([card["quantity"] for card in profile], dtype=np.int64)
+    deck_size = int(quantities.sum())
+    if not deck_size:
+        raise ValueError("The deck is empty")
+    if deck_size > MAX_DECK_SIZE:
+        raise ValueError(f"The deck has {deck_size} cards, the maximum is {MAX_DECK_SIZE}")
+    opening = min(hand_size, deck_size)
+    seen = min(hand_size + (turn - 1) * draws_per_turn, deck_size)
+
+    by_type: Dict[int, int] = {}
+    by_cost: Dict[int, int] = {}
+    for card in profile:
+        by_type[card["type_id"]] = by_type.get(card["type_id"], 0) + card["quantity"]
+        by_cost[card["cost"]] = by_cost.get(card["cost"], 0) + card["quantity"]
+
+    results = []
+    for conditions in queries:
+        if len(conditions) == 1:
+            condition = conditions[0]
+            successes = sum(card["quantity"] for card in profile if _matches(card, condition))
+            results.append({
+                "probability": _at_least(deck_size, successes, seen, condition["at_least"]),
+                "method": "exact",
+                "simulations": None,
+                "standard_error": None
+            })
+        else:
+            # One column per card copy, expanded from the per-card matches
+            matches = np.array([[_matches(card, c) for card in profile] for c in conditions], dtype=bool)
+            masks = np.repeat(matches, quantities, axis=1)
+            thresholds = np.array([c["at_least"] for c in conditions])
+            probability = _monte_carlo(masks, thresholds, seen, simulations, seed)
+            results.append({
+                "probability": probability,
+                "method": "monte_carlo",
+                "simulations": simulations,
+                "standard_error": sqrt(probability * (1 - probability) / simulations)
+            })
+
+    result = {
+        "deck_size": deck_size,
+        "cards_seen": seen,
+        "opening_hand": [
+            {"type_id": type_id, "distribution": _hypergeometric_pmf(deck_size, count, opening)}
+            for type_id, count in sorted(by_type.items())
+        ],
+        "expected_curve": [
+            {"cost": cost, "expected": seen * count / deck_size}
+            for cost, count in sorted(by_cost.items())
+        ],
+        "queries": results
+    }
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -1,25 +1,340 @@
-from typing import Optional
+import functools
+from typing import Optional, List, Dict, Callable
 from server.repositories.deck_repository import DeckRepository
 from server.repositories.card_repository import CardRepository
+from server.repositories.archetype_repository import ArchetypeRepository
+from server.repositories.deck_rules import DeckRuleConfig, UNIVERSAL_ARCHETYPE
+from server.services.deck_code import encode_deck_code, decode_deck_code, deck_content_hash
+from server.services.decklist_text import parse_decklist
+from server.services.deck_probability import analyze_deck
+from server.services.deck_builder import build_decks
+from server.repositories.card_catalog import get_catalog
+from server.repositories.deck_payload_cache import deck_payload_cache
+from server.services.deck_write_buffer import QuantityWriteBuffer, PendingQuantity
+
+
+# A fuzzy match is only accepted if it beats the next candidate by this much similarity
+FUZZY_MARGIN = 0.1
+
+
+def after_pending_writes(method):
+    """Flush the deck's buffered quantity updates before running a method taking deck_id first."""
+    @functools.wraps(method)
+    def wrapper(self, deck_id: int, *args, **kwargs):
+        self.write_buffer.flush_deck(deck_id)
+        return method(self, deck_id, *args, **kwargs)
+    return wrapper
+
+
+def after_all_pending_writes(method):
+    """Flush every deck's buffered quantity updates before running a method reading several decks."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.write_buffer.flush_all()
+        return method(self, *args, **kwargs)
+    return wrapper
 
 
 class DeckService:
-    def __init__(self, deck_repo: DeckRepository, card_repo: Optional[CardRepository] = None):
+    def __init__(
+        self,
+        deck_repo: DeckRepository,
+        card_repo: Optional[CardRepository] = None,
+        archetype_repo: Optional[ArchetypeRepository] = None
+    ):
         self.deck_repo = deck_repo
         self.card_repo = card_repo or CardRepository()
+        self.archetype_repo = archetype_repo or ArchetypeRepository()
+        self.write_buffer = QuantityWriteBuffer(self.deck_repo.apply_card_operations)
 
     def create_deck(self, name: str, archetype_id: int, description: Optional[str] = None):
         """Create a new deck."""
         return self.deck_repo.create(name=name, archetype_id=archetype_id, description=description)
 
+    @after_pending_writes
+    def get_deck_code(self, deck_id: int) -> Optional[dict]:
+        """Get the shareable code of a deck and the other decks with the same contents, or None if not found."""
+        contents = self.deck_repo.get_contents(deck_id)
+        if contents is None:
+            return None
+        duplicates = self.deck_repo.find_by_content_hash(contents["content_hash"])
+        return {
+            "deck_id": deck_id,
+            "code": encode_deck_code(contents["archetype_id"], contents["quantities"]),
+            "content_hash": contents["content_hash"],
+            "duplicate_deck_ids": [other for other in duplicates if other != deck_id]
+        }
+    
+    def import_deck_code(
+        self,
+        code: str,
+        name: str,
+        description: Optional[str] = None,
+        allow_duplicate: bool = False
+    ):
+        """
+        Create a deck from a deck code in one transaction.
+        Returns (deck, duplicate_deck_ids); when allow_duplicate is False and decks with
+        the same contents exist, nothing is created and deck is None.
+        Raises ValueError if the code is invalid or the cards don't respect max_occurrence.
+        """
+        archetype_id, quantities = decode_deck_code(code)
+        duplicates = self.deck_repo.find_by_content_hash(deck_content_hash(archetype_id, quantities))
+        if duplicates and not allow_duplicate:
+            return None, duplicates
+        deck = self.deck_repo.create_with_cards(
+            name=name, archetype_id=archetype_id, quantities=quantities, description=description
+        )
+        return deck, duplicates
+    
+    def _resolve_line(self, candidates: List[Dict]) -> Dict:
+        """Pick the card for one decklist line: a unique exact match, or a clear best fuzzy match."""
+        if not candidates:
+            return {"status": "unresolved", "card": None}
+        best = candidates[0]
+        runner_up = candidates[1] if len(candidates) > 1 else None
+        if best["exact"]:
+            if runner_up and runner_up["exact"]:
+                return {"status": "ambiguous", "card": None}
+            return {"status": "exact", "card": best}
+        if runner_up and best["score"] - runner_up["score"] < FUZZY_MARGIN:
+            return {"status": "ambiguous", "card": None}
+        return {"status": "fuzzy", "card": best}
+    
+    def import_decklist_text(
+        self,
+        text: str,
+        name: str,
+        archetype_id: Optional[int] = None,
+        description: Optional[str] = None,
+        create: bool = True
+    ) -> dict:
+        """
+        Parse a plain-text decklist and resolve every card name in one batch query.
+        
+        The deck is created (with bulk inserts) only if create is set and every line
+        resolved; otherwise the resolution is returned with the problem lines flagged.
+        Without archetype_id, the archetype holding most of the non-universal cards is used.
+        Raises ValueError for unparsable text or a deck that breaks max_occurrence.
+        """
+        lines = parse_decklist(text)
+        if not lines:
+            raise ValueError("The decklist is empty")
+        resolved = self.card_repo.resolve_names([line.name for line in lines])
+        
+        result_lines = []
+        quantities: Dict[int, int] = {}
+        archetype_weights: Dict[int, int] = {}
+        for line in lines:
+            candidates = resolved[line.name]
+            resolution = self._resolve_line(candidates)
+            card = resolution["card"]
+            result_lines.append({
+                "line": line.line,
+                "text": line.text,
+                "quantity": line.quantity,
+                "status": resolution["status"],
+                "card_id": card["id"] if card else None,
+                "card_name": card["name"] if card else None,
+                "candidates": [
+                    {"card_id": c["id"], "name": c["name"], "score": round(c["score"], 3)}
+                    for c in candidates
+                ] if resolution["status"] in ("fuzzy", "ambiguous") else []
+            })
+            if card:
+                quantities[card["id"]] = quantities.get(card["id"], 0) + line.quantity
+                archetype_weights[card["archetype_id"]] = archetype_weights.get(card["archetype_id"], 0) + line.quantity
+        
+        if archetype_id is None:
+            universal = self.archetype_repo.get_by_name(UNIVERSAL_ARCHETYPE)
+            if universal is not None:
+                archetype_weights.pop(universal.id, None)
+            if archetype_weights:
+                archetype_id = max(archetype_weights, key=lambda key: (archetype_weights[key], -key))
+        
+        complete = all(line["status"] in ("exact", "fuzzy") for line in result_lines)
+        deck = None
+        if create and complete:
+            if archetype_id is None:
+                raise ValueError("archetype_id is required: it cannot be inferred from the cards")
+            deck = self.deck_repo.create_with_cards(
+                name=name, archetype_id=archetype_id, quantities=quantities, description=description
+            )
+        return {
+            "deck": deck,
+            "archetype_id": archetype_id,
+            "resolved": complete,
+            "cards": [{"card_id": card_id, "quantity": quantity} for card_id, quantity in sorted(quantities.items())],
+            "lines": result_lines
+        }
+    
+    @after_pending_writes
+    def clone_deck(
+        self,
+        deck_id: int,
+        name: Optional[str] = None,
+        archetype_id: Optional[int] = None,
+        description: Optional[str] = None,
+        substitutions: Optional[Dict[int, int]] = None
+    ):
+        """Fork a deck server-side, optionally with another archetype and card substitutions."""
+        return self.deck_repo.clone(
+            deck_id,
+            name=name,
+            archetype_id=archetype_id,
+            description=description,
+            substitutions=substitutions
+        )
+    
+    def diff_decks(self, deck_id: int, other_deck_id: int) -> Optional[dict]:
+        """
+        Get the cards added, removed and changed in quantity going from one deck to another,
+        or None if either deck doesn't exist.
+        """
+        self.write_buffer.flush_deck(deck_id)
+        self.write_buffer.flush_deck(other_deck_id)
+        rows = self.deck_repo.diff(deck_id, other_deck_id)
+        if rows is None:
+            return None
+        return {
+            "deck_id": deck_id,
+            "other_deck_id": other_deck_id,
+            "identical": not rows,
+            "added": [
+                {"card_id": r["card_id"], "name": r["name"], "quantity": r["other_quantity"]}
+                for r in rows if r["quantity"] == 0
+            ],
+            "removed": [
+                {"card_id": r["card_id"], "name": r["name"], "quantity": r["quantity"]}
+                for r in rows if r["other_quantity"] == 0
+            ],
+            "changed": [
+                {"card_id": r["card_id"], "name": r["name"], "quantity": r["quantity"], "other_quantity": r["other_quantity"]}
+                for r in rows if r["quantity"] and r["other_quantity"]
+            ]
+        }
+    
+    @after_pending_writes
+    def get_probabilities(self, deck_id: int, **params) -> Optional[dict]:
+        """
+        Get draw probabilities for a deck (see deck_probability.analyze_deck for params),
+        or None if the deck doesn't exist. Raises ValueError for an empty deck.
+        """
+        profile = self.deck_repo.get_profile(deck_id)
+        if profile is None:
+            return None
+        return analyze_deck(profile, **params)
+    
+    def get_decklist_probabilities(self, cards: List[Dict[str, int]], **params) -> dict:
+        """
+        Get draw probabilities for an unsaved list of {card_id, quantity}.
+        Raises ValueError for unknown cards or quantities above max_occurrence.
+        """
+        quantities: Dict[int, int] = {}
+        for item in cards:
+            quantities[item["card_id"]] = quantities.get(item["card_id"], 0) + item["quantity"]
+        profile = self.deck_repo.profile_decklist(quantities)
+        unknown = sorted(quantities.keys() - {card["card_id"] for card in profile})
+        if unknown:
+            raise ValueError(f"Card(s) not found: {', '.join(map(str, unknown))}")
+        for card in sorted(profile, key=lambda card: card["card_id"]):
+            if card["quantity"] > card["max_occurrence"]:
+                raise ValueError(
+                    f"Card {card['card_id']} has quantity {card['quantity']} but max_occurrence is {card['max_occurrence']}"
+                )
+        return analyze_deck(profile, **params)
+    
+    def build_decks(self, archetype_id: int, **constraints) -> dict:
+        """
+        Propose the best decks for an archetype under the given constraints
+        (see deck_builder.build_decks). Raises ValueError if none can be built.
+        """
+        if self.archetype_repo.get(archetype_id) is None:
+            raise ValueError(f"Archetype with ID {archetype_id} not found")
+        universal = self.archetype_repo.get_by_name(UNIVERSAL_ARCHETYPE)
+        for type_id, minimum in (constraints.get("type_min") or {}).items():
+            if minimum > (constraints.get("type_max") or {}).get(type_id, minimum):
+                raise ValueError(f"Minimum for type {type_id} is greater than its maximum")
+        return build_decks(
+            get_catalog(),
+            archetype_id=archetype_id,
+            universal_archetype_id=universal.id if universal else None,
+            **constraints
+        )
+    
+    @after_pending_writes
+    def get_suggestions(self, deck_id: int, limit: int = 20, metric: str = "pmi", min_support: int = 1):
+        """Get the cards most often played with this deck's cards, or None if the deck doesn't exist."""
+        return self.deck_repo.suggest_cards(deck_id, limit=limit, metric=metric, min_support=min_support)
+    
+    @after_pending_writes
+    def get_similar_decks(self, deck_id: int, limit: int = 20, min_similarity: float = 0.5):
+        """Get the decks with nearly the same cards, or None if the deck doesn't exist."""
+        return self.deck_repo.find_similar(deck_id, limit=limit, min_similarity=min_similarity)
+    
+    @after_all_pending_writes
+    def get_deck_clusters(self, min_similarity: float = 0.8, min_size: int = 2):
+        """Group near-duplicate decks into clusters."""
+        return self.deck_repo.cluster(min_similarity=min_similarity, min_size=min_size)
+    
+    @after_all_pending_writes
+    def rebuild_deck_signatures(self):
+        """Recompute the similarity signatures of every deck."""
+        return {"decks": self.deck_repo.rebuild_signatures()}
+    
+    @after_pending_writes
     def get_deck(self, deck_id: int, load_cards: bool = False):
         """Get a deck by ID, optionally loading cards."""
         return self.deck_repo.get(deck_id, load_cards=load_cards)
 
-    def list_decks(self, load_cards: bool = False):
-        """List all decks, optionally loading cards."""
-        return self.deck_repo.list(load_cards=load_cards)
+    @after_all_pending_writes
+    def list_decks(
+        self,
+        load_cards: bool = False,
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        valid: Optional[bool] = None
+    ):
+        """List all decks, optionally loading cards, sorted and filtered using deck stats."""
+        return self.deck_repo.list(load_cards=load_cards, sort_by=sort_by, descending=descending, valid=valid)
+    
+    @after_all_pending_writes
+    def check_deck_stats(self, rebuild: bool = False):
+        """Check the maintained deck stats for drift, optionally rebuilding them."""
+        return self.deck_repo.check_stats(rebuild=rebuild)
     
+    @after_all_pending_writes
+    def get_invalidation_feed(self, after_id: int = 0, limit: int = 100, deck_id: Optional[int] = None):
+        """
+        Get the decks that became invalid after the entry after_id, oldest first.
+        Clients poll with the id of the last entry they have seen.
+        """
+        return self.deck_repo.list_invalidations(after_id=after_id, limit=limit, deck_id=deck_id)
+    
+    def list_rules(self):
+        """List the rules available to validate_decks."""
+        return self.deck_repo.list_rules()
+    
+    def validate_decks(
+        self,
+        deck_ids: Optional[List[int]] = None,
+        archetype_id: Optional[int] = None,
+        rules: Optional[List[str]] = None,
+        min_cards: Optional[int] = None,
+        max_cards: Optional[int] = None,
+        type_limits: Optional[Dict[int, int]] = None
+    ) -> dict:
+        """
+        Validate every deck (or the given subset) against the rule engine in one run.
+        Returns the violations grouped by deck; decks without violations are omitted.
+        """
+        if min_cards is not None and max_cards is not None and min_cards > max_cards:
+            raise ValueError("min_cards cannot be greater than max_cards")
+        config = DeckRuleConfig(min_cards=min_cards, max_cards=max_cards, type_limits=type_limits or {})
+        self.flush_pending_writes(deck_ids)
+        return self.deck_repo.validate_all(deck_ids=deck_ids, archetype_id=archetype_id, rules=rules, config=config)
+    
+    @after_pending_writes
     def update_deck(
         self,
         deck_id: int,
@@ -30,6 +345,7 @@ class DeckService:
         """Update a deck's attributes."""
         return self.deck_repo.update(deck_id=deck_id, name=name, description=description, archetype_id=archetype_id)
     
+    @after_pending_writes
     def delete_deck(self, deck_id: int):
         """Delete a deck by ID."""
         return self.deck_repo.delete(deck_id)
@@ -38,6 +354,7 @@ class DeckService:
         """Get a deck by name."""
         return self.deck_repo.get_by_name(name)
     
+    @after_pending_writes
     def add_card_to_deck(self, deck_id: int, card_id: int, quantity: int):
         """
         Add a card to a deck with validation.
@@ -65,6 +382,7 @@ class DeckService:
         
         return True
     
+    @after_pending_writes
     def remove_card_from_deck(self, deck_id: int, card_id: int):
         """Remove a card from a deck."""
         success = self.deck_repo.remove_card(deck_id, card_id)
@@ -72,6 +390,7 @@ class DeckService:
             raise ValueError("Card not found in deck")
         return True
     
+    @after_pending_writes
     def update_card_quantity(self, deck_id: int, card_id: int, quantity: int):
         """
         Update the quantity of a card in a deck with validation.
@@ -99,45 +418,189 @@ class DeckService:
         
         return True
     
+    @after_pending_writes
+    def apply_card_operations(self, deck_id: int, operations: List[Dict]):
+        """
+        Apply a batch of add/set/remove card operations to a deck atomically.
+        Returns the resulting cards and deck summary, or None if the deck doesn't exist.
+        Raises ValueError if any operation is invalid; in that case nothing is applied.
+        """
+        for operation in operations:
+            if operation["op"] not in ("add", "set", "remove"):
+                raise ValueError(f"Unknown operation '{operation['op']}'")
+            if operation["op"] != "remove" and (operation.get("quantity") or 0) < 1:
+                raise ValueError("Quantity must be at least 1")
+        
+        quantities = self.deck_repo.apply_card_operations(deck_id, operations)
+        if quantities is None:
+            return None
+        return {
+            "cards": [{"card_id": card_id, "quantity": quantity} for card_id, quantity in sorted(quantities.items())],
+            "summary": self.get_deck_summary(deck_id)
+        }
+    
+    @after_pending_writes
     def get_deck_cards(self, deck_id: int):
-        """Get all cards in a deck with their quantities."""
+        """Get all cards in a deck with their quantities, or None if the deck doesn't exist."""
         return self.deck_repo.get_deck_cards(deck_id)
     
+    @after_pending_writes
+    def get_deck_cards_payload(self, deck_id: int, serialize: Callable[[List[Dict]], bytes]) -> Optional[bytes]:
+        """
+        Get the serialized card list of a deck from the payload cache, loading and
+        serializing it on a miss. Returns None if the deck doesn't exist.
+        """
+        payload = deck_payload_cache.get(deck_id)
+        if payload is not None:
+            return payload
+        token = deck_payload_cache.token(deck_id)
+        cards = self.deck_repo.get_deck_cards(deck_id)
+        if cards is None:
+            return None
+        payload = serialize(cards)
+        dependencies = set()
+        for item in cards:
+            card = item["card"]
+            dependencies.update({
+                ("card", card.id),
+                ("type", card.type_id),
+                ("faction", card.faction_id),
+                ("archetype", card.archetype_id)
+            })
+            if card.illustration_id is not None:
+                dependencies.add(("illustration", card.illustration_id))
+        deck_payload_cache.put(deck_id, payload, dependencies, token)
+        return payload
+    
+    def get_payload_cache_stats(self):
+        """Get the deck payload cache size and hit ratio."""
+        return deck_payload_cache.stats()
+    
+    @after_pending_writes
+    def get_live_state(self, deck_id: int):
+        """Get a deck's content version and {card_id: quantity}, or None if it doesn't exist."""
+        return self.deck_repo.get_live_state(deck_id)
+    
+    @after_pending_writes
+    def merge_card_changes(self, deck_id: int, changes: List[Dict]):
+        """
+        Apply the changes of a live editing message (see DeckRepository.merge_card_changes).
+        Returns None if the deck doesn't exist; raises ValueError for an invalid change.
+        """
+        if not changes:
+            raise ValueError("No changes")
+        for change in changes:
+            if (change.get("delta") is None) == (change.get("quantity") is None):
+                raise ValueError(f"Change of card {change['card_id']} needs either a delta or a quantity")
+        return self.deck_repo.merge_card_changes(deck_id, changes)
+    
+    def queue_card_quantity(self, deck_id: int, card_id: int, quantity: int):
+        """
+        Validate a quantity update like update_card_quantity and buffer it (write-behind).
+        The card and its presence in the deck are checked on the first update of the
+        window only; the following ones reuse the validated max_occurrence.
+        """
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1")
+        pending = self.write_buffer.get(deck_id, card_id)
+        if pending is None:
+            card = self.card_repo.get(card_id)
+            if not card:
+                raise ValueError(f"Card with ID {card_id} not found")
+            if self.deck_repo.get_card_quantity(deck_id, card_id) is None:
+                raise ValueError("Card not found in deck")
+            pending = PendingQuantity(quantity, card.max_occurrence, card.name)
+        if quantity > pending.max_occurrence:
+            raise ValueError(
+                f"Quantity ({quantity}) exceeds max_occurrence ({pending.max_occurrence}) for card '{pending.card_name}'"
+            )
+        self.write_buffer.enqueue(deck_id, card_id, PendingQuantity(quantity, pending.max_occurrence, pending.card_name))
+        return True
+    
+    def flush_pending_writes(self, deck_ids: Optional[List[int]] = None):
+        """Write the buffered quantity updates of the given decks, or of every deck."""
+        if deck_ids is None:
+            self.write_buffer.flush_all()
+            return
+        for deck_id in deck_ids:
+            self.write_buffer.flush_deck(deck_id)
+    
+    def get_write_buffer_stats(self):
+        """Get the write-behind buffer counters."""
+        return self.write_buffer.stats()
+    
     def get_card_quantity(self, deck_id: int, card_id: int):
-        """Get the quantity of a specific card in a deck."""
+        """Get the quantity of a specific card in a deck, including a buffered update."""
+        pending = self.write_buffer.get(deck_id, card_id)
+        if pending is not None:
+            return pending.quantity
         quantity = self.deck_repo.get_card_quantity(deck_id, card_id)
         if quantity is None:
             raise ValueError("Card not found in deck")
         return quantity
     
+    @after_pending_writes
     def get_total_cards(self, deck_id: int):
         """Get the total number of cards in a deck."""
         return self.deck_repo.get_total_cards(deck_id)
     
+    def _with_validation(self, summary: dict) -> dict:
+        """
+        Turn the raw violations of a summary into validation errors. Saved decks
+        carry the default rules' violations; unsaved lists only max_occurrence ones.
+        """
+        violations = summary.pop("violations")
+        unknown_card_ids = summary["unknown_card_ids"]
+        errors = [
+            {
+                "rule": v.get("rule", "max_occurrence"),
+                "card_id": v["card_id"],
+                "card_name": v["card_name"],
+                "quantity": v["quantity"],
+                "max_occurrence": v["max_occurrence"],
+                "message": v.get("message") or f"Card '{v['card_name']}' has quantity {v['quantity']} but max_occurrence is {v['max_occurrence']}"
+            }
+            for v in sorted(violations, key=lambda v: (v["card_id"] or 0, v.get("rule", "")))
+        ]
+        summary["valid"] = not errors and not unknown_card_ids
+        summary["errors"] = errors
+        return summary
+    
+    @after_pending_writes
+    def get_deck_summary(self, deck_id: int) -> Optional[dict]:
+        """
+        Get totals, cost curve, average stats, per-type/per-faction counts and
+        validation errors for a deck, or None if the deck doesn't exist.
+        """
+        summary = self.deck_repo.get_summary(deck_id)
+        if summary is None:
+            return None
+        summary["deck_id"] = deck_id
+        return self._with_validation(summary)
+    
+    def summarize_decklist(self, cards: List[Dict[str, int]]) -> dict:
+        """Get the same summary as get_deck_summary for an unsaved list of {card_id, quantity}."""
+        quantities: Dict[int, int] = {}
+        for item in cards:
+            if item["quantity"] < 1:
+                raise ValueError("Quantity must be at least 1")
+            quantities[item["card_id"]] = quantities.get(item["card_id"], 0) + item["quantity"]
+        summary = self.deck_repo.summarize_decklist(quantities)
+        summary["deck_id"] = None
+        return self._with_validation(summary)
+    
+    @after_pending_writes
     def validate_deck(self, deck_id: int) -> dict:
         """
-        Validate a deck to ensure all cards respect max_occurrence constraints.
+        Validate a deck against the default rules (max_occurrence, archetype), the
+        same ones behind deck_stats.valid and the invalidation feed.
         Returns a dict with validation status and any errors.
         """
-        deck_cards = self.deck_repo.get_deck_cards(deck_id)
-        errors = []
-        
-        for item in deck_cards:
-            card = item["card"]
-            quantity = item["quantity"]
-            
-            if quantity > card.max_occurrence:
-                errors.append({
-                    "card_id": card.id,
-                    "card_name": card.name,
-                    "quantity": quantity,
-                    "max_occurrence": card.max_occurrence,
-                    "message": f"Card '{card.name}' has quantity {quantity} but max_occurrence is {card.max_occurrence}"
-                })
-        
+        summary = self.get_deck_summary(deck_id)
+        if summary is None:
+            return {"valid": True, "total_cards": 0, "errors": []}
         return {
-            "valid": len(errors) == 0,
-            "total_cards": self.deck_repo.get_total_cards(deck_id),
-            "errors": errors
+            "valid": summary["valid"],
+            "total_cards": summary["total_cards"],
+            "errors": summary["errors"]
         }
-    
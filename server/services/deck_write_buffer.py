@@ -0,0 +1,214 @@
+"""
+Write-behind buffer for deck card quantities.
+
+The deck editor sends one quantity update per +/- click. In write-behind mode
+those updates are validated, kept in memory per (deck, card) — a later update
+replaces an earlier one — and written WINDOW seconds after the first pending
+update of the deck, as one batch of "set" operations (one transaction, one bulk
+upsert, one stats refresh).
+
+Failures: if the batch is refused (a card was deleted or its max_occurrence
+lowered since the update was validated), the updates are written one by one and
+only the refused ones are dropped. If the write fails otherwise (database
+error), the updates go back to the buffer, unless a newer one replaced them, and
+are retried after another window, up to MAX_ATTEMPTS times. Dropped updates were
+already acknowledged, so they are reported to the on_rejected callback (the
+deck's live room tells its clients) and counted in the stats.
+
+Reads stay consistent within the process: DeckService flushes a deck's pending
+updates before any read or write of that deck, flushes every deck's before
+reads spanning several decks (listing, batch validation, collection queries),
+and answers single-card quantity reads from the buffer. Catalog-side aggregates
+(a card's decks, the meta report) may lag by one window, and so may every read
+served by another worker process, which doesn't see this buffer. Pending
+updates are also flushed on shutdown; a crash loses at most one window of clicks.
+"""
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 0.5  # seconds
+MAX_ATTEMPTS = 3  # writes of an update failing with a database error before it is dropped
+
+
+@dataclass
+class PendingQuantity:
+    quantity: int
+    max_occurrence: int  # validated limit, reused by the following updates of the window
+    card_name: str
+    attempts: int = 0  # failed writes so far
+
+
+# on_rejected(deck_id, [{"card_id", "quantity", "detail"}]) for acknowledged updates that were dropped
+RejectionCallback = Callable[[int, List[Dict[str, Any]]], None]
+
+
+class QuantityWriteBuffer:
+    def __init__(
+        self,
+        apply: Callable[[int, List[Dict[str, Any]]], Any],
+        window: float = DEFAULT_WINDOW,
+        on_rejected: Optional[RejectionCallback] = None
+    ):
+        """apply(deck_id, operations) writes a batch, e.g. DeckRepository.apply_card_operations."""
+        self._apply = apply
+        self.window = window
+        self.on_rejected = on_rejected
+        self._pending: Dict[int, Dict[int, PendingQuantity]] = {}
+        self._timers: Dict[int, threading.Timer] = {}
+        self._deck_locks: Dict[int, threading.Lock] = defaultdict(threading.Lock)
+        self._flushing: Dict[int, int] = defaultdict(int)  # flush_deck calls holding or awaiting a deck lock
+        self._lock = threading.Lock()
+        self.received = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def get(self, deck_id: int, card_id: int) -> Optional[PendingQuantity]:
+        """The pending update of a card in a deck, if any."""
+        with self._lock:
+            return self._pending.get(deck_id, {}).get(card_id)
+
+    def enqueue(self, deck_id: int, card_id: int, pending: PendingQuantity):
+        """Buffer a validated quantity update, replacing a pending one for the same card."""
+        with self._lock:
+            self._pending.setdefault(deck_id, {})[card_id] = pending
+            self._deck_locks[deck_id]  # created here so flush_deck can wait on in-flight writes
+            self.received += 1
+            self._schedule(deck_id)
+
+    def _schedule(self, deck_id: int):
+        """Start the deck's flush timer unless it runs already (called with the lock held)."""
+        if deck_id not in self._timers:
+            timer = threading.Timer(self.window, self.flush_deck, args=(deck_id,))
+            timer.daemon = True
+            self._timers[deck_id] = timer
+            timer.start()
+
+    def flush_deck(self, deck_id: int):
+        """Write a deck's pending updates now; returns once they are committed, retried or dropped."""
+        with self._lock:
+            deck_lock = self._deck_locks.get(deck_id)
+            if deck_lock is None or (deck_id not in self._pending and not self._flushing.get(deck_id)):
+                return
+            self._flushing[deck_id] += 1
+        try:
+            with deck_lock:
+                self._write_pending(deck_id)
+        finally:
+            with self._lock:
+                self._flushing[deck_id] -= 1
+                if not self._flushing[deck_id]:
+                    del self._flushing[deck_id]
+                    # Nobody else holds this lock: drop it unless updates arrived meanwhile
+                    if deck_id not in self._pending:
+                        del self._deck_locks[deck_id]
+
+    def _write_pending(self, deck_id: int):
+        with self._lock:
+            pending = self._pending.pop(deck_id, None)
+            timer = self._timers.pop(deck_id, None)
+        if timer is not None:
+            timer.cancel()
+        if not pending:
+            return
+        try:
+            applied = self._apply(deck_id, self._operations(pending))
+        except ValueError:
+            self._write_one_by_one(deck_id, pending)  # a card was deleted or its max_occurrence lowered meanwhile
+            return
+        except Exception:
+            logger.exception("Could not write %d buffered quantity update(s) for deck %d", len(pending), deck_id)
+            self._retry_later(deck_id, pending)
+            return
+        if applied is None:
+            self._reject(deck_id, pending, "Deck not found")
+            return
+        with self._lock:
+            self.flushes += 1
+            self.written += len(pending)
+
+    def _write_one_by_one(self, deck_id: int, pending: Dict[int, PendingQuantity]):
+        refused: Dict[int, str] = {}
+        for card_id, update in sorted(pending.items()):
+            try:
+                applied = self._apply(deck_id, self._operations({card_id: update}))
+            except ValueError as e:
+                refused[card_id] = str(e)
+                continue
+            except Exception:
+                logger.exception("Could not write the buffered quantity of card %d in deck %d", card_id, deck_id)
+                self._retry_later(deck_id, {c: u for c, u in pending.items() if c >= card_id})
+                break
+            if applied is None:
+                self._reject(deck_id, {c: u for c, u in pending.items() if c >= card_id}, "Deck not found")
+                break
+            with self._lock:
+                self.flushes += 1
+                self.written += 1
+        for card_id, detail in refused.items():
+            self._reject(deck_id, {card_id: pending[card_id]}, detail)
+
+    @staticmethod
+    def _operations(pending: Dict[int, PendingQuantity]) -> List[Dict[str, Any]]:
+        return [
+            {"op": "set", "card_id": card_id, "quantity": update.quantity}
+            for card_id, update in sorted(pending.items())
+        ]
+
+    def _retry_later(self, deck_id: int, pending: Dict[int, PendingQuantity]):
+        """Put failed updates back for another window, unless replaced meanwhile or out of attempts."""
+        exhausted = {}
+        with self._lock:
+            self.failures += 1
+            cards = self._pending.setdefault(deck_id, {})
+            for card_id, update in pending.items():
+                if card_id in cards:
+                    continue  # a newer update replaced it
+                update.attempts += 1
+                if update.attempts >= MAX_ATTEMPTS:
+                    exhausted[card_id] = update
+                else:
+                    cards[card_id] = update
+            if cards:
+                self._schedule(deck_id)
+            else:
+                del self._pending[deck_id]
+        if exhausted:
+            self._reject(deck_id, exhausted, "The update could not be written")
+
+    def _reject(self, deck_id: int, pending: Dict[int, PendingQuantity], detail: str):
+        """Drop acknowledged updates and report them."""
+        logger.warning("Dropped %d buffered quantity update(s) for deck %d: %s", len(pending), deck_id, detail)
+        with self._lock:
+            self.rejected += len(pending)
+        if self.on_rejected is not None:
+            self.on_rejected(deck_id, [
+                {"card_id": card_id, "quantity": update.quantity, "detail": detail}
+                for card_id, update in sorted(pending.items())
+            ])
+
+    def flush_all(self):
+        """Write every pending update (before cross-deck reads, and on shutdown)."""
+        with self._lock:
+            deck_ids = list(self._pending)
+        for deck_id in deck_ids:
+            self.flush_deck(deck_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window": self.window,
+                "pending_decks": len(self._pending),
+                "pending_updates": sum(len(cards) for cards in self._pending.values()),
+                "received": self.received,
+                "written": self.written,
+                "flushes": self.flushes,
+                "failures": self.failures,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,44 @@
+"""
+Parsing of plain-text decklists as players paste them:
+
+    3x Centurion de la Garde
+    2 Légionnaire d'élite
+    Drakkar x2
+    Tribun
+
+Blank lines, comments (``#`` or ``//``) and section headers ending with ``:``
+are skipped; a line without a quantity counts one copy.
+"""
+import re
+from dataclasses import dataclass
+from typing import List
+
+
+LINE_RE = re.compile(
+    r"^(?:(?P<lead>\d+)\s*[xX×]?\s+)?(?P<name>.+?)(?:\s+[xX×]\s*(?P<trail>\d+))?$"
+)
+
+
+@dataclass
+class DecklistLine:
+    line: int  # 1-based line number in the pasted text
+    text: str
+    quantity: int
+    name: str
+
+
+def parse_decklist(text: str) -> List[DecklistLine]:
+    """Parse a decklist into lines with a quantity and a card name. Raises ValueError on a bad line."""
+    lines = []
+    for number, raw in enumerate(text.splitlines(), start=1):
+        stripped = raw.strip()
+        if not stripped or stripped.startswith(("#", "//")) or stripped.endswith(":"):
+            continue
+        match = LINE_RE.match(stripped)
+        if match.group("lead") and match.group("trail"):
+            raise ValueError(f"Line {number}: quantity given twice")
+        quantity = int(match.group("lead") or match.group("trail") or 1)
+        if quantity < 1:
+            raise ValueError(f"Line {number}: quantity must be at least 1")
+        lines.append(DecklistLine(line=number, text=stripped, quantity=quantity, name=match.group("name").strip()))
+    return lines
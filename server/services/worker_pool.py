@@ -0,0 +1,39 @@
+"""
+Process pools for the CPU-bound services.
+
+The shared pool runs the probability simulations. Deck building, whose
+searches each run for the request's whole time budget, has its own smaller
+pool so that a build can't hold every worker of the shared one. Pools are
+created on first use, so API workers that never run such a job don't pay for
+them. Jobs must be top-level functions with picklable arguments.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+
+MAX_WORKERS = os.cpu_count() or 1
+BUILDER_WORKERS = max(1, MAX_WORKERS // 4)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_builder_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it if needed."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+        return _executor
+
+
+def get_builder_pool() -> ProcessPoolExecutor:
+    """Return the deck builder's process pool (BUILDER_WORKERS processes), creating it if needed."""
+    global _builder_executor
+    with _executor_lock:
+        if _builder_executor is None:
+            _builder_executor = ProcessPoolExecutor(max_workers=BUILDER_WORKERS)
+        return _builder_executor
@@ -0,0 +1,16 @@
+from conftest import API
+
+
+def test_deleting_an_illustration_refreshes_the_snapshot(client):
+    from server.db.db_config import SessionLocal
+    from server.db.schema import Illustration
+    with SessionLocal() as session:
+        illustration = Illustration(filename="centurion.png", archetype_id=2)
+        session.add(illustration)
+        session.commit()
+        illustration_id = illustration.id
+    client.put(f"{API}/cards/1", json={"illustration_id": illustration_id})
+    assert client.get(f"{API}/cards").json()[0]["illustration_id"] == illustration_id
+    assert client.delete(f"{API}/illustrations/{illustration_id}").status_code == 200
+    assert client.get(f"{API}/cards").json()[0]["illustration_id"] is None
+
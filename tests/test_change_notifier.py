@@ -0,0 +1,207 @@
+"""
+Several worker processes sharing the test database: a write through one worker
+must reach the caches, change feed and SSE streams of the others, also after
+their notification listeners reconnect.
+"""
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from conftest import API
+
+ROOT = Path(__file__).resolve().parent.parent
+TIMEOUT = 20.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def eventually(check, timeout: float = TIMEOUT):
+    """Poll check() until it returns a truthy value."""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = check()
+        if result or time.monotonic() > deadline:
+            return result
+        time.sleep(0.1)
+
+
+class Worker:
+    def __init__(self):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port),
+                "--log-level", "warning", "--timeout-graceful-shutdown", "1"  # don't wait for open SSE streams
+            ],
+            cwd=ROOT,
+            env=dict(os.environ)
+        )
+        self.http = httpx.Client(base_url=f"http://127.0.0.1:{self.port}{API}", timeout=TIMEOUT)
+
+    def wait_ready(self):
+        def healthy():
+            try:
+                return httpx.get(f"http://127.0.0.1:{self.port}/api/health").status_code == 200
+            except httpx.TransportError:
+                return False
+        assert eventually(healthy), "worker did not start"
+
+    def deck_cards(self, deck_id: int):
+        return sorted(
+            (row["card"]["id"], row["quantity"], row["card"]["type"]["name"])
+            for row in self.http.get(f"/decks/{deck_id}/cards").json()
+        )
+
+    def suggested(self, deck_id: int):
+        return [row["card_id"] for row in self.http.get(f"/decks/{deck_id}/suggestions").json()]
+
+    def stop(self):
+        self.http.close()
+        self.process.terminate()
+        self.process.wait(timeout=TIMEOUT)
+
+
+class EventStream:
+    """The SSE stream of a worker, read in a background thread."""
+
+    def __init__(self, worker: Worker):
+        self.events: "queue.Queue" = queue.Queue()
+        self._url = f"http://127.0.0.1:{worker.port}{API}/events"
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        try:
+            with httpx.stream("GET", self._url, timeout=None) as response:
+                event = None
+                for line in response.iter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                    elif line.startswith("data: "):
+                        self.events.put((event, json.loads(line[len("data: "):])))
+        except httpx.TransportError:
+            pass  # the worker stopped
+
+    def wait_for(self, event: str, **data):
+        deadline = time.monotonic() + TIMEOUT
+        while True:
+            name, payload = self.events.get(timeout=max(0.0, deadline - time.monotonic()))
+            if name == event and all(payload.get(key) == value for key, value in data.items()):
+                return payload
+
+
+# The idle listening connections of the workers (their last statement is LISTEN or the keepalive)
+LISTENERS = (
+    "FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid() "
+    "AND query IN ('LISTEN catalog_changes', 'SELECT 1')"
+)
+
+
+def listeners(database) -> int:
+    from sqlalchemy import text
+    with database.connect() as connection:
+        return connection.scalar(text(f"SELECT count(*) {LISTENERS}"))
+
+
+def terminate_listeners(database):
+    from sqlalchemy import text
+    with database.begin() as connection:
+        connection.execute(text(f"SELECT pg_terminate_backend(pid) {LISTENERS}"))
+
+
+@pytest.fixture
+def workers(catalog):
+    started = [Worker(), Worker()]
+    try:
+        for worker in started:
+            worker.wait_ready()
+        yield started
+    finally:
+        for worker in started:
+            worker.stop()
+
+
+def test_writes_through_one_worker_reach_the_others(workers, db):
+    writer, reader = workers
+    assert eventually(lambda: listeners(db) == 2)
+    stream = EventStream(reader)
+    stream.wait_for("ready")
+
+    deck_id = writer.http.post("/decks", json={"name": "Legion", "archetype_id": 2}).json()["id"]
+    writer.http.post(f"/decks/{deck_id}/cards", json={"card_id": 1, "quantity": 1})
+    writer.http.post(f"/decks/{deck_id}/cards", json={"card_id": 3, "quantity": 2})
+    other_id = writer.http.post("/decks", json={"name": "Garde", "archetype_id": 2}).json()["id"]
+    writer.http.post(f"/decks/{other_id}/cards", json={"card_id": 1, "quantity": 1})
+    writer.http.post(f"/decks/{other_id}/cards", json={"card_id": 5, "quantity": 1})
+    stream.wait_for("change", entity="deck", id=other_id, op="cards")
+
+    # Fill the reader's caches, then change what they hold through the writer
+    assert reader.deck_cards(deck_id) == [(1, 1, "Combattant"), (3, 2, "Combattant")]
+    assert reader.suggested(deck_id) == [5]
+    assert [card["name"] for card in reader.http.get("/cards").json()][0] == "Centurion de la Garde"
+    writer.http.put(f"/decks/{deck_id}/cards/1", json={"quantity": 3})
+    writer.http.delete(f"/decks/{other_id}/cards/5")
+    writer.http.put("/types/1", json={"name": "Soldat"})
+    writer.http.put("/cards/1", json={"name": "Centurion"})
+    stream.wait_for("change", entity="type", id=1)
+    assert eventually(lambda: reader.deck_cards(deck_id) == [(1, 3, "Soldat"), (3, 2, "Soldat")])
+    assert eventually(lambda: reader.suggested(deck_id) == [])
+    assert eventually(lambda: reader.http.get("/cards").json()[0]["name"] == "Centurion")
+
+    # Changes made while the listeners are down are missed: the readers drop their caches on reconnect
+    terminate_listeners(db)
+    writer.http.put(f"/decks/{deck_id}/cards/3", json={"quantity": 1})
+    stream.wait_for("reset")
+    assert eventually(lambda: listeners(db) == 2)
+    assert eventually(lambda: reader.deck_cards(deck_id) == [(1, 3, "Soldat"), (3, 1, "Soldat")])
+    writer.http.put(f"/decks/{deck_id}/cards/1", json={"quantity": 2})
+    stream.wait_for("change", entity="deck", id=deck_id, op="cards")
+    assert eventually(lambda: reader.deck_cards(deck_id) == [(1, 2, "Soldat"), (3, 1, "Soldat")])
+
+
+def test_remote_deck_changes_update_the_cooccurrence_index_in_place(catalog):
+    from server.repositories.change_notifier import change_notifier
+    from server.repositories.cooccurrence_index import cooccurrence_index
+    cooccurrence_index.suggest({1: 1})  # load the (empty) index
+    payload = json.dumps({"origin": "elsewhere", "entity": "cooccurrence", "before": {}, "after": {"1": 2, "3": 1}})
+    change_notifier._receive(payload)
+    assert cooccurrence_index._loaded
+    assert cooccurrence_index.suggest({1: 1}) == [(3, 0.0, 2)]
+    change_notifier._receive(json.dumps({"origin": "elsewhere", "entity": "cooccurrence", "before": None, "after": None}))
+    assert not cooccurrence_index._loaded
+
+
+def test_full_outbox_drops_payloads_and_ends_with_a_reset(monkeypatch):
+    from server.repositories import change_notifier as module
+    notifier = module.change_notifier
+    monkeypatch.setattr(module, "MAX_QUEUED", 2)
+    monkeypatch.setattr(notifier, "_outbox", module.deque())
+    notifier._enqueue(["a", "b"])
+    notifier._enqueue(["c"])
+    assert notifier._overflowed
+    assert notifier._next_batch() == (["a", "b"], True)
+    notifier._sent(2, True)
+    assert not notifier._outbox and not notifier._overflowed
+
+
+def test_reset_from_another_worker_drops_the_local_state(catalog):
+    from server.repositories.change_feed import change_feed
+    from server.repositories.change_notifier import change_notifier
+    from server.repositories.cooccurrence_index import cooccurrence_index
+    cooccurrence_index.suggest({1: 1})
+    seq = change_feed.last_seq
+    change_notifier._receive(json.dumps({"origin": "elsewhere", "entity": "reset"}))
+    assert not cooccurrence_index._loaded
+    assert change_feed.since(seq) is None
@@ -0,0 +1,31 @@
+from sqlalchemy import text
+
+from conftest import API
+
+
+def test_upgrade_backfills_search_names_of_cards_inserted_directly(client, db):
+    from server.db.upgrade import upgrade_db
+    with db.begin() as connection:
+        card_id = connection.scalar(text(
+            "INSERT INTO cards (name, archetype_id, type_id, faction_id, cost, combat_power, resilience, "
+            "max_occurrence, created_at, updated_at) "
+            "VALUES ('Aquilifère', 2, 1, 1, 2, 2, 2, 3, now(), now()) RETURNING id"
+        ))
+    assert client.get(f"{API}/cards/autocomplete", params={"q": "aquil"}).json() == []
+    upgrade_db(db)
+    suggestions = client.get(f"{API}/cards/autocomplete", params={"q": "aquil"}).json()
+    assert [card["id"] for card in suggestions] == [card_id]
+
+
+def test_upgrade_creates_missing_indexes(db):
+    from server.db.upgrade import upgrade_db
+
+    def card_indexes():
+        with db.connect() as connection:
+            return set(connection.scalars(text("SELECT indexname FROM pg_indexes WHERE tablename = 'cards'")))
+
+    with db.begin() as connection:
+        connection.execute(text("DROP INDEX ix_cards_cost"))
+    assert "ix_cards_cost" not in card_indexes()
+    upgrade_db(db)
+    assert "ix_cards_cost" in card_indexes()
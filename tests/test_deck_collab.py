@@ -0,0 +1,87 @@
+import pytest
+
+from conftest import API
+
+
+@pytest.fixture
+def deck_id(client):
+    deck_id = client.post(f"{API}/decks", json={"name": "Legion", "archetype_id": 2}).json()["id"]
+    client.post(f"{API}/decks/{deck_id}/cards", json={"card_id": 1, "quantity": 1})
+    return deck_id
+
+
+def live(client, deck_id, since=None):
+    url = f"{API}/decks/{deck_id}/live" + ("" if since is None else f"?since={since}")
+    return client.websocket_connect(url)
+
+
+def send_changes(ws, client_seq, *changes):
+    ws.send_json({"type": "changes", "client_seq": client_seq, "changes": list(changes)})
+
+
+def test_concurrent_deltas_reach_every_client_in_version_order(client, deck_id):
+    with live(client, deck_id) as alice, live(client, deck_id) as bob:
+        version = alice.receive_json()["version"]
+        assert bob.receive_json() == {"type": "snapshot", "version": version, "quantities": {"1": 1}}
+        send_changes(alice, 1, {"card_id": 1, "delta": 1})
+        send_changes(bob, 1, {"card_id": 1, "delta": 1})
+        for ws in (alice, bob):
+            deltas = [ws.receive_json(), ws.receive_json()]
+            assert [delta["version"] for delta in deltas] == [version + 1, version + 2]
+            assert [delta["changes"][0]["quantity"] for delta in deltas] == [2, 3]
+        # Both +1 merged; a third one is clamped to max_occurrence and only acknowledged
+        send_changes(bob, 2, {"card_id": 1, "delta": 1})
+        assert bob.receive_json() == {"type": "ack", "client_seq": 2, "version": version + 2}
+    assert client.get(f"{API}/decks/{deck_id}/cards/1/quantity").json()["quantity"] == 3
+
+
+def test_compare_and_set_rejects_a_stale_expected_quantity(client, deck_id):
+    with live(client, deck_id) as alice, live(client, deck_id) as bob:
+        version = alice.receive_json()["version"]
+        bob.receive_json()
+        send_changes(alice, 1, {"card_id": 1, "quantity": 2, "expected": 1})
+        assert alice.receive_json()["version"] == version + 1
+        assert bob.receive_json()["client_seq"] == 1
+        send_changes(bob, 1, {"card_id": 1, "quantity": 3, "expected": 1})
+        assert bob.receive_json() == {
+            "type": "conflict",
+            "client_seq": 1,
+            "version": version + 1,
+            "conflicts": [{"card_id": 1, "quantity": 2}]
+        }
+
+
+def test_reconnecting_client_receives_only_the_missed_deltas(client, deck_id):
+    with live(client, deck_id) as alice:
+        version = alice.receive_json()["version"]
+        for seq in (1, 2):
+            send_changes(alice, seq, {"card_id": 3, "delta": 1})
+            alice.receive_json()
+        with live(client, deck_id, since=version + 1) as bob:
+            delta = bob.receive_json()
+            assert (delta["type"], delta["version"], delta["changes"][0]["quantity"]) == ("delta", version + 2, 2)
+            assert bob.receive_json() == {"type": "synced", "version": version + 2}
+
+
+def test_sync_after_a_gap(client, deck_id):
+    with live(client, deck_id) as alice:
+        version = alice.receive_json()["version"]
+        send_changes(alice, 1, {"card_id": 3, "delta": 1})
+        alice.receive_json()
+        alice.send_json({"type": "sync", "since": version})
+        assert alice.receive_json()["version"] == version + 1
+        assert alice.receive_json() == {"type": "synced", "version": version + 1}
+        # A change made outside the room is broadcast as a snapshot and can't be replayed across
+        client.put(f"{API}/decks/{deck_id}/cards/1", json={"quantity": 3})
+        snapshot = alice.receive_json()
+        assert snapshot == {"type": "snapshot", "version": version + 2, "quantities": {"1": 3, "3": 1}}
+        alice.send_json({"type": "sync", "since": version})
+        assert alice.receive_json() == snapshot
+
+
+def test_missing_deck_closes_the_channel(client):
+    from starlette.websockets import WebSocketDisconnect
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with live(client, 999) as ws:
+            ws.receive_json()
+    assert closed.value.code == 4404
@@ -0,0 +1,46 @@
+import pytest
+
+from conftest import API
+from server.services.deck_probability import analyze_deck, MAX_DECK_SIZE
+
+
+def profile(*cards):
+    return [
+        {"card_id": card_id, "quantity": quantity, "type_id": type_id, "cost": cost}
+        for card_id, quantity, type_id, cost in cards
+    ]
+
+
+def test_exact_query_counts_copies():
+    deck = profile((1, 3, 1, 1), (2, 17, 2, 2))
+    result = analyze_deck(deck, hand_size=5, turn=1, draws_per_turn=1, queries=[[{"card_ids": [1], "at_least": 1}]], simulations=1000)
+    # 1 - C(17, 5) / C(20, 5)
+    assert result["deck_size"] == 20
+    assert result["queries"][0]["probability"] == pytest.approx(1 - 6188 / 15504)
+
+
+def test_monte_carlo_matches_exact_probability():
+    deck = profile((1, 4, 1, 1), (2, 4, 2, 3), (3, 12, 2, 5))
+    # Every card costs at most 5, so only the type condition matters: 1 - C(16, 5) / C(20, 5)
+    conditions = [{"type_id": 1, "at_least": 1}, {"max_cost": 5, "at_least": 1}]
+    result = analyze_deck(deck, hand_size=5, turn=1, draws_per_turn=1, queries=[conditions], simulations=50_000, seed=1)
+    query = result["queries"][0]
+    assert query["method"] == "monte_carlo"
+    assert query["probability"] == pytest.approx(1 - 4368 / 15504, abs=4 * query["standard_error"])
+
+
+def test_rejects_decks_above_the_size_limit():
+    with pytest.raises(ValueError, match="maximum"):
+        analyze_deck(profile((1, MAX_DECK_SIZE + 1, 1, 1)), hand_size=5, turn=1, draws_per_turn=1, queries=[], simulations=1000)
+
+
+def test_decklist_quantity_above_max_occurrence_is_rejected(client):
+    response = client.post(f"{API}/decks/probabilities", json={"cards": [{"card_id": 1, "quantity": 1_000_000_000}]})
+    assert response.status_code == 400
+    assert "max_occurrence" in response.json()["detail"]
+
+
+def test_decklist_probabilities(client):
+    response = client.post(f"{API}/decks/probabilities", json={"cards": [{"card_id": 1, "quantity": 3}, {"card_id": 3, "quantity": 3}]})
+    assert response.status_code == 200
+    assert response.json()["deck_size"] == 6
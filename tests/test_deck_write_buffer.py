@@ -0,0 +1,83 @@
+import pytest
+
+from conftest import API
+
+
+@pytest.fixture
+def buffered_deck(client, monkeypatch):
+    """A deck with 1 copy of card 1, then a buffered update to 3 copies that won't be written on its own."""
+    from server.api.routes.deck_routes import service
+    monkeypatch.setattr(service.write_buffer, "window", 60)
+    deck_id = client.post(f"{API}/decks", json={"name": "Legion", "archetype_id": 2}).json()["id"]
+    client.post(f"{API}/decks/{deck_id}/cards", json={"card_id": 1, "quantity": 1})
+    response = client.put(f"{API}/decks/{deck_id}/cards/1?write_behind=true", json={"quantity": 3})
+    assert response.json()["deferred"] is True
+    assert service.get_write_buffer_stats()["pending_updates"] == 1
+    return deck_id
+
+
+def test_list_decks_sees_buffered_updates(client, buffered_deck):
+    decks = client.get(f"{API}/decks").json()
+    assert [deck["stats"]["total_cards"] for deck in decks] == [3]
+
+
+def test_batch_validation_sees_buffered_updates(client, buffered_deck):
+    response = client.post(f"{API}/decks/validate", json={"deck_ids": [buffered_deck], "min_cards": 3})
+    assert response.json()["invalid_decks"] == 0
+
+
+def test_collection_queries_see_buffered_updates(client, buffered_deck):
+    collection_id = client.post(f"{API}/collections", json={"name": "Binder"}).json()["id"]
+    client.patch(f"{API}/collections/{collection_id}/cards", json={"cards": [{"card_id": 1, "owned_qty": 2}]})
+    missing = client.get(f"{API}/collections/{collection_id}/missing/{buffered_deck}").json()
+    assert missing["missing_cards"] == 1
+    assert client.get(f"{API}/collections/{collection_id}/buildable-decks").json() == []
+
+
+def test_deck_locks_are_dropped_after_flushing(client, buffered_deck):
+    from server.api.routes.deck_routes import service
+    written = service.get_write_buffer_stats()["written"]
+    service.flush_pending_writes()
+    assert service.write_buffer._deck_locks == {}
+    assert service.get_write_buffer_stats()["written"] == written + 1
+
+
+def test_refused_update_is_dropped_alone_and_reported_to_the_room(client, buffered_deck):
+    from server.api.routes.deck_routes import service
+    client.post(f"{API}/decks/{buffered_deck}/cards", json={"card_id": 3, "quantity": 1})
+    client.put(f"{API}/decks/{buffered_deck}/cards/3?write_behind=true", json={"quantity": 2})
+    with client.websocket_connect(f"{API}/decks/{buffered_deck}/live") as ws:
+        ws.receive_json()
+        client.put(f"{API}/cards/3", json={"max_occurrence": 1})
+        rejected = service.get_write_buffer_stats()["rejected"]
+        service.flush_pending_writes([buffered_deck])
+        message = ws.receive_json()
+    assert message["type"] == "rejected"
+    assert [(change["card_id"], change["quantity"]) for change in message["changes"]] == [(3, 2)]
+    assert service.get_write_buffer_stats()["rejected"] == rejected + 1
+    quantities = {row["card"]["id"]: row["quantity"] for row in client.get(f"{API}/decks/{buffered_deck}/cards").json()}
+    assert quantities == {1: 3, 3: 1}
+
+
+def test_failed_writes_are_retried_then_reported():
+    from server.services.deck_write_buffer import QuantityWriteBuffer, PendingQuantity, MAX_ATTEMPTS
+    calls, rejections = [], []
+
+    def apply(deck_id, operations):
+        calls.append(operations)
+        if len(calls) < MAX_ATTEMPTS + 1:
+            raise RuntimeError("connection lost")
+        return {}
+
+    buffer = QuantityWriteBuffer(apply, window=60, on_rejected=lambda deck_id, changes: rejections.append(changes))
+    buffer.enqueue(1, 5, PendingQuantity(2, 3, "Drakkar"))
+    buffer.flush_deck(1)
+    assert buffer.get(1, 5).quantity == 2  # back in the buffer
+    buffer.enqueue(1, 6, PendingQuantity(1, 3, "Tribun"))
+    for _ in range(MAX_ATTEMPTS - 1):
+        buffer.flush_deck(1)
+    assert rejections == [[{"card_id": 5, "quantity": 2, "detail": "The update could not be written"}]]
+    buffer.flush_deck(1)
+    assert calls[-1] == [{"op": "set", "card_id": 6, "quantity": 1}]
+    assert buffer.stats()["pending_updates"] == 0
+    assert buffer.stats()["failures"] == MAX_ATTEMPTS
@@ -0,0 +1,36 @@
+from conftest import API
+from server.repositories.card_repository import CardRepository
+
+BLANK_NAME = "́́"  # combining accents only: normalizes to ""
+
+
+def test_resolve_names_keeps_names_that_normalize_to_nothing():
+    names = [BLANK_NAME, "  "]
+    assert CardRepository().resolve_names(names) == {BLANK_NAME: [], "  ": []}
+
+
+def test_resolve_names_mixes_blank_and_real_names(catalog):
+    resolved = CardRepository().resolve_names([BLANK_NAME, "centurion de la garde"])
+    assert resolved[BLANK_NAME] == []
+    assert [card["id"] for card in resolved["centurion de la garde"] if card["exact"]] == [1]
+
+
+def test_import_text_with_only_blank_names_reports_unresolved_lines(client):
+    response = client.post(f"{API}/decks/import-text", json={"text": f"2 {BLANK_NAME}", "name": "Blank"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["resolved"] is False
+    assert body["deck"] is None
+    assert [line["status"] for line in body["lines"]] == ["unresolved"]
+
+
+def test_import_text_creates_the_deck(client):
+    response = client.post(
+        f"{API}/decks/import-text",
+        json={"text": "3x Centurion de la Garde\n2 berserker", "name": "Rome"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["resolved"] is True
+    assert body["archetype_id"] == 2
+    assert body["cards"] == [{"card_id": 1, "quantity": 3}, {"card_id": 3, "quantity": 2}]